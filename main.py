@@ -1,18 +1,34 @@
 import json
+import hashlib
+import pickle
 import pandas as pd
 import numpy as np
 import os
 import io
 import csv
 import re
+import threading
+import asyncio
+import functools
+import multiprocessing
+import mmap
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import bisect
+from scipy import optimize, sparse
+from scipy.sparse import linalg as sparse_linalg
 from datetime import datetime as datetime_cls, timedelta, date as date_cls
 from scipy.stats import poisson
 from bs4 import BeautifulSoup
-from typing import List, Dict, Any, FrozenSet, Optional, Tuple
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple, Callable, NamedTuple, AsyncIterator
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from contextlib import asynccontextmanager, contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, each worker builds for itself
+    fcntl = None
 
 # --- Configuration: Main Data Directory ---
 DATA_DIR = 'data'
@@ -29,6 +45,52 @@ HTML_ODDS_FP = os.path.join(DATA_DIR, 'fifa_club_wc_odds.html')
 MD_ODDS_FP = os.path.join(DATA_DIR, 'fifa_club_wc_odds.md')
 UNIFIED_ANYTIME_GOALSCORER_FILE_PATH = os.path.join(DATA_DIR, "updated_anytimegoalscorer.json")
 OUTPUT_COMBINED_PLAYER_STATS_JSON_FP = os.path.join(DATA_DIR, 'player_combined_match_stats_output.json')
+FIXTURES_FILE_PATH = os.environ.get("FIXTURES_FILE_PATH", "")  # optional TSV/CSV fixture list replacing the embedded one
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+PRECOMPUTE_SNAPSHOT_FP = os.path.join(CACHE_DIR, 'precompute_snapshot.pkl')
+PRECOMPUTE_SNAPSHOT_FORMAT_VERSION = 9
+PLAYER_STATS_COLUMNAR_DIR = os.path.join(CACHE_DIR, 'merged_mapped_players')
+PLAYER_STATS_COLUMNAR_FORMAT_VERSION = 1
+STARTUP_BUILD_LOCK_FP = os.path.join(CACHE_DIR, 'startup.lock')
+STATE_ARENA_DIR = os.path.join(CACHE_DIR, 'state_arena')
+STATE_ARENA_FORMAT_VERSION = 3
+HOT_RELOAD_INTERVAL_SECONDS = float(os.environ.get("HOT_RELOAD_INTERVAL_SECONDS", "5"))  # 0 disables the odds file watcher
+SHARED_STATE_ARENA = os.environ.get("SHARED_STATE_ARENA", "0") == "1"  # for `uvicorn main:app --workers N`
+
+# --- Group Stage Simulation Configuration ---
+GROUP_SIMULATION_DEFAULT_RUNS = 100_000
+GROUP_SIMULATION_MAX_RUNS = 2_000_000
+GROUP_SIMULATION_SHARD_SIZE = 25_000  # fixed, so a seed gives the same result however many workers run the shards
+GROUP_SIMULATION_WORKERS = int(os.environ.get("GROUP_SIMULATION_WORKERS", "1"))  # >1 shards across forked processes
+GROUPS_QUALIFYING_PLACES = 2
+GROUP_SIMULATION_POISSON_MAX_GOALS = 10  # Poisson scorelines beyond this many goals per side count as this many
+KNOCKOUT_EXTRA_TIME_XG_FRACTION = 1.0 / 3.0  # 30 minutes of extra time at the 90-minute scoring rate
+KNOCKOUT_PENALTY_WIN_PROBABILITY = 0.5
+
+# --- xG Model Configuration ---
+XG_SOURCE = os.environ.get("XG_SOURCE", "cs_market_mean")  # "cs_market_mean" or "dixon_coles" for fixtures with a CS market
+DIXON_COLES_RATE_BOUNDS = (0.05, 6.0)
+DIXON_COLES_RHO_BOUNDS = (-0.25, 0.25)
+DIXON_COLES_MAX_ITERATIONS = 500
+NO_MARKET_XG_SOURCE = os.environ.get("NO_MARKET_XG_SOURCE", "fdr_outrights")  # "fdr_outrights" or "team_ratings" for fixtures without a CS market
+TEAM_RATING_SOURCE_WEIGHTS = {"correct_score": 1.0, "anytime_goalscorer": 0.5}  # least-squares weight per log-rate observation
+TEAM_RATING_RIDGE = 0.05  # shrinks attack/defence towards the average team
+
+# --- Margin Removal Configuration ---
+DEVIG_METHODS = ("proportional", "power", "shin", "odds_ratio")  # selectable per endpoint with ?devig=
+DEVIG_BISECTION_STEPS = 64
+# Scorer lists are not a complete book (no "no goalscorer", missing fringe players), so their implied probabilities
+# have no fixed fair total to normalise to. Fair prices are instead taken to sum to the raw total / this overround;
+# 1.2 is the 15-25% margin anytime-scorer markets typically carry. Applied by every ?devig= method to AGS odds.
+try: AGS_ASSUMED_OVERROUND = float(os.environ.get("AGS_ASSUMED_OVERROUND", "1.2"))
+except ValueError: AGS_ASSUMED_OVERROUND = float("nan")
+if not (np.isfinite(AGS_ASSUMED_OVERROUND) and AGS_ASSUMED_OVERROUND > 1.0):
+    raise ValueError(f"AGS_ASSUMED_OVERROUND must be a finite number above 1 (got {os.environ.get('AGS_ASSUMED_OVERROUND')!r}).")
+
+# --- Compute Executor Configuration ---
+COMPUTE_EXECUTOR_KIND = os.environ.get("COMPUTE_EXECUTOR_KIND", "thread")  # "thread" or "process"
+COMPUTE_EXECUTOR_MAX_WORKERS = int(os.environ.get("COMPUTE_EXECUTOR_MAX_WORKERS", "4"))
+COMPUTE_EXECUTOR_MAX_PENDING = int(os.environ.get("COMPUTE_EXECUTOR_MAX_PENDING", "64"))
 
 # --- Team Name Mapping ---
 TEAM_NAME_MAPPING = {
@@ -269,19 +331,226 @@ USER_PROVIDED_FIXTURES_WITH_STADIUMS_RAW = [
     {'home_team': 'FC Salzburg', 'away_team': 'Real Madrid CF', 'date': '2025-06-27', 'time': '01:00 AM', 'stadium': 'Lincoln Financial Field, Philadelphia, PA', 'group': 'H'}
 ]
 
+# Knockout bracket: slots are "1st Group X" / "2nd Group X" or "Winner Match N"; played at neutral venues
+KNOCKOUT_BRACKET_RAW = [
+    {'match': 49, 'stage': 'Round of 16', 'date': '2025-06-28', 'home': '1st Group A', 'away': '2nd Group B'},
+    {'match': 50, 'stage': 'Round of 16', 'date': '2025-06-28', 'home': '1st Group C', 'away': '2nd Group D'},
+    {'match': 51, 'stage': 'Round of 16', 'date': '2025-06-29', 'home': '1st Group B', 'away': '2nd Group A'},
+    {'match': 52, 'stage': 'Round of 16', 'date': '2025-06-29', 'home': '1st Group D', 'away': '2nd Group C'},
+    {'match': 53, 'stage': 'Round of 16', 'date': '2025-06-30', 'home': '1st Group E', 'away': '2nd Group F'},
+    {'match': 54, 'stage': 'Round of 16', 'date': '2025-06-30', 'home': '1st Group G', 'away': '2nd Group H'},
+    {'match': 55, 'stage': 'Round of 16', 'date': '2025-07-01', 'home': '1st Group F', 'away': '2nd Group E'},
+    {'match': 56, 'stage': 'Round of 16', 'date': '2025-07-01', 'home': '1st Group H', 'away': '2nd Group G'},
+    {'match': 57, 'stage': 'Quarter-final', 'date': '2025-07-04', 'home': 'Winner Match 53', 'away': 'Winner Match 54'},
+    {'match': 58, 'stage': 'Quarter-final', 'date': '2025-07-04', 'home': 'Winner Match 49', 'away': 'Winner Match 50'},
+    {'match': 59, 'stage': 'Quarter-final', 'date': '2025-07-05', 'home': 'Winner Match 51', 'away': 'Winner Match 52'},
+    {'match': 60, 'stage': 'Quarter-final', 'date': '2025-07-05', 'home': 'Winner Match 55', 'away': 'Winner Match 56'},
+    {'match': 61, 'stage': 'Semi-final', 'date': '2025-07-08', 'home': 'Winner Match 57', 'away': 'Winner Match 58'},
+    {'match': 62, 'stage': 'Semi-final', 'date': '2025-07-09', 'home': 'Winner Match 59', 'away': 'Winner Match 60'},
+    {'match': 63, 'stage': 'Final', 'date': '2025-07-13', 'home': 'Winner Match 61', 'away': 'Winner Match 62'},
+]
+
 # Global Data Structures
-FIXTURE_LOOKUP_MAP: Dict[FrozenSet[str], Dict[str, Any]] = {}
-TEAM_CS_PERCENTAGES_CACHE: Dict[str, Dict[str, float]] = {}
-FIXTURE_ID_TO_CS_CACHE_KEY_MAP: Dict[str, str] = {}
-FIXTURE_ID_GW_LOOKUP: Dict[Tuple[str, str, str], Dict[str, str]] = {}
-ALL_BASE_FIXTURES: List[Dict[str, Any]] = []
-PLAYER_STATS_DF: Optional[pd.DataFrame] = None
-TEAM_SEASON_STATS: Dict[str, Dict[str, float]] = {}
-CS_ODDS_LOOKUP: Dict[Tuple[str, str, str], Dict[str, float]] = {}
-AGS_ODDS_LOOKUP: Dict[FrozenSet[str], List[Dict[str, Any]]] = {}
-TEAM_STRENGTH_METRICS: Dict[str, float] = {}
-MATCH_HISTORY_CONTEXTS: List[Dict[str, Optional[Dict[str, Any]]]] = []
-FIXTURE_FDR_METRICS_CACHE: Dict[str, Dict[str, float]] = {}
+class FixtureRecord(NamedTuple):
+    fixture_id: str
+    stage: str
+    starting_at: str
+    date: str
+    home_team: str
+    away_team: str
+    home_canonical: str
+    away_canonical: str
+    group: str
+    gw: str
+    stadium: str = ""  # optional `stadium` column; empty for the embedded list (see fixture_venue_table)
+
+class FixtureRegistry:
+    """
+    Every fixture-list lookup, built in one pass over the rows with each team name canonicalized once.
+    by_fixture_id, by_gw and by_group hold every row with an id; by_pair (frozenset of canonical teams,
+    last row wins, knockout placeholders skipped) and by_ordered_pair_date ((home, away, date), rows with
+    all key fields and an ISO date) keep the filtering of the two separate parsers they replace.
+    """
+    REQUIRED_COLUMNS = ('fixture_id', 'home_team_name', 'away_team_name', 'starting_at', 'GW')
+    _PLACEHOLDER_MARKERS = ("Winner Match", "1st Group", "2nd Group")
+
+    def __init__(self, records: List[FixtureRecord]):
+        self.records = records
+        self.by_fixture_id: Dict[str, FixtureRecord] = {}
+        self.by_pair: Dict[FrozenSet[str], FixtureRecord] = {}
+        self.by_ordered_pair_date: Dict[Tuple[str, str, str], FixtureRecord] = {}
+        self.by_gw: Dict[str, List[FixtureRecord]] = {}
+        self.by_group: Dict[str, List[FixtureRecord]] = {}
+        for rec in records:
+            if rec.fixture_id:
+                self.by_fixture_id[rec.fixture_id] = rec
+                self.by_gw.setdefault(rec.gw, []).append(rec)
+                if rec.group: self.by_group.setdefault(rec.group, []).append(rec)
+            if not self.is_placeholder(rec) and not rec.home_canonical.startswith("N/A_") and not rec.away_canonical.startswith("N/A_"):
+                self.by_pair[frozenset({rec.home_canonical, rec.away_canonical})] = rec
+            if rec.fixture_id and rec.starting_at and rec.gw and re.match(r"^\d{4}-\d{2}-\d{2}$", rec.date) \
+                    and "N/A" not in rec.home_canonical and "N/A" not in rec.away_canonical:
+                self.by_ordered_pair_date[(rec.home_canonical, rec.away_canonical, rec.date)] = rec
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @classmethod
+    def is_placeholder(cls, rec: FixtureRecord) -> bool:
+        """A knockout row whose teams are still slots ("Winner Match 49", "1st Group A")"""
+        return any(marker in team for team in (rec.home_team, rec.away_team) for marker in cls._PLACEHOLDER_MARKERS)
+
+    def find(self, home_c: str, away_c: str, date_s: str) -> Optional[FixtureRecord]:
+        """The fixture between two teams on a date, whichever side the source lists as home"""
+        return self.by_ordered_pair_date.get((home_c, away_c, date_s)) or self.by_ordered_pair_date.get((away_c, home_c, date_s))
+
+    @classmethod
+    def from_text(cls, raw_data_string: str, team_mapping: Dict[str, str], delimiter: Optional[str] = None) -> "FixtureRegistry":
+        """Parse a fixture list with a header row; the delimiter (tab or comma) is taken from the header if not given"""
+        first_line = raw_data_string.lstrip().split("\n", 1)[0]
+        reader = csv.reader(io.StringIO(raw_data_string.lstrip()), delimiter=delimiter or ('\t' if '\t' in first_line else ','))
+        try: header = [name.strip() for name in next(reader)]
+        except StopIteration: print("ERROR: Fixture data is empty."); return cls([])
+        col = {name: i for i, name in enumerate(header)}
+        missing = [name for name in cls.REQUIRED_COLUMNS if name not in col]
+        if missing:
+            print(f"ERROR: Missing required columns in fixture data. Expected: {list(cls.REQUIRED_COLUMNS)}, Got: {header}")
+            return cls([])
+        optional = lambda row, name: row[col[name]].strip() if name in col else ""
+        records = []
+        for row in reader:
+            if len(row) < len(header): continue
+            home_team, away_team, starting_at = row[col['home_team_name']].strip(), row[col['away_team_name']].strip(), row[col['starting_at']].strip()
+            if not home_team or not away_team: continue
+            records.append(FixtureRecord(
+                fixture_id=row[col['fixture_id']].strip(), stage=optional(row, 'stage_name'), starting_at=starting_at,
+                date=starting_at.split(" ")[0] if starting_at else "N/A_Date", home_team=home_team, away_team=away_team,
+                home_canonical=get_canonical_team_name(home_team, team_mapping), away_canonical=get_canonical_team_name(away_team, team_mapping),
+                group=optional(row, 'group_name'), gw=row[col['GW']].strip(), stadium=optional(row, 'stadium')))
+        registry = cls(records)
+        print(f"INFO: Fixture registry built: {len(records)} fixtures, {len(registry.by_pair)} team pairs, {len(registry.by_gw)} GWs.")
+        return registry
+
+class TeamCleanSheetEntry(NamedTuple):
+    match_identifier: str  # "Home vs Away (date at stadium)" as shown by the CS endpoints
+    percentages: Dict[str, float]  # canonical team -> clean-sheet %
+
+def team_cs_key(team_a: str, team_b: str, date_s: str) -> Tuple[FrozenSet[str], str]:
+    """Team clean-sheet cache key: the canonical teams in either order, plus the match date"""
+    return frozenset({team_a, team_b}), date_s
+
+class PositionRegistry:
+    """
+    Compiled position taxonomy. Each distinct raw position string gets a small integer code, and the AGS
+    modifier, AAS modifier and defender flag per code sit in arrays, so per-player position handling is
+    array indexing. Code 0 is "no position" (None, NaN, empty). Append-only: a position first seen after
+    load is compiled on the spot and every code already handed out stays valid.
+    """
+    def __init__(self, positions: Any = ()):
+        self.labels: List[Optional[str]] = [None]
+        self._ags: List[float] = [DEFAULT_AGS_MODIFIER]
+        self._aas: List[float] = [DEFAULT_AAS_MODIFIER]
+        self._defender: List[bool] = [False]
+        self._codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._publish_arrays()
+        self.encode(positions)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if k != "_lock"}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _publish_arrays(self):
+        self.ags_modifiers = np.array(self._ags, dtype=float)
+        self.aas_modifiers = np.array(self._aas, dtype=float)
+        self.is_defender = np.array(self._defender, dtype=bool)
+
+    def _compile(self, new_positions: List[str]):
+        with self._lock:
+            added = {}
+            for pos in new_positions:
+                if pos in self._codes or pos in added: continue
+                added[pos] = len(self.labels)
+                self.labels.append(pos)
+                self._ags.append(get_position_modifier(pos, AGS_POSITIONAL_MODIFIERS, DEFAULT_AGS_MODIFIER))
+                self._aas.append(get_position_modifier(pos, AAS_POSITIONAL_MODIFIERS, DEFAULT_AAS_MODIFIER))
+                self._defender.append(_is_defensive_position(pos))
+            if not added: return
+            self._publish_arrays()
+            self._codes = {**self._codes, **added}  # published after the arrays, so a visible code is always in range
+
+    def code(self, position: Any) -> int:
+        if not isinstance(position, str) or not position: return 0
+        code = self._codes.get(position)
+        if code is None:
+            self._compile([position])
+            code = self._codes[position]
+        return code
+
+    def encode(self, positions: Any) -> np.ndarray:
+        positions = list(positions)
+        unseen = [pos for pos in positions if isinstance(pos, str) and pos and pos not in self._codes]
+        if unseen: self._compile(unseen)
+        codes = self._codes
+        return np.fromiter((codes.get(pos, 0) if isinstance(pos, str) else 0 for pos in positions), dtype=np.intp, count=len(positions))
+
+class DataState:
+    """
+    One immutable version of all derived data. A new version is assembled off to the side (`evolve` shares
+    every untouched structure) and published by rebinding DATA_STATE, a single reference assignment, so a
+    request that reads DATA_STATE once sees one consistent version without taking a lock. A superseded
+    version is freed as soon as the last request holding it finishes. Treat the contained dicts as read-only.
+
+    fixture_registry: FixtureRegistry over the fixture list; player_table: PlayerTable partitioned by team;
+    position_registry: PositionRegistry for every position in the xlsx and AGS JSON;
+    team_cs_percentages: team_cs_key() -> TeamCleanSheetEntry; fixture_id_to_cs_key: fixture_id -> team_cs_key();
+    base_fixtures: sorted App2 fixtures; ags_player_index: frozenset(teams) -> AGS lookup indexes;
+    match_history_contexts: per base fixture, each team's previous match; devig_method: None for the raw
+    prices (CS proportionally normalized, AGS as 1/odds), else the DEVIG_METHODS entry applied to every market.
+    """
+    FIELDS = (
+        "fixture_registry", "team_cs_percentages", "fixture_id_to_cs_key", "base_fixtures",
+        "player_table", "position_registry", "team_season_stats", "cs_odds_lookup", "ags_odds_lookup", "ags_player_index",
+        "correct_score_matrix_index", "team_strength_metrics", "match_history_contexts", "fixture_fdr_metrics", "devig_method",
+    )
+    __slots__ = FIELDS + ("version", "_combined_stats_index")
+
+    def __init__(self, version: int, combined_stats_index: Any = None, **fields: Any):
+        for name in self.FIELDS: object.__setattr__(self, name, fields.get(name))
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "_combined_stats_index", combined_stats_index)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"DataState is immutable; use evolve() to derive a new version (tried to set '{name}').")
+
+    @classmethod
+    def empty(cls) -> "DataState":
+        return cls(0, fixture_registry=FixtureRegistry([]), team_cs_percentages={}, fixture_id_to_cs_key={}, base_fixtures=[],
+                   player_table=None, position_registry=PositionRegistry(), team_season_stats={}, cs_odds_lookup={}, ags_odds_lookup={}, ags_player_index={},
+                   correct_score_matrix_index={}, team_strength_metrics={}, match_history_contexts=[], fixture_fdr_metrics={})
+
+    def fields(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def evolve(self, version: int, combined_stats_index: Any = None, **changes: Any) -> "DataState":
+        return DataState(version, combined_stats_index, **{**self.fields(), **changes})
+
+    @property
+    def combined_stats_index(self) -> Any:
+        return self._combined_stats_index
+
+    def memoize_combined_stats_index(self, index: Any) -> Any:
+        """The one write-once slot: the serialized combined-stats index, derived lazily from this version"""
+        object.__setattr__(self, "_combined_stats_index", index)
+        return index
+
+DATA_STATE: DataState = DataState.empty()  # Rebound, never mutated, whenever the derived data is (re)built
 
 # --- Pydantic Models ---
 class TeamCleanSheet(BaseModel):
@@ -314,6 +583,49 @@ class PlayerCombinedStats(BaseModel):
     anytime_assist_probability: float; aas_prob_source: str
     clean_sheet_probability: float
 
+class GroupTeamSimulation(BaseModel):
+    team_name_canonical: str
+    position_probabilities: List[float]  # P(finish 1st), P(2nd), ... as percentages
+    qualification_probability: float
+    expected_points: float
+
+class GroupSimulation(BaseModel):
+    group: str
+    simulations: int
+    seed: int
+    teams: List[GroupTeamSimulation]
+
+class TeamRating(BaseModel):
+    team_name_canonical: str
+    attack: float
+    defence: float
+    observations: int  # markets the team appears in
+    xg_vs_average: float  # expected goals against a team with zero ratings
+
+class TeamProbability(BaseModel):
+    team_name_canonical: str
+    probability: float
+
+class KnockoutCandidate(BaseModel):
+    team_name_canonical: str
+    probability: float  # P(this team fills the slot)
+    advance_probability: float  # P(team fills the slot and wins the match)
+    expected_opponent: Optional[str]  # most likely opponent, given the team plays
+    expected_opponent_probability: float
+    expected_xg: float  # the team's xG in this match, given it plays
+
+class KnockoutFixture(BaseModel):
+    match_number: int
+    stage: str
+    date_str: str
+    home_slot: str
+    away_slot: str
+    home_candidates: List[KnockoutCandidate]
+    away_candidates: List[KnockoutCandidate]
+    expected_home_xg: float
+    expected_away_xg: float
+    winner_probabilities: List[TeamProbability]
+
 class MatchWithPlayerCombinedStats(BaseModel):
     fixture_id: str; GW: str; date_str: str
     home_team_canonical: str; away_team_canonical: str
@@ -410,13 +722,11 @@ def validate_and_adjust_xg(home_xg: float, away_xg: float,
 def calculate_realistic_clean_sheet_probability(
     team_cs_percentage: float, 
     player_position: Optional[str],
-    team_xg_against: float
+    team_xg_against: float,
+    is_defender: Optional[bool] = None
 ) -> float:
-    """Calculate more realistic clean sheet probabilities"""
-    if not player_position or not any(
-        def_pos.lower() in str(player_position).lower() 
-        for def_pos in DEFENSIVE_POSITIONS
-    ):
+    """Calculate more realistic clean sheet probabilities (`is_defender` skips the position scan when precompiled)"""
+    if not (_is_defensive_position(player_position) if is_defender is None else is_defender):
         return 0.0
     
     # Base probability from odds
@@ -429,6 +739,65 @@ def calculate_realistic_clean_sheet_probability(
     
     return apply_probability_caps(base_cs_prob, 'cs')
 
+class DataFileCache:
+    """
+    Read-through cache for files under DATA_DIR. An entry is reused while the file's (mtime, size, inode)
+    is unchanged, so a hit costs one os.stat and no reads. A per-file lock makes concurrent misses load once.
+    Cached objects are shared between callers and must be treated as read-only.
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Any], Tuple[Tuple[int, int, int], Any]] = {}
+        self._locks: Dict[Tuple[str, Any], threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_signature(file_path: str) -> Tuple[int, int, int]:
+        st = os.stat(file_path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _lock_for(self, key: Tuple[str, Any]) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _count(self, hit: bool):
+        with self._guard:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def get(self, file_path: str, loader) -> Any:
+        key = (os.path.abspath(file_path), loader)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == self.file_signature(file_path):
+            self._count(hit=True); return entry[1]
+        with self._lock_for(key):
+            signature = self.file_signature(file_path)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._count(hit=True); return entry[1]
+            value = loader(file_path)
+            self._entries[key] = (signature, value)
+            self._count(hit=False)
+            return value
+
+    def invalidate(self, file_path: Optional[str] = None):
+        with self._guard:
+            for key in [k for k in self._entries if file_path is None or k[0] == os.path.abspath(file_path)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+DATA_FILE_CACHE = DataFileCache()
+
+def _read_json_file(file_path: str) -> Any:
+    with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
+
+def _read_text_file(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as f: return f.read()
+
 def load_json_data(file_path: str) -> Optional[Dict]:
     if not os.path.exists(file_path):
         print(f"ERROR: Data file '{file_path}' not found.")
@@ -436,11 +805,97 @@ def load_json_data(file_path: str) -> Optional[Dict]:
              raise FileNotFoundError(f"Critical data file '{file_path}' not found.")
         return None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f: data = json.load(f)
-        return data
+        return DATA_FILE_CACHE.get(file_path, _read_json_file)
     except Exception as e: raise HTTPException(status_code=500, detail=f"Error loading '{file_path}': {e}")
 
+TEAM_NAME_SUFFIXES_TO_REMOVE = [" fc", " cf", " rj", " fr", " hd", " sc", " ac", " c.f.", " c. f.", " c f", " de ", " e ", " ba", " münchen", " riyadh", " abu dhabi", " casablanca", " hyundai", " football club", " de futebol e regatas", "esportiva ", "athletic "]
+TEAM_NAME_PUNCTUATION_TO_REMOVE = ".()-&"
+
+def _normalize_team_name_for_match(name_lower: str) -> str:
+    for suffix in TEAM_NAME_SUFFIXES_TO_REMOVE: name_lower = name_lower.replace(suffix, "")
+    for punc in TEAM_NAME_PUNCTUATION_TO_REMOVE: name_lower = name_lower.replace(punc, "")
+    return name_lower.strip().replace(" ", "")
+
+class TeamNameResolver:
+    """
+    Constant-time canonical team name lookups. The lowercased and normalized forms of every mapping key
+    and value are indexed once, in mapping order, so the first hit matches what a linear scan would return.
+    Results (including unresolved names) are memoized per stripped input.
+    """
+    def __init__(self, mapping: Dict[str, str], team_details: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.mapping = mapping
+        self.source_len = len(mapping)
+        self._exact = dict(mapping)
+        if team_details:
+            for team_name_detail_key, details_val in team_details.items():
+                if team_name_detail_key not in self._exact: self._exact[team_name_detail_key] = team_name_detail_key
+                if isinstance(details_val.get("api_id"), int): self._exact[str(details_val["api_id"])] = team_name_detail_key
+        self._canonical_values = set(self._exact.values())
+        self._by_lower: Dict[str, str] = {}
+        self._by_normalized: Dict[str, str] = {}
+        for map_key, canonical_val in self._exact.items():
+            self._by_lower.setdefault(map_key.lower(), canonical_val)
+            self._by_normalized.setdefault(_normalize_team_name_for_match(map_key.lower()), canonical_val)
+            self._by_normalized.setdefault(_normalize_team_name_for_match(canonical_val.lower()), canonical_val)
+        self._memo: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def is_current_for(self, mapping: Dict[str, str]) -> bool:
+        return self.mapping is mapping and self.source_len == len(mapping)
+
+    def resolve(self, name_from_source: Any) -> str:
+        name_stripped = str(name_from_source).strip()
+        cached = self._memo.get(name_stripped)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        result = self._resolve_uncached(name_stripped)
+        self._memo[name_stripped] = result
+        return result
+
+    def resolve_known(self, name_from_source: Any) -> Optional[str]:
+        """
+        For untrusted input (query strings): the canonical name, or None if the name matches no known team.
+        Nothing is memoized, so arbitrary client strings cannot grow the memo.
+        """
+        result = self._resolve_uncached(str(name_from_source).strip())
+        return result if result in self._canonical_values else None
+
+    def _resolve_uncached(self, name_stripped: str) -> str:
+        if not name_stripped: return "N/A_EmptyName"
+        if name_stripped in self._exact: return self._exact[name_stripped]
+        if name_stripped in self._canonical_values: return name_stripped
+        name_lower = name_stripped.lower()
+        if name_lower in self._by_lower: return self._by_lower[name_lower]
+        return self._by_normalized.get(_normalize_team_name_for_match(name_lower), name_stripped)
+
+TEAM_NAME_RESOLVER: Optional[TeamNameResolver] = None
+_TEAM_NAME_RESOLVERS_BY_MAPPING: Dict[int, TeamNameResolver] = {}
+
+def get_team_name_resolver(mapping: Dict[str, str]) -> TeamNameResolver:
+    """Resolver for `mapping`, rebuilt if the mapping has grown since it was indexed"""
+    global TEAM_NAME_RESOLVER
+    resolver = _TEAM_NAME_RESOLVERS_BY_MAPPING.get(id(mapping))
+    if resolver is None or not resolver.is_current_for(mapping):
+        resolver = TeamNameResolver(mapping, TEAM_DETAILS if mapping is TEAM_NAME_MAPPING else None)
+        _TEAM_NAME_RESOLVERS_BY_MAPPING[id(mapping)] = resolver
+        if mapping is TEAM_NAME_MAPPING: TEAM_NAME_RESOLVER = resolver
+    return resolver
+
 def get_canonical_team_name(name_from_source: Any, mapping: Dict[str, str]) -> str:
+    return get_team_name_resolver(mapping).resolve(name_from_source)
+
+def resolve_team_query(team: Optional[str]) -> Optional[str]:
+    """Canonical name for a `team` query parameter (None passes through); 404 if it matches no known team"""
+    if team is None: return None
+    team_c = get_team_name_resolver(TEAM_NAME_MAPPING).resolve_known(team)
+    if team_c is None: raise HTTPException(status_code=404, detail=f"Unknown team '{team}'.")
+    return team_c
+
+def _scan_canonical_team_name(name_from_source: Any, mapping: Dict[str, str]) -> str:
+    """Reference linear-scan resolution; TeamNameResolver must agree with it on every input"""
     name_from_source_stripped = str(name_from_source).strip()
     if not name_from_source_stripped: return "N/A_EmptyName"
     if name_from_source_stripped in mapping: return mapping[name_from_source_stripped]
@@ -448,8 +903,7 @@ def get_canonical_team_name(name_from_source: Any, mapping: Dict[str, str]) -> s
     name_lower = name_from_source_stripped.lower()
     for map_key, canonical_val in mapping.items():
         if name_lower == map_key.lower(): return canonical_val
-    suffixes_to_remove = [" fc", " cf", " rj", " fr", " hd", " sc", " ac", " c.f.", " c. f.", " c f", " de ", " e ", " ba", " münchen", " riyadh", " abu dhabi", " casablanca", " hyundai", " football club", " de futebol e regatas", "esportiva ", "athletic "]
-    punctuation_to_remove = ".()-&"
+    suffixes_to_remove, punctuation_to_remove = TEAM_NAME_SUFFIXES_TO_REMOVE, TEAM_NAME_PUNCTUATION_TO_REMOVE
     temp_name_norm = name_lower
     for suffix in suffixes_to_remove: temp_name_norm = temp_name_norm.replace(suffix, "")
     for punc in punctuation_to_remove: temp_name_norm = temp_name_norm.replace(punc, "")
@@ -469,106 +923,67 @@ def get_canonical_team_name(name_from_source: Any, mapping: Dict[str, str]) -> s
         return mapping[name_from_source_stripped]
     return name_from_source_stripped
 
-def load_and_prepare_fixture_data_for_app1_lookup(raw_data_string: str, team_mapping: Dict[str, str]):
-    global FIXTURE_LOOKUP_MAP
-    FIXTURE_LOOKUP_MAP = {}
-    data_io = io.StringIO(raw_data_string)
-    reader = csv.reader(data_io, delimiter='\t')
-    try: header = next(reader)
-    except StopIteration: print("ERROR: Fixture data string for App1 lookup is empty."); return
-    for i, row in enumerate(reader):
-        if len(row) < 9: continue
-        fixture_id_fixture = row[0].strip()
-        home_team_original_fixture = row[3].strip()
-        away_team_original_fixture = row[4].strip()
-        gw_fixture = row[8].strip()
-        fixture_datetime_str = row[2].strip()
-        fixture_date_fixture = fixture_datetime_str.split(" ")[0] if fixture_datetime_str else "N/A_Date"
-        group_fixture = row[5].strip()
-        if not home_team_original_fixture or not away_team_original_fixture or "Winner Match" in home_team_original_fixture or "1st Group" in home_team_original_fixture or "Winner Match" in away_team_original_fixture or "2nd Group" in away_team_original_fixture:
-            continue
-        canonical_home_fixture = get_canonical_team_name(home_team_original_fixture, team_mapping)
-        canonical_away_fixture = get_canonical_team_name(away_team_original_fixture, team_mapping)
-        if canonical_home_fixture.startswith("N/A_") or canonical_away_fixture.startswith("N/A_"): continue
-        map_key = frozenset({canonical_home_fixture, canonical_away_fixture})
-        fixture_details_to_store = {
-            "fixture_id": fixture_id_fixture, "GW": gw_fixture, "fixture_date": fixture_date_fixture,
-            "group": group_fixture, "_fixture_original_home": home_team_original_fixture,
-            "_fixture_original_away": away_team_original_fixture, "_canonical_home_fixture": canonical_home_fixture,
-            "_canonical_away_fixture": canonical_away_fixture,
-        }
-        FIXTURE_LOOKUP_MAP[map_key] = fixture_details_to_store
-    print(f"INFO: App1 Fixture lookup map populated with {len(FIXTURE_LOOKUP_MAP)} entries.")
-
-def _populate_fixture_id_gw_lookup_for_app2(raw_data_string: str, team_mapping: Dict[str, str]):
-    global FIXTURE_ID_GW_LOOKUP
-    FIXTURE_ID_GW_LOOKUP = {}
-    data_io = io.StringIO(raw_data_string)
-    reader = csv.reader(data_io, delimiter='\t')
-    try:
-        header = next(reader)
-    except StopIteration:
-        print("ERROR: Fixture ID/GW data string for App2 is empty.")
-        return
-    col_indices = {name.strip(): i for i, name in enumerate(header)}
-    required_cols = ['fixture_id', 'home_team_name', 'away_team_name', 'starting_at', 'GW']
-    if not all(col in col_indices for col in required_cols):
-        print(f"ERROR: Missing required columns in fixture data for App2 ID/GW lookup. Expected: {required_cols}, Got: {header}")
-        return
-    for i, row in enumerate(reader):
-        if len(row) < len(header): continue
-        try:
-            fixture_id_fixture = row[col_indices['fixture_id']].strip()
-            home_team_original = row[col_indices['home_team_name']].strip()
-            away_team_original = row[col_indices['away_team_name']].strip()
-            starting_at_str = row[col_indices['starting_at']].strip()
-            gw_fixture = row[col_indices['GW']].strip()
-            if not all([fixture_id_fixture, home_team_original, away_team_original, starting_at_str, gw_fixture]): continue
-            fixture_date_str = starting_at_str.split(" ")[0]
-            if not re.match(r"^\d{4}-\d{2}-\d{2}$", fixture_date_str): continue
-            canonical_home = get_canonical_team_name(home_team_original, team_mapping)
-            canonical_away = get_canonical_team_name(away_team_original, team_mapping)
-            if "N/A" in canonical_home or "N/A" in canonical_away or canonical_home.startswith("N/A_") or canonical_away.startswith("N/A_"): continue
-            lookup_key = (canonical_home, canonical_away, fixture_date_str)
-            FIXTURE_ID_GW_LOOKUP[lookup_key] = {"fixture_id": fixture_id_fixture, "GW": gw_fixture}
-        except Exception as e:
-            print(f"ERROR processing App2 fixture row {i+2} for ID/GW lookup: {row} - {e}")
-    print(f"INFO: App2 Fixture ID/GW lookup populated with {len(FIXTURE_ID_GW_LOOKUP)} entries.")
-
-def create_base_fixtures_with_canonical_names_from_hardcoded_for_app2(
-    user_provided_fixtures: List[Dict[str, Any]],
-    team_map: Dict[str, str],
-    fixture_id_gw_provider: Dict[Tuple[str, str, str], Dict[str, str]]
-) -> List[Dict[str, Any]]:
-    global ALL_BASE_FIXTURES
-    ALL_BASE_FIXTURES = []
+def collect_team_names_from_data_files() -> List[str]:
+    """Every raw team name appearing in the fixture data, the JSON/XLSX inputs and the outright odds"""
+    names = set(TEAM_NAME_MAPPING.keys()) | set(TEAM_NAME_MAPPING.values())
+    names.update(team for rec in FixtureRegistry.from_text(read_fixture_list_text(), TEAM_NAME_MAPPING).records for team in (rec.home_team, rec.away_team))
+    for fix in USER_PROVIDED_FIXTURES_WITH_STADIUMS_RAW: names.update([fix.get('home_team', ''), fix.get('away_team', '')])
+    for file_path in [CORRECT_SCORE_FILE_PATH, UNIFIED_ANYTIME_GOALSCORER_FILE_PATH]:
+        if not os.path.exists(file_path): continue
+        with open(file_path, 'r', encoding='utf-8') as f: data = json.load(f)
+        for match in data.get('matches', []):
+            names.update(part for part in str(match.get('match', '')).split(" vs "))
+            names.update([match.get('home_team', ''), match.get('away_team', '')])
+            names.update(p.get('team', '') for p in match.get('players', []) or [])
+    if os.path.exists(PLAYER_STATS_FP):
+        df_teams = pd.read_excel(PLAYER_STATS_FP, sheet_name='Sheet1')
+        names.update(str(x) for x in df_teams.get('Team Name', df_teams.get('Team', pd.Series(dtype=object))))
+    names.update(item['raw_team_name'] for item in parse_html_for_odds(HTML_ODDS_FP) + parse_markdown_for_odds(MD_ODDS_FP))
+    return sorted(str(n) for n in names if n is not None)
+
+def read_fixture_list_text(fixtures_fp: str = FIXTURES_FILE_PATH) -> str:
+    """The external TSV/CSV fixture list if one is configured, otherwise the embedded tournament fixtures"""
+    if not fixtures_fp: return FULL_FIXTURE_DATA_RAW
+    with open(fixtures_fp, 'r', encoding='utf-8-sig') as f: return f.read()
+
+def fixture_venue_table(fixtures_with_stadiums: List[Dict[str, Any]], team_map: Dict[str, str]) -> Dict[Tuple[str, str, str], Tuple[int, str]]:
+    """
+    (home, away, date) -> (position in the embedded venue list, stadium). The stadium fills fixture lists
+    without a stadium column; the position orders fixtures that kick off at the same time.
+    """
+    venues = {}
+    for listing_pos, fix_data in enumerate(fixtures_with_stadiums):
+        home_c, away_c = get_canonical_team_name(str(fix_data.get('home_team', '')).strip(), team_map), get_canonical_team_name(str(fix_data.get('away_team', '')).strip(), team_map)
+        if fix_data.get('stadium') and fix_data.get('date'): venues[(home_c, away_c, fix_data['date'])] = (listing_pos, fix_data['stadium'])
+    return venues
+
+def create_base_fixtures_from_registry(fixture_registry: FixtureRegistry, venues: Dict[Tuple[str, str, str], Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """
+    The App2 fixtures: every registry row with two known teams and a kickoff time, sorted by kickoff and
+    de-duplicated by fixture id (or teams and date when a row has no id). A row without a stadium takes
+    it from `venues`, either team order. Fixtures sharing a kickoff follow the venue list, then registry
+    order for fixtures it does not list, so the result does not depend on the fixture file's row order.
+    """
     processed_fixtures_temp = []
-    for fix_data in user_provided_fixtures:
-        home_raw, away_raw = str(fix_data.get('home_team','')).strip(), str(fix_data.get('away_team','')).strip()
-        home_c, away_c = get_canonical_team_name(home_raw, team_map), get_canonical_team_name(away_raw, team_map)
-        date_s, time_s = fix_data.get('date'), fix_data.get('time')
-        if not all([home_c, away_c, date_s, time_s]) or home_c == away_c or home_c.startswith("N/A_") or away_c.startswith("N/A_"): continue
-        try:
-            time_s_corrected = time_s
-            if time_s == "24:00":
-                dt_obj = datetime_cls.strptime(date_s, '%Y-%m-%d') + timedelta(days=1)
-                time_s_corrected = "12:00 AM"
-            else: dt_obj = datetime_cls.strptime(f"{date_s} {time_s}", '%Y-%m-%d %I:%M %p')
-            date_obj_only = dt_obj.date()
-            fixture_extra_info = fixture_id_gw_provider.get(
-                (home_c, away_c, date_s),
-                fixture_id_gw_provider.get((away_c, home_c, date_s),
-                {"fixture_id": f"NO_ID_FOR_{home_c}_vs_{away_c}_{date_s}", "GW": "N/A_GW"})
-            )
-            processed_fixtures_temp.append({
-                'home_team_canonical': home_c, 'away_team_canonical': away_c,
-                'date_str': date_s, 'time_str': time_s_corrected, 'stadium': fix_data.get('stadium'),
-                'group': fix_data.get('group'), 'date_dt': date_obj_only, 'datetime_obj': dt_obj,
-                'fixture_id': fixture_extra_info['fixture_id'], 'GW': fixture_extra_info['GW']
-            })
-        except ValueError as e: print(f"ERROR parsing fixture date/time for {fix_data}: {e}")
+    for row_pos, rec in enumerate(fixture_registry.records):
+        home_c, away_c, date_s = rec.home_canonical, rec.away_canonical, rec.date
+        if fixture_registry.is_placeholder(rec) or home_c == away_c or home_c.startswith("N/A_") or away_c.startswith("N/A_"): continue
+        dt_obj = None
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+            try: dt_obj = datetime_cls.strptime(rec.starting_at, fmt); break
+            except ValueError: continue
+        if dt_obj is None: print(f"ERROR parsing fixture date/time for {rec.home_team} vs {rec.away_team}: '{rec.starting_at}'"); continue
+        listing_pos, venue_stadium = venues.get((home_c, away_c, date_s)) or venues.get((away_c, home_c, date_s)) or (len(venues), None)
+        processed_fixtures_temp.append(((dt_obj, listing_pos, row_pos), {
+            'home_team_canonical': home_c, 'away_team_canonical': away_c,
+            'date_str': date_s, 'time_str': dt_obj.strftime('%I:%M %p'),
+            'stadium': rec.stadium or venue_stadium,
+            'group': rec.group.removeprefix("Group ").strip() or None, 'date_dt': dt_obj.date(), 'datetime_obj': dt_obj,
+            'fixture_id': rec.fixture_id or f"NO_ID_FOR_{home_c}_vs_{away_c}_{date_s}",
+            'GW': rec.gw or "N/A_GW"
+        }))
     final_fixtures_list, final_unique_keys = [], set()
-    for fix in sorted(processed_fixtures_temp, key=lambda x: x['datetime_obj']):
+    for _, fix in sorted(processed_fixtures_temp, key=lambda x: x[0]):
         key_primary, key_fallback = fix['fixture_id'], (fix['home_team_canonical'], fix['away_team_canonical'], fix['date_str'])
         if not key_primary.startswith("NO_ID_FOR_"):
             if key_primary not in final_unique_keys:
@@ -576,15 +991,14 @@ def create_base_fixtures_with_canonical_names_from_hardcoded_for_app2(
         else:
              if key_fallback not in final_unique_keys:
                 final_fixtures_list.append(fix); final_unique_keys.add(key_fallback)
-    ALL_BASE_FIXTURES = final_fixtures_list
-    print(f"INFO: Created {len(ALL_BASE_FIXTURES)} unique base fixtures for App2.")
-    return ALL_BASE_FIXTURES
+    print(f"INFO: Created {len(final_fixtures_list)} unique base fixtures for App2.")
+    return final_fixtures_list
 
 def parse_html_for_odds(file_path):
     teams_data = []
     if not os.path.exists(file_path): return teams_data
     try:
-        with open(file_path, 'r', encoding='utf-8') as f: html_content = f.read()
+        html_content = DATA_FILE_CACHE.get(file_path, _read_text_file)
         soup = BeautifulSoup(html_content, 'html.parser')
         for row in soup.select('div[data-testid="outrights-table-row"]'):
             team_name_el = row.select_one('div[data-testid="outrights-participant-name"] p')
@@ -602,7 +1016,7 @@ def parse_markdown_for_odds(file_path):
     teams_data = []
     if not os.path.exists(file_path): return teams_data
     try:
-        with open(file_path, 'r', encoding='utf-8') as f: content = f.read()
+        content = DATA_FILE_CACHE.get(file_path, _read_text_file)
         pattern = re.compile(r"!\[(?:.*?)\]\(https?://.*?\)\s*\n*\s*(.*?)\s*\n*\s*(?:\d+\.?\d*)\s*\n*\s*([+-]\d+)\s*", re.MULTILINE)
         matches = pattern.findall(content)
         for raw_name, odds_text in matches:
@@ -626,38 +1040,37 @@ def get_tournament_outright_odds_data_for_app2(html_fp, md_fp, team_map):
         processed_odds.append({'team_name_canonical': canonical_name, 'implied_prob': 1.0 / item['decimal_odds']})
     return pd.DataFrame(processed_odds) if processed_odds else pd.DataFrame()
 
-def normalize_tournament_implied_probs_for_app2(df_odds, all_fixture_teams_canonical):
-    global TEAM_STRENGTH_METRICS
+def normalize_tournament_implied_probs_for_app2(df_odds, all_fixture_teams_canonical, strength_metrics: Dict[str, float]):
     default_strength_value = 10.0
     if df_odds.empty or 'implied_prob' not in df_odds.columns:
-        for team_c in all_fixture_teams_canonical: TEAM_STRENGTH_METRICS[team_c] = default_strength_value
+        for team_c in all_fixture_teams_canonical: strength_metrics[team_c] = default_strength_value
         print("WARNING: Outright odds DF empty. Using default strength for App2."); return
     df_valid = df_odds[df_odds['implied_prob'] > 0].copy()
     if df_valid.empty:
-        for team_c in all_fixture_teams_canonical: TEAM_STRENGTH_METRICS[team_c] = default_strength_value
+        for team_c in all_fixture_teams_canonical: strength_metrics[team_c] = default_strength_value
         print("WARNING: No valid implied probabilities. Using default strength for App2."); return
     total_implied_prob = df_valid['implied_prob'].sum()
     df_valid['norm_prob'] = 0.0 if total_implied_prob < 1e-9 else df_valid['implied_prob'] / total_implied_prob
     max_norm_prob = df_valid['norm_prob'].max()
     df_valid['strength_metric'] = default_strength_value if max_norm_prob < 1e-9 else (df_valid['norm_prob'] / max_norm_prob) * 90.0 + 10.0
-    for _, row in df_valid.iterrows(): TEAM_STRENGTH_METRICS[row['team_name_canonical']] = row['strength_metric']
+    for _, row in df_valid.iterrows(): strength_metrics[row['team_name_canonical']] = row['strength_metric']
     for team_c in all_fixture_teams_canonical:
-        if team_c not in TEAM_STRENGTH_METRICS: TEAM_STRENGTH_METRICS[team_c] = default_strength_value
-    print(f"INFO: App2 Team strength metrics calculated for {len(TEAM_STRENGTH_METRICS)} teams.")
+        if team_c not in strength_metrics: strength_metrics[team_c] = default_strength_value
+    print(f"INFO: App2 Team strength metrics calculated for {len(strength_metrics)} teams.")
 
-def create_last_match_dates_history_for_app2(sorted_fixtures_canonical: List[Dict[str,Any]]):
-    global MATCH_HISTORY_CONTEXTS
-    MATCH_HISTORY_CONTEXTS = []
+def create_last_match_dates_history_for_app2(sorted_fixtures_canonical: List[Dict[str,Any]]) -> List[Dict[str, Optional[Dict[str, Any]]]]:
+    match_history_contexts: List[Dict[str, Optional[Dict[str, Any]]]] = []
     team_last_match_info: Dict[str, Dict[str, Any]] = { team_c: None for fix in sorted_fixtures_canonical for team_c in (fix['home_team_canonical'], fix['away_team_canonical']) }
     for fixture in sorted_fixtures_canonical:
         home_c, away_c = fixture['home_team_canonical'], fixture['away_team_canonical']
         current_match_context = {home_c: team_last_match_info[home_c].copy() if team_last_match_info[home_c] else None, away_c: team_last_match_info[away_c].copy() if team_last_match_info[away_c] else None}
-        MATCH_HISTORY_CONTEXTS.append(current_match_context)
+        match_history_contexts.append(current_match_context)
         match_date, match_stadium = fixture.get('date_dt'), fixture.get('stadium')
         if match_date and match_stadium:
             team_last_match_info[home_c] = {'date': match_date, 'venue': match_stadium}
             team_last_match_info[away_c] = {'date': match_date, 'venue': match_stadium}
-    print(f"INFO: App2 Match history contexts created for {len(MATCH_HISTORY_CONTEXTS)} fixtures.")
+    print(f"INFO: App2 Match history contexts created for {len(match_history_contexts)} fixtures.")
+    return match_history_contexts
 
 def get_venue_impact_for_app2(home_team_canonical: str, away_team_canonical: str, stadium: Optional[str]):
     HOME_VENUES_CWC = {"Hard Rock Stadium, Miami Gardens, FL": "Inter Miami CF", "Lumen Field, Seattle, WA": "Seattle Sounders FC"}
@@ -681,15 +1094,15 @@ def calculate_fatigue_impact_for_app2(team_canonical: str, current_match_date_ob
     fatigue_score = 15 if rest_days < 2 else 8 if rest_days == 2 else 0 if rest_days < 5 else -5 if rest_days < 7 else -10
     return fatigue_score + (5 if cross_country_travel else 0)
 
-def calculate_outright_fdr_components_for_app2(fixture: Dict[str, Any], team_strengths_map: Dict[str, float], match_history_for_fixture: Optional[Dict[str, Any]]):
-    global FIXTURE_FDR_METRICS_CACHE
+def calculate_outright_fdr_components_for_app2(fixture: Dict[str, Any], team_strengths_map: Dict[str, float], match_history_for_fixture: Optional[Dict[str, Any]],
+                                             fdr_cache: Dict[str, Dict[str, float]]):
     fixture_id = fixture.get('fixture_id', 'unknown_fixture')
-    if fixture_id in FIXTURE_FDR_METRICS_CACHE: return FIXTURE_FDR_METRICS_CACHE[fixture_id]
+    if fixture_id in fdr_cache: return fdr_cache[fixture_id]
     home_c, away_c = fixture['home_team_canonical'], fixture['away_team_canonical']
     date_dt_obj = fixture.get('date_dt')
     stadium = fixture.get('stadium')
     if not date_dt_obj or not isinstance(date_dt_obj, date_cls):
-        FIXTURE_FDR_METRICS_CACHE[fixture_id] = {'home_fdr_outright': 50.0, 'away_fdr_outright': 50.0}; return FIXTURE_FDR_METRICS_CACHE[fixture_id]
+        fdr_cache[fixture_id] = {'home_fdr_outright': 50.0, 'away_fdr_outright': 50.0}; return fdr_cache[fixture_id]
     h_base_fdr_component, a_base_fdr_component = team_strengths_map.get(away_c, 10.0), team_strengths_map.get(home_c, 10.0)
     ven_h_impact, ven_a_impact = get_venue_impact_for_app2(home_c, away_c, stadium)
     east_stadiums_lower = {s.lower().strip() for s in ["Hard Rock Stadium, Miami Gardens, FL", "MetLife Stadium, East Rutherford, NJ", "Lincoln Financial Field, Philadelphia, PA", "GEODIS Park, Nashville, TN", "Bank of America Stadium, Charlotte, NC", "Mercedes-Benz Stadium, Atlanta, GA", "Inter&Co Stadium, Orlando, FL", "Audi Field, Washington, D.C.", "Camping World Stadium, Orlando, FL", "TQL Stadium, Cincinnati, OH"]}
@@ -706,7 +1119,7 @@ def calculate_outright_fdr_components_for_app2(fixture: Dict[str, Any], team_str
     home_fdr_scaled = np.clip(home_fdr_raw / 1.5 + 25, 1, 99)
     away_fdr_scaled = np.clip(away_fdr_raw / 1.5 + 25, 1, 99)
     result = {'home_fdr_outright': round(home_fdr_scaled, 1), 'away_fdr_outright': round(away_fdr_scaled, 1)}
-    FIXTURE_FDR_METRICS_CACHE[fixture_id] = result; return result
+    fdr_cache[fixture_id] = result; return result
 
 def estimate_xg_from_fdr_outrights_for_app2(h_fdr: Optional[float], a_fdr: Optional[float], avg_goals: float = AVERAGE_TOTAL_GOALS_IN_MATCH) -> Tuple[float, float]:
     if pd.isna(h_fdr) or pd.isna(a_fdr) or h_fdr is None or a_fdr is None: return avg_goals / 2.0, avg_goals / 2.0
@@ -736,132 +1149,172 @@ def parse_cs_match_string_for_canonical_teams_for_app2(match_str: str, team_map:
     if home_canonical.startswith("N/A_") or away_canonical.startswith("N/A_") or "UnknownTeam" in [home_raw, away_raw]: return None, None
     return home_canonical, away_canonical
 
-def calculate_xg_from_cs_odds_for_app2(cs_odds_dict: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
-    if not cs_odds_dict: return None, None
-    home_xg_calc, away_xg_calc, total_inv_odds_sum, score_goal_probs = 0.0, 0.0, 0.0, []
-    for score_str, odd_value_any in cs_odds_dict.items():
-        try:
-            odd_value = float(odd_value_any)
-            if odd_value <= 1.0: continue
-            inv_odd = 1.0 / odd_value
-            score_parts = str(score_str).split('-')
-            if len(score_parts) == 2:
-                score_goal_probs.append({'h_goals': int(score_parts[0]), 'a_goals': int(score_parts[1]), 'inv_odd': inv_odd})
-                total_inv_odds_sum += inv_odd
-        except (ValueError, TypeError): continue
-    if total_inv_odds_sum == 0: return None, None
-    for item in score_goal_probs:
-        norm_prob = item['inv_odd'] / total_inv_odds_sum
-        home_xg_calc += item['h_goals'] * norm_prob
-        away_xg_calc += item['a_goals'] * norm_prob
-    return round(home_xg_calc, 3), round(away_xg_calc, 3)
-
-def get_player_direct_ags_prob_for_app2(player_name_to_match: str, excel_player_id: Optional[str], excel_player_api_id: Optional[str], player_team_canonical: str, match_home_canonical: str, match_away_canonical: str) -> Optional[float]:
-    global AGS_ODDS_LOOKUP
-    lookup_key = frozenset({match_home_canonical, match_away_canonical})
-
-    if lookup_key not in AGS_ODDS_LOOKUP:
-        return None
-
-    for ags_player_data in AGS_ODDS_LOOKUP[lookup_key]:
-        ags_player_name = str(ags_player_data.get('player', '')).strip()
-        ags_player_team_c = get_canonical_team_name(str(ags_player_data.get('team', '')).strip(), TEAM_NAME_MAPPING)
-        ags_player_id_json = str(ags_player_data.get('player_id')) if pd.notna(ags_player_data.get('player_id')) else None
-        ags_player_api_id_json = str(ags_player_data.get('player_api_id')) if pd.notna(ags_player_data.get('player_api_id')) else None
-        
-        match_found = (
-            (excel_player_id and ags_player_id_json and excel_player_id == ags_player_id_json) or
-            (excel_player_api_id and ags_player_api_id_json and excel_player_api_id == ags_player_api_id_json) or
-            (ags_player_name.lower() == player_name_to_match.lower() and ags_player_team_c == player_team_canonical)
-        )
-
-        if match_found:
-            try:
-                odds = float(ags_player_data.get('odds'))
-                return 1.0 / odds if odds > 1.0 else None
-            except (ValueError, TypeError, ZeroDivisionError): continue
-    return None
+# --- Margin Removal ---
+def _bisect_batch(fair_probs: Callable[[np.ndarray], np.ndarray], lo: np.ndarray, hi: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Per-row bisection on a parameter whose (M, K) fair probabilities sum to less as it grows"""
+    for _ in range(DEVIG_BISECTION_STEPS):
+        mid = (lo + hi) / 2.0
+        too_big = fair_probs(mid).sum(axis=1) > targets
+        lo, hi = np.where(too_big, mid, lo), np.where(too_big, hi, mid)
+    return fair_probs((lo + hi) / 2.0)
 
-# --- Enhanced Main Calculation Function ---
-def _calculate_player_probabilities(
-    player_name: str, p_pos: Optional[str], p_id_excel: Optional[str], p_api_id_excel: Optional[str],
-    team_canon: str, p_goals: float, p_assists: float, team_goals: float, team_assists: float,
-    team_match_xg: float, match_home_c: str, match_away_c: str, xg_src_str: str
-) -> Tuple[float, str, float, str]:
+def devig_batch(implied: np.ndarray, method: str, targets: Optional[np.ndarray] = None) -> np.ndarray:
     """
-    Enhanced probability calculation with hybrid model, realistic caps, and position-aware logic
+    Remove the bookmaker margin from M markets at once. `implied` is (M, K) of 1/odds, NaN-padded; each
+    row's fair probabilities sum to its target (default 1). Methods: proportional scaling; power (p = pi^k);
+    Shin (insider-trading model, solved on the book scaled to its target); odds ratio (p/(1-p) = pi/(1-pi)/c).
+    The power, Shin and odds-ratio parameters are bisected for every row together.
     """
-    
-    # === ANYTIME GOALSCORER PROBABILITY ===
-    ags_prob_0_1, ags_src = 0.0, "not_set"
-    
-    # Get direct odds probability
-    direct_ags_prob = get_player_direct_ags_prob_for_app2(
-        player_name, p_id_excel, p_api_id_excel, team_canon, match_home_c, match_away_c
-    )
-    
-    # Calculate enhanced Poisson-based probability
-    individual_xg = calculate_realistic_team_xg_share(p_goals, team_goals, p_pos, team_match_xg)
-    poisson_ags_prob = 0.0
-    if individual_xg > 0:
-        poisson_ags_prob = 1.0 - poisson.pmf(0, individual_xg)
-    
-    # Apply hybrid model with enhanced logic
-    if direct_ags_prob is not None and direct_ags_prob > 0:
-        # Cap the direct odds probability first to prevent unrealistic values
-        capped_direct_prob = min(direct_ags_prob, PROBABILITY_CAPS['ags_max'] / 100)
-        
-        if poisson_ags_prob > 0:
-            # Hybrid of both methods - more balanced approach
-            ags_prob_0_1 = (
-                AGS_HYBRID_MODEL_WEIGHTS['direct_odds'] * capped_direct_prob +
-                AGS_HYBRID_MODEL_WEIGHTS['poisson_model'] * poisson_ags_prob
-            )
-            ags_src = f"hybrid_model_from_{xg_src_str}"
-        else:
-            # Only direct odds available, but capped
-            ags_prob_0_1 = capped_direct_prob
-            ags_src = "direct_odds_capped"
-    elif poisson_ags_prob > 0:
-        # Only Poisson model available
-        ags_prob_0_1 = poisson_ags_prob
-        ags_src = f"enhanced_poisson_from_{xg_src_str}"
+    implied = np.atleast_2d(np.asarray(implied, dtype=float))
+    valid = np.isfinite(implied) & (implied > 0)
+    pi = np.where(valid, np.clip(implied, 1e-12, 1.0 - 1e-9), 0.0)
+    totals = pi.sum(axis=1)
+    targets = np.ones(len(pi)) if targets is None else np.asarray(targets, dtype=float)
+    n_rows = len(pi)
+    if method == "proportional":
+        fair = pi * np.divide(targets, totals, out=np.zeros(n_rows), where=totals > 0)[:, None]
+    elif method == "power":
+        fair = _bisect_batch(lambda log_k: np.where(valid, pi ** np.exp(log_k)[:, None], 0.0), np.full(n_rows, np.log(1e-2)), np.full(n_rows, np.log(1e2)), targets)
+    elif method == "odds_ratio":
+        fair = _bisect_batch(lambda log_c: np.where(valid, pi / (np.exp(log_c)[:, None] * (1.0 - pi) + pi), 0.0), np.full(n_rows, -30.0), np.full(n_rows, 30.0), targets)
+    elif method == "shin":
+        unit = pi / np.where(targets > 0, targets, 1.0)[:, None]
+        unit_totals = unit.sum(axis=1)
+        def shin_probs(z: np.ndarray) -> np.ndarray:
+            z = z[:, None]
+            return np.where(valid, (np.sqrt(z ** 2 + 4.0 * (1.0 - z) * unit ** 2 / np.where(unit_totals > 0, unit_totals, 1.0)[:, None]) - z) / (2.0 * (1.0 - z)), 0.0)
+        fair = _bisect_batch(shin_probs, np.zeros(n_rows), np.full(n_rows, 1.0 - 1e-9), np.ones(n_rows)) * targets[:, None]
+        fair = np.where((unit_totals > 1.0)[:, None], fair, unit * targets[:, None] / np.where(unit_totals > 0, unit_totals, 1.0)[:, None])
     else:
-        # No data available
-        ags_prob_0_1 = 0.0
-        ags_src = f"no_data_available_{xg_src_str}"
-    
-    # Final AGS probability capping and conversion to percentage
-    ags_prob_percentage = apply_probability_caps(ags_prob_0_1 * 100, 'ags')
-    
-    # === ANYTIME ASSIST PROBABILITY ===
-    individual_xa = calculate_realistic_team_xa_share(p_assists, team_assists, p_pos, team_match_xg)
-    aas_prob_0_1 = 0.0
-    
-    if individual_xa > 0:
-        aas_prob_0_1 = 1.0 - poisson.pmf(0, individual_xa)
-    
-    aas_src = f"enhanced_poisson_from_{xg_src_str}"
-    if p_assists == 0 or aas_prob_0_1 == 0:
-        aas_src += "_no_season_assists_or_low_prob"
-    
-    # Apply AAS probability capping
-    aas_prob_percentage = apply_probability_caps(aas_prob_0_1 * 100, 'aas')
-    
-    return (
-        round(ags_prob_percentage, 2), 
-        ags_src, 
-        round(aas_prob_percentage, 2), 
-        aas_src
-    )
+        raise ValueError(f"Unknown de-vig method '{method}'; expected one of {', '.join(DEVIG_METHODS)}.")
+    fair_totals = fair.sum(axis=1)
+    fair = fair * np.divide(targets, fair_totals, out=np.zeros(n_rows), where=fair_totals > 0)[:, None]
+    return np.where(valid, fair, np.nan)
 
-# --- Main Calculation Functions ---
-def calculate_team_cs_percentages_logic(correct_score_data: Dict[str, Any], team_mapping: Dict[str, str], team_details_map: Dict[str, Dict[str, Any]], fixture_lookup: Dict[FrozenSet[str], Dict[str, Any]]) -> List[Dict[str, Any]]:
+# --- Correct Score Matrices ---
+class CorrectScoreMatrix:
+    """
+    One match's correct-score market as a dense (MAX_POISSON_GOALS+1)^2 grid of implied probabilities.
+    `total_implied` is the sum of every priced entry in market order, so normalizing by it reproduces
+    the per-endpoint arithmetic. Entries that are not "h-a" scorelines inside the grid are kept in
+    `extras` so they still count towards the total (and, where parseable, towards clean sheets).
+    """
+    __slots__ = ("implied", "present", "order", "total_implied", "extras", "probs")
+
+    def __init__(self, max_goals: int = MAX_POISSON_GOALS):
+        size = max_goals + 1
+        self.implied = np.zeros((size, size), dtype=float)
+        self.present = np.zeros((size, size), dtype=bool)
+        self.order = np.full((size, size), -1, dtype=np.int64)
+        self.total_implied = 0.0
+        self.extras: List[Tuple[str, float, Optional[int], Optional[int], int]] = []
+        self.probs = self.implied
+
+    @classmethod
+    def from_arrays(cls, implied: np.ndarray, present: np.ndarray, order: np.ndarray, total_implied: float,
+                    extras: List[Tuple[str, float, Optional[int], Optional[int], int]], probs: np.ndarray) -> "CorrectScoreMatrix":
+        """A matrix over existing grids (e.g. read-only views of a state arena) without copying them"""
+        matrix = cls.__new__(cls)
+        matrix.implied, matrix.present, matrix.order, matrix.total_implied, matrix.extras, matrix.probs = implied, present, order, total_implied, extras, probs
+        return matrix
+
+    @classmethod
+    def from_odds(cls, odds_dict: Dict[str, Any], max_goals: int = MAX_POISSON_GOALS) -> "CorrectScoreMatrix":
+        matrix = cls(max_goals)
+        for position, (score, odd_val_any) in enumerate(odds_dict.items()):
+            try:
+                odd_val = float(odd_val_any)
+                implied_prob = 1.0 / odd_val if odd_val > 0 else 0.0
+            except (ValueError, ZeroDivisionError, TypeError): continue
+            matrix.total_implied += implied_prob
+            h_goals, a_goals = None, None
+            s_parts = str(score).split('-')
+            if len(s_parts) == 2:
+                try: h_goals, a_goals = int(s_parts[0]), int(s_parts[1])
+                except ValueError: pass
+            if h_goals is not None and 0 <= h_goals <= max_goals and 0 <= a_goals <= max_goals and not matrix.present[h_goals, a_goals] and str(score) == f"{h_goals}-{a_goals}":
+                matrix.implied[h_goals, a_goals] = implied_prob
+                matrix.present[h_goals, a_goals] = True
+                matrix.order[h_goals, a_goals] = position
+            else:
+                matrix.extras.append((score, implied_prob, h_goals, a_goals, position))
+        matrix.probs = matrix.implied / matrix.total_implied if matrix.total_implied > 0 else matrix.implied.copy()
+        return matrix
+
+    def clean_sheet_percentages(self) -> Tuple[float, float]:
+        if self.total_implied <= 0: return 0.0, 0.0
+        home_cs = float(self.implied[:, 0].sum()) + sum(p for _, p, h, a, _ in self.extras if a == 0)
+        away_cs = float(self.implied[0, :].sum()) + sum(p for _, p, h, a, _ in self.extras if h == 0)
+        return home_cs / self.total_implied * 100.0, away_cs / self.total_implied * 100.0
+
+    def top_scores(self, k: int = 4) -> List[Tuple[Any, float]]:
+        """The k most likely entries as (score label, percentage), ties broken by market order"""
+        if self.total_implied == 0: return []
+        size = self.implied.shape[0]
+        flat_idx = np.flatnonzero(self.present)
+        values = np.concatenate([self.implied.ravel()[flat_idx], np.array([e[1] for e in self.extras], dtype=float)])
+        orders = np.concatenate([self.order.ravel()[flat_idx], np.array([e[4] for e in self.extras], dtype=np.int64)])
+        labels = [f"{i // size}-{i % size}" for i in flat_idx] + [e[0] for e in self.extras]
+        if len(values) > k:
+            # Everything tied with the k-th largest value survives the partition so market order decides ties.
+            kth_value = values[np.argpartition(-values, k - 1)[k - 1]]
+            candidates = np.flatnonzero(values >= kth_value)
+        else:
+            candidates = np.arange(len(values))
+        ranked = candidates[np.lexsort((orders[candidates], -values[candidates]))][:k]
+        return [(labels[i], (float(values[i]) / self.total_implied) * 100.0) for i in ranked]
+
+    def expected_goals(self) -> Tuple[Optional[float], Optional[float]]:
+        """xG over the scorelines priced above evens, renormalized over those entries (market order)"""
+        size = self.implied.shape[0]
+        cell_idx = np.flatnonzero(self.present & (self.implied > 0) & (self.implied < 1.0))
+        priced = [(int(self.order.ravel()[i]), i // size, i % size, float(self.implied.ravel()[i])) for i in cell_idx]
+        priced += [(pos, h, a, p) for _, p, h, a, pos in self.extras if h is not None and h >= 0 and a >= 0 and 0 < p < 1.0]
+        priced.sort()
+        total = 0.0
+        for _, _, _, p in priced: total += p
+        if total == 0: return None, None
+        home_xg, away_xg = 0.0, 0.0
+        for _, h, a, p in priced:
+            norm_prob = p / total
+            home_xg += h * norm_prob
+            away_xg += a * norm_prob
+        return round(home_xg, 3), round(away_xg, 3)
+
+    def btts_probability(self) -> float:
+        return float(self.probs[1:, 1:].sum())
+
+    def over_probability(self, line: float = 2.5) -> float:
+        size = self.probs.shape[0]
+        total_goals = np.add.outer(np.arange(size), np.arange(size))
+        return float(self.probs[total_goals > line].sum())
+
+def devig_correct_score_matrices(matrices: List[CorrectScoreMatrix], method: str) -> List[CorrectScoreMatrix]:
+    """Margin-free copies of `matrices`, every market de-vigged in one devig_batch call (extras included)"""
+    if not matrices: return []
+    cells = [np.flatnonzero(m.present) for m in matrices]
+    rows = [np.concatenate([m.implied.ravel()[idx], np.array([e[1] for e in m.extras], dtype=float)]) for m, idx in zip(matrices, cells)]
+    implied = np.full((len(rows), max(len(r) for r in rows) or 1), np.nan)
+    for i, row in enumerate(rows): implied[i, :len(row)] = row
+    fair = np.nan_to_num(devig_batch(implied, method), nan=0.0)
+    devigged = []
+    for m, idx, fair_row in zip(matrices, cells, fair):
+        copy = CorrectScoreMatrix(m.implied.shape[0] - 1)
+        copy.present, copy.order = m.present, m.order
+        copy.implied.ravel()[idx] = fair_row[:len(idx)]
+        copy.extras = [(score, float(p), h, a, pos) for (score, _, h, a, pos), p in zip(m.extras, fair_row[len(idx):])]
+        copy.total_implied = float(fair_row[:len(idx) + len(m.extras)].sum())
+        copy.probs = copy.implied / copy.total_implied if copy.total_implied > 0 else copy.implied.copy()
+        devigged.append(copy)
+    return devigged
+
+def ingest_correct_score_data(correct_score_data: Optional[Dict[str, Any]], team_mapping: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Parse every usable match in correct_score.json once into team names plus a CorrectScoreMatrix"""
     if not correct_score_data or 'matches' not in correct_score_data: return []
-    team_clean_sheet_rows = []
+    ingested = []
     for match_info in correct_score_data['matches']:
         match_str, odds_dict, date, stadium = match_info.get('match'), match_info.get('correct_score_odds'), match_info.get('date', 'N/A_Date'), match_info.get('stadium', 'N/A_Stadium')
-        if not match_str or not odds_dict: continue
+        if not match_str or not odds_dict or not isinstance(odds_dict, dict): continue
         try:
             team_names = match_str.split(" vs ")
             if len(team_names) != 2: continue
@@ -869,61 +1322,367 @@ def calculate_team_cs_percentages_logic(correct_score_data: Dict[str, Any], team
             home_canon, away_canon = get_canonical_team_name(home_orig, team_mapping), get_canonical_team_name(away_orig, team_mapping)
             if home_canon.startswith("N/A_") or away_canon.startswith("N/A_"): continue
         except Exception: continue
-        fixture_data = fixture_lookup.get(frozenset({home_canon, away_canon}), {})
-        fixture_id, gw = fixture_data.get("fixture_id", "N/A_FID"), fixture_data.get("GW", "N/A_GW")
-        match_identifier = f"{match_str} ({date} at {stadium})"
-        sum_probs_all, sum_probs_home_cs, sum_probs_away_cs = 0.0, 0.0, 0.0
-        if not isinstance(odds_dict, dict): continue
-        for score, odd_val_any in odds_dict.items():
-            try:
-                odd_val = float(odd_val_any)
-                implied_prob = 1.0 / odd_val if odd_val > 0 else 0.0
-                sum_probs_all += implied_prob
-                s_parts = str(score).split('-')
-                if len(s_parts) != 2: continue
-                h_goals, a_goals = int(s_parts[0]), int(s_parts[1])
-                if a_goals == 0: sum_probs_home_cs += implied_prob
-                if h_goals == 0: sum_probs_away_cs += implied_prob
-            except (ValueError, ZeroDivisionError, TypeError): continue
-        home_cs_perc = (sum_probs_home_cs / sum_probs_all * 100.0) if sum_probs_all > 0 else 0.0
-        away_cs_perc = (sum_probs_away_cs / sum_probs_all * 100.0) if sum_probs_all > 0 else 0.0
+        ingested.append({
+            "match_str": match_str, "date": date, "stadium": stadium, "home_orig": home_orig, "away_orig": away_orig,
+            "home_canon": home_canon, "away_canon": away_canon, "matrix": CorrectScoreMatrix.from_odds(odds_dict),
+        })
+    return ingested
+
+_CORRECT_SCORE_INGEST_MEMO: Dict[str, Any] = {"source": None, "mapping_len": None, "ingested": [], "devigged": {}}
+
+def get_ingested_correct_scores(correct_score_data: Optional[Dict[str, Any]], team_mapping: Dict[str, str], devig_method: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Ingest once per loaded correct-score document; callers sharing the same object share the matrices.
+    With `devig_method`, the matrices are margin-free copies (made once per document and method).
+    """
+    memo = _CORRECT_SCORE_INGEST_MEMO
+    if memo["source"] is not correct_score_data or memo["mapping_len"] != len(team_mapping):
+        memo.update(source=correct_score_data, mapping_len=len(team_mapping), ingested=ingest_correct_score_data(correct_score_data, team_mapping), devigged={})
+    if devig_method is None: return memo["ingested"]
+    if devig_method not in memo["devigged"]:
+        matrices = devig_correct_score_matrices([m["matrix"] for m in memo["ingested"]], devig_method)
+        memo["devigged"] = {**memo["devigged"], devig_method: [{**m, "matrix": matrix} for m, matrix in zip(memo["ingested"], matrices)]}
+    return memo["devigged"][devig_method]
+
+def calculate_xg_from_cs_odds_for_app2(cs_odds: Any) -> Tuple[Optional[float], Optional[float]]:
+    if cs_odds is None or (isinstance(cs_odds, dict) and not cs_odds): return None, None
+    matrix = cs_odds if isinstance(cs_odds, CorrectScoreMatrix) else CorrectScoreMatrix.from_odds(cs_odds)
+    return matrix.expected_goals()
+
+# --- Dixon-Coles Fit ---
+class StateVersionMemo:
+    """
+    One result per (DataState version, devig method), so the raw and de-vigged views of a version do not
+    evict each other. A slot is only reused while its source objects are the state's (identity), and slots
+    for older versions are dropped when a newer version is stored. `devig_method` overrides the state's own
+    method, for results derived from a state into another method.
+    """
+    def __init__(self):
+        self._slots: Dict[Tuple[int, Optional[str]], Tuple[Tuple[Any, ...], Any]] = {}
+        self._guard = threading.Lock()
+
+    def get(self, state: "DataState", sources: Tuple[Any, ...], devig_method: Optional[str] = None) -> Optional[Any]:
+        with self._guard: slot = self._slots.get((state.version, devig_method or state.devig_method))
+        if slot is None or len(slot[0]) != len(sources) or any(a is not b for a, b in zip(slot[0], sources)): return None
+        return slot[1]
+
+    def previous(self, state: "DataState") -> Optional[Any]:
+        """The newest stored result for the same devig method, to warm-start from"""
+        with self._guard:
+            keys = [key for key in self._slots if key[1] == state.devig_method]
+            return self._slots[max(keys, key=lambda key: key[0])][1] if keys else None
+
+    def store(self, state: "DataState", sources: Tuple[Any, ...], result: Any, devig_method: Optional[str] = None) -> Any:
+        with self._guard:
+            for key in [key for key in self._slots if key[0] < state.version]: del self._slots[key]
+            self._slots[(state.version, devig_method or state.devig_method)] = (sources, result)
+        return result
+
+class DixonColesFit(NamedTuple):
+    home_rate: float
+    away_rate: float
+    rho: float  # low-score correlation; < 0 inflates 0-0 and 1-1
+    loss: float  # KL divergence from the market over the priced grid scorelines
+
+def dixon_coles_scoreline_probs(home_rate: Any, away_rate: Any, rho: Any, max_goals: int = MAX_POISSON_GOALS) -> np.ndarray:
+    """Unnormalized Dixon-Coles grid (..., max_goals+1, max_goals+1) for arrays of parameters"""
+    home_rate, away_rate, rho = (np.asarray(v, dtype=float)[..., None, None] for v in (home_rate, away_rate, rho))
+    goals = np.arange(max_goals + 1)
+    grid = poisson.pmf(goals[:, None], home_rate) * poisson.pmf(goals[None, :], away_rate)
+    tau = np.ones(grid.shape)
+    tau[..., 0, 0] = (1.0 - home_rate * away_rate * rho)[..., 0, 0]
+    tau[..., 0, 1] = (1.0 + home_rate * rho)[..., 0, 0]
+    tau[..., 1, 0] = (1.0 + away_rate * rho)[..., 0, 0]
+    tau[..., 1, 1] = (1.0 - rho)[..., 0, 0]
+    return grid * np.maximum(tau, 1e-12)
+
+def _dixon_coles_batch_objective(params: np.ndarray, target: np.ndarray, mask: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Summed KL(market || model) over M matches and its gradient; params is [log home rate, log away rate,
+    rho] per match, the model is renormalized over each match's priced cells. Matches are independent, so
+    one L-BFGS run over the stacked vector fits all of them at once.
+    """
+    n_matches, size = target.shape[0], target.shape[1]
+    theta = params.reshape(n_matches, 3)
+    lam, mu, rho = np.exp(theta[:, 0]), np.exp(theta[:, 1]), theta[:, 2]
+    model = dixon_coles_scoreline_probs(lam, mu, rho, size - 1) * mask
+    z = model.sum(axis=(1, 2))
+    fitted = model / z[:, None, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loss = float(np.where(target > 0, target * (np.log(target) - np.log(fitted)), 0.0).sum())
+    # d log p / d theta per cell: Poisson terms everywhere, tau terms on the four low-score cells only
+    goals = np.arange(size, dtype=float)
+    d_lam = np.broadcast_to((goals[:, None] - lam[:, None, None]), model.shape).copy()
+    d_mu = np.broadcast_to((goals[None, :] - mu[:, None, None]), model.shape).copy()
+    d_rho = np.zeros(model.shape)
+    tau00, tau01, tau10, tau11 = (np.maximum(t, 1e-12) for t in (1.0 - lam * mu * rho, 1.0 + lam * rho, 1.0 + mu * rho, 1.0 - rho))
+    d_lam[:, 0, 0] += lam * (-mu * rho) / tau00; d_lam[:, 0, 1] += lam * rho / tau01
+    d_mu[:, 0, 0] += mu * (-lam * rho) / tau00; d_mu[:, 1, 0] += mu * rho / tau10
+    d_rho[:, 0, 0], d_rho[:, 0, 1], d_rho[:, 1, 0], d_rho[:, 1, 1] = -lam * mu / tau00, lam / tau01, mu / tau10, -1.0 / tau11
+    residual = (fitted - target) * mask
+    grad = np.stack([(residual * d).sum(axis=(1, 2)) for d in (d_lam, d_mu, d_rho)], axis=1)
+    return loss, grad.ravel()
+
+def fit_dixon_coles_batch(matrices: List[CorrectScoreMatrix], initial: Optional[np.ndarray] = None) -> List[Optional[DixonColesFit]]:
+    """
+    Fit home/away rates and rho to every correct-score market in one vectorized L-BFGS-B run. Rows of
+    `initial` (M x 3 of home rate, away rate, rho) warm-start the solver; a match without one (or with a NaN
+    row) starts from its market mean. Markets with fewer than three priced grid scorelines get None.
+    """
+    if not matrices: return []
+    targets = np.stack([m.implied * m.present for m in matrices])
+    masks = np.stack([m.present & (m.implied > 0) for m in matrices]).astype(float)
+    usable = masks.sum(axis=(1, 2)) >= 3
+    fits: List[Optional[DixonColesFit]] = [None] * len(matrices)
+    if not usable.any(): return fits
+    targets, masks = targets[usable], masks[usable]
+    targets = targets / targets.sum(axis=(1, 2))[:, None, None]
+    goals = np.arange(targets.shape[1], dtype=float)
+    market_start = np.stack([(targets.sum(axis=2) * goals).sum(axis=1), (targets.sum(axis=1) * goals).sum(axis=1), np.zeros(len(targets))], axis=1)
+    if initial is not None:
+        warm = np.asarray(initial, dtype=float)[usable]
+        market_start = np.where(np.isfinite(warm).all(axis=1)[:, None], warm, market_start)
+    initial = market_start
+    rate_lo, rate_hi = DIXON_COLES_RATE_BOUNDS
+    start = np.column_stack([np.log(np.clip(initial[:, 0], rate_lo, rate_hi)), np.log(np.clip(initial[:, 1], rate_lo, rate_hi)), np.clip(initial[:, 2], *DIXON_COLES_RHO_BOUNDS)])
+    bounds = [(np.log(rate_lo), np.log(rate_hi)), (np.log(rate_lo), np.log(rate_hi)), DIXON_COLES_RHO_BOUNDS] * len(targets)
+    result = optimize.minimize(_dixon_coles_batch_objective, start.ravel(), args=(targets, masks), jac=True, method="L-BFGS-B",
+                               bounds=bounds, options={"maxiter": DIXON_COLES_MAX_ITERATIONS})
+    theta = result.x.reshape(-1, 3)
+    fitted = dixon_coles_scoreline_probs(np.exp(theta[:, 0]), np.exp(theta[:, 1]), theta[:, 2], targets.shape[1] - 1) * masks
+    fitted /= fitted.sum(axis=(1, 2))[:, None, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        losses = np.where(targets > 0, targets * (np.log(targets) - np.log(fitted)), 0.0).sum(axis=(1, 2))
+    for slot, (row, loss) in zip(np.flatnonzero(usable), zip(theta, losses)):
+        fits[slot] = DixonColesFit(round(float(np.exp(row[0])), 4), round(float(np.exp(row[1])), 4), round(float(row[2]), 4), float(loss))
+    return fits
+
+_DIXON_COLES_FIT_MEMO = StateVersionMemo()
+
+def get_dixon_coles_fits(state: Optional[DataState] = None) -> Dict[Tuple[str, str, str], DixonColesFit]:
+    """
+    Fits for every (home, away, date) in the correct-score index, once per odds version and devig method. A
+    refit warm-starts each match from the previous version's fit under the same devig method, so a reload
+    that moves a few prices converges in a few steps.
+    """
+    state = state or DATA_STATE
+    matrix_index = state.correct_score_matrix_index
+    fits = _DIXON_COLES_FIT_MEMO.get(state, (matrix_index,))
+    if fits is not None: return fits
+    keys = list(matrix_index)
+    previous = _DIXON_COLES_FIT_MEMO.previous(state) or {}
+    initial = np.array([[previous[key].home_rate, previous[key].away_rate, previous[key].rho] if key in previous else [np.nan] * 3 for key in keys]).reshape(-1, 3)
+    fits = {key: fit for key, fit in zip(keys, fit_dixon_coles_batch([matrix_index[key] for key in keys], initial)) if fit is not None}
+    return _DIXON_COLES_FIT_MEMO.store(state, (matrix_index,), fits)
+
+# --- Team Ratings ---
+class TeamRatingModel:
+    """
+    Attack/defence ratings solved jointly across every priced match: log(rate of team t vs opponent o) =
+    intercept[source] + attack[t] - defence[o], as weighted ridge least squares. Observations are the
+    Dixon-Coles rates of each correct-score market and, per AGS matchup, each side's summed player scoring
+    rates (-log(1 - p)); the per-source intercept absorbs the AGS lists' margin and missing players.
+    The sparse normal equations are kept, so `revised` re-solves a change to a few matches by patching
+    their rows and warm-starting conjugate gradient from the previous solution.
+    """
+    __slots__ = ("teams", "team_pos", "rows", "normal", "rhs", "solution", "observation_counts")
+
+    def __init__(self, teams: List[str], rows: Dict[Tuple, Tuple[Tuple[str, str, str, float, float], ...]], normal: Any, rhs: np.ndarray, solution: np.ndarray):
+        self.teams, self.team_pos, self.rows = teams, {team_c: i for i, team_c in enumerate(teams)}, rows
+        self.normal, self.rhs, self.solution = normal, rhs, solution
+        self.observation_counts: Dict[str, int] = {}
+        for match_rows in rows.values():
+            for side in {r[0] for r in match_rows}: self.observation_counts[side] = self.observation_counts.get(side, 0) + 1
+
+    @staticmethod
+    def _weighted_system(rows: List[Tuple[str, str, str, float, float]], team_pos: Dict[str, int]) -> Tuple[Any, np.ndarray]:
+        """(A^T W A, A^T W y) for the given observation rows"""
+        n_sources, n_teams = len(TEAM_RATING_SOURCE_WEIGHTS), len(team_pos)
+        source_pos = {source: i for i, source in enumerate(TEAM_RATING_SOURCE_WEIGHTS)}
+        n_rows, n_cols = len(rows), n_sources + 2 * n_teams
+        row_idx = np.repeat(np.arange(n_rows), 3)
+        col_idx = np.array([c for team_c, opponent_c, source, _, _ in rows for c in (source_pos[source], n_sources + team_pos[team_c], n_sources + n_teams + team_pos[opponent_c])], dtype=np.int64)
+        values = np.tile([1.0, 1.0, -1.0], n_rows)
+        design = sparse.csr_matrix((values, (row_idx, col_idx)), shape=(n_rows, n_cols))
+        weights = sparse.diags(np.array([r[4] for r in rows], dtype=float))
+        targets = np.array([r[3] for r in rows], dtype=float)
+        return (design.T @ weights @ design).tocsr(), design.T @ (weights @ targets)
+
+    @classmethod
+    def build(cls, rows: Dict[Tuple, Tuple[Tuple[str, str, str, float, float], ...]], teams: List[str]) -> "TeamRatingModel":
+        teams = sorted(set(teams) | {side for match_rows in rows.values() for r in match_rows for side in r[:2]})
+        team_pos = {team_c: i for i, team_c in enumerate(teams)}
+        n_sources = len(TEAM_RATING_SOURCE_WEIGHTS)
+        ridge = sparse.diags(np.concatenate([np.full(n_sources, 1e-9), np.full(2 * len(teams), TEAM_RATING_RIDGE)]))
+        normal, rhs = cls._weighted_system([r for match_rows in rows.values() for r in match_rows], team_pos)
+        normal = (normal + ridge).tocsr()
+        return cls(teams, rows, normal, rhs, cls._solve(normal, rhs, np.zeros(len(rhs))))
+
+    @staticmethod
+    def _solve(normal: Any, rhs: np.ndarray, x0: np.ndarray) -> np.ndarray:
+        solution, info = sparse_linalg.cg(normal, rhs, x0=x0, rtol=1e-10, atol=0.0, maxiter=10 * len(rhs))
+        if info != 0: solution = sparse_linalg.spsolve(normal.tocsc(), rhs)
+        return solution
+
+    def revised(self, rows: Dict[Tuple, Tuple[Tuple[str, str, str, float, float], ...]]) -> "TeamRatingModel":
+        """The model for `rows`, re-solved from this one; only observations that differ are patched in"""
+        changed = [key for key in set(self.rows) | set(rows) if self.rows.get(key) != rows.get(key)]
+        if not changed: return self
+        if any(side not in self.team_pos for key in changed for r in rows.get(key, ()) for side in r[:2]): return TeamRatingModel.build(rows, self.teams)
+        old_normal, old_rhs = self._weighted_system([r for key in changed for r in self.rows.get(key, ())], self.team_pos)
+        new_normal, new_rhs = self._weighted_system([r for key in changed for r in rows.get(key, ())], self.team_pos)
+        normal, rhs = (self.normal - old_normal + new_normal).tocsr(), self.rhs - old_rhs + new_rhs
+        return TeamRatingModel(self.teams, rows, normal, rhs, self._solve(normal, rhs, self.solution))
+
+    def ratings(self, team_c: str) -> Optional[Tuple[float, float]]:
+        """(attack, defence) for a team with at least one observation"""
+        i = self.team_pos.get(team_c)
+        if i is None or not self.observation_counts.get(team_c): return None
+        n_sources, n_teams = len(TEAM_RATING_SOURCE_WEIGHTS), len(self.teams)
+        return float(self.solution[n_sources + i]), float(self.solution[n_sources + n_teams + i])
+
+    def intercept(self) -> float:
+        """Log rate of an average team on the correct-score scale (the AGS scale when no CS market exists)"""
+        has_cs = any(key[0] == "correct_score" for key in self.rows)
+        return float(self.solution[list(TEAM_RATING_SOURCE_WEIGHTS).index("correct_score" if has_cs else "anytime_goalscorer")])
+
+    def expected_goals(self, team_c: str, opponent_c: str) -> Optional[float]:
+        team_rating, opponent_rating = self.ratings(team_c), self.ratings(opponent_c)
+        if team_rating is None or opponent_rating is None: return None
+        return float(np.exp(self.intercept() + team_rating[0] - opponent_rating[1]))
+
+def team_rating_observations(state: DataState) -> Dict[Tuple, Tuple[Tuple[str, str, str, float, float], ...]]:
+    """Observation rows (team, opponent, source, log rate, weight) keyed per market"""
+    rows: Dict[Tuple, Tuple[Tuple[str, str, str, float, float], ...]] = {}
+    fits = get_dixon_coles_fits(state)
+    cs_weight, ags_weight = TEAM_RATING_SOURCE_WEIGHTS["correct_score"], TEAM_RATING_SOURCE_WEIGHTS["anytime_goalscorer"]
+    for key, matrix in state.correct_score_matrix_index.items():
+        home_c, away_c, _ = key
+        fit = fits.get(key)
+        home_rate, away_rate = (fit.home_rate, fit.away_rate) if fit else matrix.expected_goals()
+        if not home_rate or not away_rate or home_rate <= 0 or away_rate <= 0: continue
+        rows[("correct_score",) + key] = ((home_c, away_c, "correct_score", float(np.log(home_rate)), cs_weight),
+                                          (away_c, home_c, "correct_score", float(np.log(away_rate)), cs_weight))
+    for matchup, players in state.ags_odds_lookup.items():
+        if len(matchup) != 2: continue
+        team_rates = dict.fromkeys(matchup, 0.0)
+        for player in players:
+            team_c = get_canonical_team_name(str(player.get('team', '')).strip(), TEAM_NAME_MAPPING)
+            try: odds = float(player.get('odds'))
+            except (ValueError, TypeError): continue
+            if team_c in team_rates and odds > 1.0: team_rates[team_c] -= float(np.log1p(-1.0 / odds))
+        team_a, team_b = sorted(matchup)
+        if team_rates[team_a] > 0 and team_rates[team_b] > 0:
+            rows[("anytime_goalscorer", team_a, team_b)] = ((team_a, team_b, "anytime_goalscorer", float(np.log(team_rates[team_a])), ags_weight),
+                                                            (team_b, team_a, "anytime_goalscorer", float(np.log(team_rates[team_b])), ags_weight))
+    return rows
+
+_TEAM_RATING_MEMO = StateVersionMemo()
+
+def get_team_rating_model(state: Optional[DataState] = None) -> TeamRatingModel:
+    """
+    Ratings per odds version and devig method, revised from the previous version's solve under the same
+    devig method when there is one
+    """
+    state = state or DATA_STATE
+    sources = (state.correct_score_matrix_index, state.ags_odds_lookup)
+    model = _TEAM_RATING_MEMO.get(state, sources)
+    if model is not None: return model
+    rows = team_rating_observations(state)
+    teams = sorted({team_c for fix in state.base_fixtures for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])})
+    previous = _TEAM_RATING_MEMO.previous(state)
+    model = previous.revised(rows) if previous is not None and set(teams) <= set(previous.teams) else TeamRatingModel.build(rows, teams)
+    return _TEAM_RATING_MEMO.store(state, sources, model)
+
+def get_player_direct_ags_prob_for_app2(player_name_to_match: str, excel_player_id: Optional[str], excel_player_api_id: Optional[str], player_team_canonical: str, match_home_canonical: str, match_away_canonical: str, state: Optional[DataState] = None) -> Optional[float]:
+    matchup_index = (state or DATA_STATE).ags_player_index.get(frozenset({match_home_canonical, match_away_canonical}))
+    if matchup_index is None:
+        return None
+    # Each index holds (position in the odds list, implied prob); the earliest entry matching on any key wins.
+    candidates = []
+    if excel_player_id and excel_player_id in matchup_index["by_player_id"]:
+        candidates.append(matchup_index["by_player_id"][excel_player_id])
+    if excel_player_api_id and excel_player_api_id in matchup_index["by_player_api_id"]:
+        candidates.append(matchup_index["by_player_api_id"][excel_player_api_id])
+    name_team_hit = matchup_index["by_name_team"].get((player_name_to_match.lower(), player_team_canonical))
+    if name_team_hit is not None:
+        candidates.append(name_team_hit)
+    return min(candidates, key=lambda c: c[0])[1] if candidates else None
+
+# --- Enhanced Main Calculation Function (batched) ---
+def _is_defensive_position(player_position: Any) -> bool:
+    return bool(player_position) and any(def_pos.lower() in str(player_position).lower() for def_pos in DEFENSIVE_POSITIONS)
+
+def calculate_player_probabilities_batch(
+    p_goals: np.ndarray, p_assists: np.ndarray, ags_pos_mod: np.ndarray, aas_pos_mod: np.ndarray, is_defender: np.ndarray,
+    team_goals: np.ndarray, team_assists: np.ndarray, team_match_xg: np.ndarray, opponent_xg: np.ndarray,
+    team_cs_percentage: np.ndarray, direct_ags_prob: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Hybrid AGS, Poisson AAS and clean sheet percentages for many (fixture, player) rows at once.
+    Every operation mirrors the scalar helpers (calculate_realistic_team_xg_share/_xa_share,
+    apply_probability_caps, calculate_realistic_clean_sheet_probability) so results are identical.
+    `direct_ags_prob` uses NaN where no bookmaker price exists. `ags_branch` codes: 0 hybrid,
+    1 direct odds only, 2 Poisson only, 3 no data.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        has_goal_share = (team_goals > 0) & (p_goals >= 0)
+        individual_xg = np.where(has_goal_share, np.minimum(p_goals / team_goals * ags_pos_mod, 0.4) * team_match_xg, 0.0)
+        has_assist_share = (team_assists > 0) & (p_assists >= 0)
+        individual_xa = np.where(has_assist_share, np.minimum(p_assists / team_assists * aas_pos_mod, 0.35) * team_match_xg * 0.8, 0.0)
+        xg_adjustment = np.where(opponent_xg > 0, np.maximum(0.7, np.minimum(1.3, 2.0 / opponent_xg)), 1.0)
+    poisson_ags = np.where(individual_xg > 0, 1.0 - poisson.pmf(0, np.where(individual_xg > 0, individual_xg, 1.0)), 0.0)
+    poisson_aas = np.where(individual_xa > 0, 1.0 - poisson.pmf(0, np.where(individual_xa > 0, individual_xa, 1.0)), 0.0)
+
+    has_direct = ~np.isnan(direct_ags_prob) & (np.nan_to_num(direct_ags_prob) > 0)
+    capped_direct = np.minimum(np.nan_to_num(direct_ags_prob), PROBABILITY_CAPS['ags_max'] / 100)
+    has_poisson = poisson_ags > 0
+    ags_branch = np.select([has_direct & has_poisson, has_direct, has_poisson], [0, 1, 2], default=3)
+    hybrid = AGS_HYBRID_MODEL_WEIGHTS['direct_odds'] * capped_direct + AGS_HYBRID_MODEL_WEIGHTS['poisson_model'] * poisson_ags
+    ags_prob_0_1 = np.select([ags_branch == 0, ags_branch == 1, ags_branch == 2], [hybrid, capped_direct, poisson_ags], default=0.0)
+
+    cs_adjusted = np.clip(np.where(opponent_xg > 0, team_cs_percentage * xg_adjustment, team_cs_percentage), PROBABILITY_CAPS['cs_min'], PROBABILITY_CAPS['cs_max'])
+    return {
+        "ags": np.round(np.clip(ags_prob_0_1 * 100, PROBABILITY_CAPS['ags_min'], PROBABILITY_CAPS['ags_max']), 2),
+        "ags_branch": ags_branch,
+        "aas": np.round(np.clip(poisson_aas * 100, PROBABILITY_CAPS['aas_min'], PROBABILITY_CAPS['aas_max']), 2),
+        "aas_zero": (p_assists == 0) | (poisson_aas == 0),
+        "cs": np.where(is_defender, np.round(cs_adjusted, 2), 0.0),
+    }
+
+def _ags_source_label(ags_branch: int, xg_src_str: str) -> str:
+    if ags_branch == 0: return f"hybrid_model_from_{xg_src_str}"
+    if ags_branch == 1: return "direct_odds_capped"
+    if ags_branch == 2: return f"enhanced_poisson_from_{xg_src_str}"
+    return f"no_data_available_{xg_src_str}"
+
+# --- Main Calculation Functions ---
+def calculate_team_cs_percentages_logic(correct_score_data: Dict[str, Any], team_mapping: Dict[str, str], team_details_map: Dict[str, Dict[str, Any]], fixture_lookup: Dict[FrozenSet[str], FixtureRecord], devig_method: Optional[str] = None) -> List[Dict[str, Any]]:
+    team_clean_sheet_rows = []
+    for cs_match in get_ingested_correct_scores(correct_score_data, team_mapping, devig_method):
+        home_orig, away_orig, home_canon, away_canon = cs_match["home_orig"], cs_match["away_orig"], cs_match["home_canon"], cs_match["away_canon"]
+        fixture_rec = fixture_lookup.get(frozenset({home_canon, away_canon}))
+        fixture_id, gw = (fixture_rec.fixture_id, fixture_rec.gw) if fixture_rec else ("N/A_FID", "N/A_GW")
+        match_identifier = f"{cs_match['match_str']} ({cs_match['date']} at {cs_match['stadium']})"
+        home_cs_perc, away_cs_perc = cs_match["matrix"].clean_sheet_percentages()
         home_details, away_details = team_details_map.get(home_canon, DEFAULT_TEAM_DETAIL), team_details_map.get(away_canon, DEFAULT_TEAM_DETAIL)
         team_clean_sheet_rows.append({'match_identifier': match_identifier, 'fixture_id': fixture_id, 'GW': gw, 'team_id': home_details["team_id"], 'team_name_original': home_orig, 'team_name_canonical': home_canon, 'short_code': home_details["short_code"], 'api_id': home_details["api_id"], 'clean_sheet_percentage': round(home_cs_perc, 2), 'image_url': home_details["image"]})
         team_clean_sheet_rows.append({'match_identifier': match_identifier, 'fixture_id': fixture_id, 'GW': gw, 'team_id': away_details["team_id"], 'team_name_original': away_orig, 'team_name_canonical': away_canon, 'short_code': away_details["short_code"], 'api_id': away_details["api_id"], 'clean_sheet_percentage': round(away_cs_perc, 2), 'image_url': away_details["image"]})
     return team_clean_sheet_rows
 
-def calculate_top_scores_logic(correct_score_data: Dict[str, Any], team_mapping: Dict[str, str], fixture_lookup: Dict[FrozenSet[str], Dict[str, Any]]) -> List[Dict[str, Any]]:
-    if not correct_score_data or 'matches' not in correct_score_data: return []
+def calculate_top_scores_logic(correct_score_data: Dict[str, Any], team_mapping: Dict[str, str], fixture_lookup: Dict[FrozenSet[str], FixtureRecord], devig_method: Optional[str] = None) -> List[Dict[str, Any]]:
     top_scores_output = []
-    for match_info in correct_score_data['matches']:
-        match_str, odds_dict, date, stadium = match_info.get('match'), match_info.get('correct_score_odds'), match_info.get('date', 'N/A_Date'), match_info.get('stadium', 'N/A_Stadium')
-        if not match_str or not odds_dict or not isinstance(odds_dict, dict) or not odds_dict: continue
-        try:
-            team_names = match_str.split(" vs ")
-            if len(team_names) != 2: continue
-            home_orig, away_orig = team_names[0].strip(), team_names[1].strip()
-            home_canon, away_canon = get_canonical_team_name(home_orig, team_mapping), get_canonical_team_name(away_orig, team_mapping)
-            if home_canon.startswith("N/A_") or away_canon.startswith("N/A_"): continue
-        except Exception: continue
-        fixture_data = fixture_lookup.get(frozenset({home_canon, away_canon}), {})
-        fixture_id, gw = fixture_data.get("fixture_id", "N/A_FID"), fixture_data.get("GW", "N/A_GW")
-        match_identifier = f"{match_str} ({date} at {stadium})"
-        score_probs, sum_implied_probs_all = [], 0.0
-        for score, odd_val_any in odds_dict.items():
-            try:
-                odd_val = float(odd_val_any)
-                implied_prob = 1.0 / odd_val if odd_val > 0 else 0.0
-                score_probs.append({'score': score, 'implied_prob': implied_prob})
-                sum_implied_probs_all += implied_prob
-            except (ValueError, ZeroDivisionError, TypeError): continue
-        if sum_implied_probs_all == 0:
+    for cs_match in get_ingested_correct_scores(correct_score_data, team_mapping, devig_method):
+        fixture_rec = fixture_lookup.get(frozenset({cs_match["home_canon"], cs_match["away_canon"]}))
+        fixture_id, gw = (fixture_rec.fixture_id, fixture_rec.gw) if fixture_rec else ("N/A_FID", "N/A_GW")
+        match_identifier = f"{cs_match['match_str']} ({cs_match['date']} at {cs_match['stadium']})"
+        top_scores = cs_match["matrix"].top_scores(4)
+        if not top_scores:
             top_scores_output.append({'match_identifier': match_identifier, 'fixture_id': fixture_id, 'GW': gw, 'top_scores': [{'score': 'N/A', 'percentage': 'N/A'}]}); continue
-        norm_scores = [{'score': item['score'], 'percentage': (item['implied_prob'] / sum_implied_probs_all) * 100.0} for item in score_probs]
-        sorted_scores = sorted(norm_scores, key=lambda x: x['percentage'], reverse=True)
-        top_scores_output.append({'match_identifier': match_identifier, 'fixture_id': fixture_id, 'GW': gw, 'top_scores': [{'score': s['score'], 'percentage': round(s['percentage'], 2)} for s in sorted_scores[:4]]})
+        top_scores_output.append({'match_identifier': match_identifier, 'fixture_id': fixture_id, 'GW': gw, 'top_scores': [{'score': score, 'percentage': round(pct, 2)} for score, pct in top_scores]})
     return top_scores_output
 
-def calculate_player_clean_sheets_logic(anytime_goalscorer_data_app1: Dict[str, Any], team_cs_cache: Dict[str, Dict[str, float]], team_mapping: Dict[str, str], team_details_map: Dict[str, Dict[str, Any]], fixture_lookup: Dict[FrozenSet[str], Dict[str, Any]]) -> List[Dict[str, Any]]:
+def calculate_player_clean_sheets_logic(anytime_goalscorer_data_app1: Dict[str, Any], team_cs_cache: Dict[Tuple[FrozenSet[str], str], TeamCleanSheetEntry], team_mapping: Dict[str, str], team_details_map: Dict[str, Dict[str, Any]], fixture_lookup: Dict[FrozenSet[str], FixtureRecord]) -> List[Dict[str, Any]]:
     if not anytime_goalscorer_data_app1 or 'matches' not in anytime_goalscorer_data_app1: return []
     matches_with_players_dict: Dict[str, Dict[str, Any]] = {}
     for ag_match in anytime_goalscorer_data_app1['matches']:
@@ -931,32 +1690,16 @@ def calculate_player_clean_sheets_logic(anytime_goalscorer_data_app1: Dict[str,
         if not ag_home_orig or not ag_away_orig or not ag_date: continue
         ag_home_canon, ag_away_canon = get_canonical_team_name(ag_home_orig, team_mapping), get_canonical_team_name(ag_away_orig, team_mapping)
         if ag_home_canon.startswith("N/A_") or ag_away_canon.startswith("N/A_"): continue
-        target_match_identifier_in_cache = None; home_cs_perc, away_cs_perc = 0.0, 0.0
-        potential_keys = [f"{ag_home_orig} vs {ag_away_orig} ({ag_date} at {ag_stadium})", f"{ag_away_orig} vs {ag_home_orig} ({ag_date} at {ag_stadium})"]
         current_fixture_id, current_gw = "N/A_FID", "N/A_GW"
-        fixture_data_ag = fixture_lookup.get(frozenset({ag_home_canon, ag_away_canon}))
-        if fixture_data_ag: current_fixture_id, current_gw = fixture_data_ag.get("fixture_id", "N/A_FID"), fixture_data_ag.get("GW", "N/A_GW")
-        found_cs = False
-        for pk in potential_keys:
-            if pk in team_cs_cache:
-                target_match_identifier_in_cache = pk
-                cs_data = team_cs_cache[pk]
-                home_cs_perc, away_cs_perc = cs_data.get(ag_home_canon, 0.0), cs_data.get(ag_away_canon, 0.0)
-                found_cs = True; break
-        if not found_cs:
-            for cs_key, cs_match_data in team_cs_cache.items():
-                try:
-                    parts = cs_key.split(" ("); cs_teams_part = parts[0]; cs_date_stadium_part = parts[1][:-1]; cs_date_from_key = cs_date_stadium_part.split(" at ")[0]
-                    cs_teams_split = cs_teams_part.split(" vs ")
-                    if len(cs_teams_split) < 2: continue
-                    cs_home_k_orig, cs_away_k_orig = cs_teams_split[0].strip(), cs_teams_split[1].strip()
-                    cs_home_k_canon, cs_away_k_canon = get_canonical_team_name(cs_home_k_orig, team_mapping), get_canonical_team_name(cs_away_k_orig, team_mapping)
-                    if frozenset({cs_home_k_canon, cs_away_k_canon}) == frozenset({ag_home_canon, ag_away_canon}) and cs_date_from_key == ag_date:
-                        target_match_identifier_in_cache = cs_key
-                        home_cs_perc, away_cs_perc = cs_match_data.get(ag_home_canon, 0.0), cs_match_data.get(ag_away_canon, 0.0)
-                        found_cs = True; break
-                except Exception: continue
-        if not target_match_identifier_in_cache: target_match_identifier_in_cache = potential_keys[0]  
+        fixture_rec_ag = fixture_lookup.get(frozenset({ag_home_canon, ag_away_canon}))
+        if fixture_rec_ag: current_fixture_id, current_gw = fixture_rec_ag.fixture_id, fixture_rec_ag.gw
+        cs_entry = team_cs_cache.get(team_cs_key(ag_home_canon, ag_away_canon, ag_date))
+        if cs_entry:
+            target_match_identifier_in_cache = cs_entry.match_identifier
+            home_cs_perc, away_cs_perc = cs_entry.percentages.get(ag_home_canon, 0.0), cs_entry.percentages.get(ag_away_canon, 0.0)
+        else:
+            target_match_identifier_in_cache = f"{ag_home_orig} vs {ag_away_orig} ({ag_date} at {ag_stadium})"
+            home_cs_perc, away_cs_perc = 0.0, 0.0
         if target_match_identifier_in_cache not in matches_with_players_dict:
             matches_with_players_dict[target_match_identifier_in_cache] = {"match_identifier": target_match_identifier_in_cache, "fixture_id": current_fixture_id, "GW": current_gw, "defensive_players": []}
         for p_data in ag_players:
@@ -970,110 +1713,259 @@ def calculate_player_clean_sheets_logic(anytime_goalscorer_data_app1: Dict[str,
             matches_with_players_dict[target_match_identifier_in_cache]["defensive_players"].append(player_info)
     return list(matches_with_players_dict.values())
 
-def calculate_all_matches_combined_stats_with_cs() -> List[Dict[str, Any]]:
-    if not ALL_BASE_FIXTURES or PLAYER_STATS_DF is None:
+def _resolve_fixture_xg_and_cs(fixture: Dict[str, Any], state: DataState) -> Dict[str, Any]:
+    home_c, away_c, date_s, fixture_id = fixture['home_team_canonical'], fixture['away_team_canonical'], fixture['date_str'], fixture['fixture_id']
+    home_xg, away_xg, xg_source_str = None, None, "source_unknown"
+    cs_odds_match = state.cs_odds_lookup.get((home_c, away_c, date_s))
+    cs_key = state.fixture_id_to_cs_key.get(fixture_id)
+    if XG_SOURCE == "dixon_coles" and cs_key:
+        fits = get_dixon_coles_fits(state)
+        fit, fit_rev = fits.get((home_c, away_c, cs_key[1])), fits.get((away_c, home_c, cs_key[1]))
+        if fit: home_xg, away_xg, xg_source_str = fit.home_rate, fit.away_rate, "dixon_coles_direct"
+        elif fit_rev: home_xg, away_xg, xg_source_str = fit_rev.away_rate, fit_rev.home_rate, "dixon_coles_reversed"
+    if home_xg is None and not cs_odds_match:
+        cs_odds_match_rev = state.cs_odds_lookup.get((away_c, home_c, date_s))
+        if cs_odds_match_rev: temp_away_xg, temp_home_xg = calculate_xg_from_cs_odds_for_app2(cs_odds_match_rev); home_xg, away_xg = temp_home_xg, temp_away_xg; xg_source_str = "cs_odds_reversed"
+    elif home_xg is None: home_xg, away_xg = calculate_xg_from_cs_odds_for_app2(cs_odds_match); xg_source_str = "cs_odds_direct" if home_xg is not None else xg_source_str
+    if (home_xg is None or away_xg is None) and NO_MARKET_XG_SOURCE == "team_ratings":
+        rating_model = get_team_rating_model(state)
+        rated_home_xg, rated_away_xg = rating_model.expected_goals(home_c, away_c), rating_model.expected_goals(away_c, home_c)
+        if rated_home_xg is not None and rated_away_xg is not None: home_xg, away_xg, xg_source_str = rated_home_xg, rated_away_xg, "team_ratings"
+    if home_xg is None or away_xg is None:
+        fdr_metrics = state.fixture_fdr_metrics.get(fixture_id)
+        if fdr_metrics and fdr_metrics.get('home_fdr_outright') is not None:
+            home_xg, away_xg = estimate_xg_from_fdr_outrights_for_app2(fdr_metrics['home_fdr_outright'], fdr_metrics['away_fdr_outright']); xg_source_str = "fdr_outrights_estimation"
+        else: home_xg, away_xg = AVERAGE_TOTAL_GOALS_IN_MATCH / 2.0, AVERAGE_TOTAL_GOALS_IN_MATCH / 2.0; xg_source_str = "default_average_fallback"
+
+    # Apply enhanced xG validation
+    home_xg, away_xg = validate_and_adjust_xg(float(home_xg or 0), float(away_xg or 0))
+
+    team_cs_home, team_cs_away = 0.0, 0.0
+    cs_entry = state.team_cs_percentages.get(cs_key)
+    if cs_entry: team_cs_home, team_cs_away = cs_entry.percentages.get(home_c, 0.0), cs_entry.percentages.get(away_c, 0.0)
+    return {"home_xg": home_xg, "away_xg": away_xg, "xg_source": xg_source_str, "team_cs_home": team_cs_home, "team_cs_away": team_cs_away}
+
+class PlayerTable:
+    """
+    The player stats table partitioned once at load into one contiguous block per canonical team (rows
+    keep their file order within a block). Holds stringified IDs, float goals/assists and PositionRegistry
+    codes, so a fixture's two squads are plain slices of every column.
+    """
+    OBJECT_COLUMNS = ("names", "positions", "player_ids", "player_api_ids", "display_names", "prices", "images")
+    NUMERIC_COLUMNS = ("goals", "assists", "position_codes")
+
+    def __init__(self, df: pd.DataFrame, position_registry: PositionRegistry):
+        def column_values(col: str, default: Any) -> np.ndarray:
+            return df[col].to_numpy(dtype=object) if col in df.columns else np.full(len(df), default, dtype=object)
+        team_rows = df.groupby('Team_Canonical', sort=False).indices
+        order = np.concatenate([np.asarray(idx, dtype=np.intp) for idx in team_rows.values()]) if team_rows else np.empty(0, dtype=np.intp)
+        self.team_slices: Dict[str, slice] = {}
+        start = 0
+        for team_c, idx in team_rows.items():
+            self.team_slices[team_c] = slice(start, start + len(idx)); start += len(idx)
+        names = np.array([str(v) for v in column_values('Player Name', 'N/A')[order]], dtype=object)
+        positions = column_values('Position', None)[order]
+        self.names, self.positions = names, positions
+        self.player_ids = np.array([str(v) if pd.notna(v) else None for v in column_values('player_id', None)[order]], dtype=object)
+        self.player_api_ids = np.array([str(v) if pd.notna(v) else None for v in column_values('Player API ID', None)[order]], dtype=object)
+        self.display_names = column_values('player_display_name', None)[order] if 'player_display_name' in df.columns else names
+        self.prices, self.images = column_values('player_price', None)[order], column_values('player_image', None)[order]
+        self.goals = np.array([float(v) for v in column_values('Goals', 0.0)[order]], dtype=float)
+        self.assists = np.array([float(v) for v in column_values('Assists', 0.0)[order]], dtype=float)
+        self.position_codes = position_registry.encode(positions)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], team_slices: Dict[str, slice]) -> "PlayerTable":
+        """A table over already partitioned columns, e.g. the read-only views of a state arena"""
+        table = cls.__new__(cls)
+        table.team_slices = team_slices
+        for name, values in columns.items(): setattr(table, name, values)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def squad(self, team_c: str) -> slice:
+        return self.team_slices.get(team_c, slice(0, 0))
+
+    def gather(self, column: str, squads: List[slice]) -> np.ndarray:
+        """`column` for the given squads back to back; a single squad is a view, not a copy"""
+        values = getattr(self, column)
+        if len(squads) == 1: return values[squads[0]]
+        return np.concatenate([values[sq] for sq in squads]) if squads else values[:0]
+
+def _build_excel_player_rows_batch(fixtures: List[Dict[str, Any]], match_contexts: List[Dict[str, Any]], state: DataState) -> List[List[Dict[str, Any]]]:
+    """Excel-squad player rows for every fixture, computed as one batch over all (fixture, player) pairs"""
+    table: PlayerTable = state.player_table
+    squads, fixture_parts, is_home_parts, team_parts = [], [], [], []
+    for fixture_index, fixture in enumerate(fixtures):
+        for team_c_loop, is_home in [(fixture['home_team_canonical'], True), (fixture['away_team_canonical'], False)]:
+            squad = table.squad(team_c_loop)
+            squads.append(squad)
+            squad_len = squad.stop - squad.start
+            fixture_parts.append(np.full(squad_len, fixture_index, dtype=np.intp))
+            is_home_parts.append(np.full(squad_len, is_home, dtype=bool))
+            team_parts.append([team_c_loop] * squad_len)
+    row_positions = [r for sq in squads for r in range(sq.start, sq.stop)]
+    fixture_idx = np.concatenate(fixture_parts) if fixture_parts else np.empty(0, dtype=np.intp)
+    is_home_arr = np.concatenate(is_home_parts) if is_home_parts else np.empty(0, dtype=bool)
+
+    names, positions, player_ids, player_api_ids = table.names, table.positions, table.player_ids, table.player_api_ids
+    display_names, prices, images = table.display_names, table.prices, table.images
+
+    pair_team = [team_c for part in team_parts for team_c in part]
+    home_xg = np.array([ctx['home_xg'] for ctx in match_contexts], dtype=float)
+    away_xg = np.array([ctx['away_xg'] for ctx in match_contexts], dtype=float)
+    cs_home = np.array([ctx['team_cs_home'] for ctx in match_contexts], dtype=float)
+    cs_away = np.array([ctx['team_cs_away'] for ctx in match_contexts], dtype=float)
+    direct_probs = np.array([
+        np.nan if prob is None else prob for prob in (
+            get_player_direct_ags_prob_for_app2(names[r], player_ids[r], player_api_ids[r], team_c, fixtures[f]['home_team_canonical'], fixtures[f]['away_team_canonical'], state)
+            for r, f, team_c in zip(row_positions, fixture_idx, pair_team))
+    ], dtype=float)
+
+    position_codes, registry = table.gather("position_codes", squads), state.position_registry
+    results = calculate_player_probabilities_batch(
+        p_goals=table.gather("goals", squads), p_assists=table.gather("assists", squads),
+        ags_pos_mod=registry.ags_modifiers[position_codes], aas_pos_mod=registry.aas_modifiers[position_codes], is_defender=registry.is_defender[position_codes],
+        team_goals=np.array([state.team_season_stats.get(t, {}).get("goals", 0.0) for t in pair_team], dtype=float),
+        team_assists=np.array([state.team_season_stats.get(t, {}).get("assists", 0.0) for t in pair_team], dtype=float),
+        team_match_xg=np.where(is_home_arr, home_xg[fixture_idx], away_xg[fixture_idx]),
+        opponent_xg=np.where(is_home_arr, away_xg[fixture_idx], home_xg[fixture_idx]),
+        team_cs_percentage=np.where(is_home_arr, cs_home[fixture_idx], cs_away[fixture_idx]),
+        direct_ags_prob=direct_probs)
+
+    rows_per_fixture: List[List[Dict[str, Any]]] = [[] for _ in fixtures]
+    ags_list, aas_list, cs_list = results["ags"].tolist(), results["aas"].tolist(), results["cs"].tolist()
+    for k, (r, f, team_c) in enumerate(zip(row_positions, fixture_idx.tolist(), pair_team)):
+        xg_src_str = match_contexts[f]['xg_source']
+        p_team_details = TEAM_DETAILS.get(team_c, DEFAULT_TEAM_DETAIL)
+        aas_src = f"enhanced_poisson_from_{xg_src_str}" + ("_no_season_assists_or_low_prob" if results["aas_zero"][k] else "")
+        rows_per_fixture[f].append({
+            "player_name": names[r], "player_id": player_ids[r], "player_api_id": player_api_ids[r], "team_name_canonical": team_c,
+            "team_api_id": p_team_details.get('api_id'), "team_short_code": p_team_details['short_code'], "Position": positions[r],
+            "player_display_name": display_names[r], "player_price": prices[r], "player_image": images[r],
+            "anytime_goalscorer_probability": ags_list[k], "ags_prob_source": _ags_source_label(results["ags_branch"][k], xg_src_str),
+            "anytime_assist_probability": aas_list[k], "aas_prob_source": aas_src,
+            "clean_sheet_probability": cs_list[k]})
+    return rows_per_fixture
+
+class PlayerIdentitySet:
+    """
+    Players already listed for a fixture. Same name (lowercased) and team, plus a shared player_id, a shared
+    player_api_id, or neither side having any id. Each rule is one set probe instead of a scan of the list.
+    """
+    __slots__ = ("_by_id", "_by_api_id", "_without_ids")
+
+    def __init__(self):
+        self._by_id: set = set()
+        self._by_api_id: set = set()
+        self._without_ids: set = set()
+
+    def add(self, name_lower: str, team_c: str, player_id: Any, player_api_id: Any):
+        self._by_id.add((name_lower, team_c, player_id))
+        self._by_api_id.add((name_lower, team_c, player_api_id))
+        if not player_id and not player_api_id: self._without_ids.add((name_lower, team_c))
+
+    def contains(self, name_lower: str, team_c: str, player_id: Optional[str], player_api_id: Optional[str]) -> bool:
+        if player_id and (name_lower, team_c, player_id) in self._by_id: return True
+        if player_api_id and (name_lower, team_c, player_api_id) in self._by_api_id: return True
+        return not player_id and not player_api_id and (name_lower, team_c) in self._without_ids
+
+def _finalize_match_combined_stats(fixture: Dict[str, Any], match_ctx: Dict[str, Any], current_match_players_data_list: List[Dict[str, Any]], state: DataState) -> Dict[str, Any]:
+    """Append AGS-only players (priced but absent from the Excel squads) and wrap the fixture block"""
+    home_c, away_c, date_s, fixture_id, gw = fixture['home_team_canonical'], fixture['away_team_canonical'], fixture['date_str'], fixture['fixture_id'], fixture['GW']
+    home_xg, away_xg, xg_source_str = match_ctx['home_xg'], match_ctx['away_xg'], match_ctx['xg_source']
+    team_cs_home, team_cs_away = match_ctx['team_cs_home'], match_ctx['team_cs_away']
+    processed_players_tracker = PlayerIdentitySet()
+    for p in current_match_players_data_list: processed_players_tracker.add(p['player_name'].lower(), p['team_name_canonical'], p['player_id'], p['player_api_id'])
+    # Handle players from AGS odds not in Excel (same logic but enhanced)
+    if state.ags_odds_lookup:
+        match_key_ags = frozenset({home_c, away_c})
+        if match_key_ags in state.ags_odds_lookup:
+             for ags_p_json in state.ags_odds_lookup[match_key_ags]:
+                p_name_j, p_team_orig_j = str(ags_p_json.get('player','')).strip(), str(ags_p_json.get('team','')).strip()
+                p_team_c_j = get_canonical_team_name(p_team_orig_j, TEAM_NAME_MAPPING)
+                p_id_j, p_api_id_j = str(ags_p_json.get('player_id')) if pd.notna(ags_p_json.get('player_id')) else None, str(ags_p_json.get('player_api_id')) if pd.notna(ags_p_json.get('player_api_id')) else None
+                if not p_name_j or not p_team_c_j or p_team_c_j.startswith("N/A_"): continue
+                if processed_players_tracker.contains(p_name_j.lower(), p_team_c_j, p_id_j, p_api_id_j): continue
+                direct_ags_p_j = None
+                try:
+                    odds_j = float(ags_p_json.get('odds'))
+                    direct_ags_p_j = (1.0/odds_j) if odds_j > 1.0 else None
+                except (ValueError,TypeError): continue
+                if direct_ags_p_j is not None:
+                    # Apply probability caps to direct odds
+                    capped_ags_prob = apply_probability_caps(direct_ags_p_j * 100, 'ags')
+                    
+                    p_pos_j = ags_p_json.get("position")
+                    opponent_xg_j = away_xg if p_team_c_j == home_c else home_xg  
+                    team_cs_prob_j = team_cs_home if p_team_c_j == home_c else team_cs_away
+                    position_code_j = state.position_registry.code(p_pos_j)  # may compile a new position and republish the arrays
+                    is_defender_j = bool(state.position_registry.is_defender[position_code_j])
+                    p_cs_prob_j = calculate_realistic_clean_sheet_probability(team_cs_prob_j, p_pos_j, opponent_xg_j, is_defender=is_defender_j)
+                    
+                    p_team_details_j = TEAM_DETAILS.get(p_team_c_j, DEFAULT_TEAM_DETAIL)
+                    current_match_players_data_list.append({
+                        "player_name": p_name_j, "player_id": p_id_j, "player_api_id": p_api_id_j, "team_name_canonical": p_team_c_j,
+                        "team_api_id": p_team_details_j.get('api_id'), "team_short_code": p_team_details_j['short_code'], "Position": p_pos_j,
+                        "player_display_name": p_name_j, "player_price": None, "player_image": None,
+                        "anytime_goalscorer_probability": capped_ags_prob, "ags_prob_source": "direct_odds_capped (not_in_excel)",
+                        "anytime_assist_probability": 0.0, "aas_prob_source": "unavailable (not_in_excel)",
+                        "clean_sheet_probability": round(p_cs_prob_j, 2)})
+                    processed_players_tracker.add(p_name_j.lower(), p_team_c_j, p_id_j, p_api_id_j)
+
+    return {"fixture_id": fixture_id, "GW": gw, "date_str": date_s, "home_team_canonical": home_c, "away_team_canonical": away_c, "home_team_xg": round(home_xg,3), "away_team_xg": round(away_xg,3), "xg_source": xg_source_str, "players_data": current_match_players_data_list}
+
+def iter_matches_combined_stats_with_cs(fixtures: Optional[List[Dict[str, Any]]] = None, chunk_size: Optional[int] = None, state: Optional[DataState] = None):
+    """
+    Yield one combined-stats block per fixture. Fixtures are computed `chunk_size` at a time (default: all
+    in one batch); streaming callers pass 1 so each block is produced, and can be released, on its own.
+    Everything is read from `state` (default: the DataState current when iteration starts).
+    """
+    state = state or DATA_STATE
+    if not state.base_fixtures or state.player_table is None:
         print("ERROR (CombinedCalc): Player stats DF or base fixtures not loaded.")
-        return []
-    all_match_output_stats: List[Dict[str, Any]] = []
-    for fixture_index, fixture in enumerate(ALL_BASE_FIXTURES):
-        home_c, away_c, date_s, fixture_id, gw = fixture['home_team_canonical'], fixture['away_team_canonical'], fixture['date_str'], fixture['fixture_id'], fixture['GW']
-        current_match_players_data_list, processed_players_tracker = [], set()
-        home_xg, away_xg, xg_source_str = None, None, "source_unknown"
-        cs_odds_match = CS_ODDS_LOOKUP.get((home_c, away_c, date_s))
-        if not cs_odds_match:
-            cs_odds_match_rev = CS_ODDS_LOOKUP.get((away_c, home_c, date_s))
-            if cs_odds_match_rev: temp_away_xg, temp_home_xg = calculate_xg_from_cs_odds_for_app2(cs_odds_match_rev); home_xg, away_xg = temp_home_xg, temp_away_xg; xg_source_str = "cs_odds_reversed"
-        else: home_xg, away_xg = calculate_xg_from_cs_odds_for_app2(cs_odds_match); xg_source_str = "cs_odds_direct" if home_xg is not None else xg_source_str
-        if home_xg is None or away_xg is None:
-            fdr_metrics = FIXTURE_FDR_METRICS_CACHE.get(fixture_id)
-            if fdr_metrics and fdr_metrics.get('home_fdr_outright') is not None:
-                home_xg, away_xg = estimate_xg_from_fdr_outrights_for_app2(fdr_metrics['home_fdr_outright'], fdr_metrics['away_fdr_outright']); xg_source_str = "fdr_outrights_estimation"
-            else: home_xg, away_xg = AVERAGE_TOTAL_GOALS_IN_MATCH / 2.0, AVERAGE_TOTAL_GOALS_IN_MATCH / 2.0; xg_source_str = "default_average_fallback"
-        
-        # Apply enhanced xG validation
-        home_xg, away_xg = validate_and_adjust_xg(float(home_xg or 0), float(away_xg or 0))
-        
-        team_cs_home, team_cs_away = 0.0, 0.0
-        cs_cache_key = FIXTURE_ID_TO_CS_CACHE_KEY_MAP.get(fixture_id)
-        if cs_cache_key and cs_cache_key in TEAM_CS_PERCENTAGES_CACHE:
-            cs_data_match = TEAM_CS_PERCENTAGES_CACHE[cs_cache_key]
-            team_cs_home, team_cs_away = cs_data_match.get(home_c, 0.0), cs_data_match.get(away_c, 0.0)
-        
-        for team_c_loop, is_home in [(home_c, True), (away_c, False)]:
-            team_xg = home_xg if is_home else away_xg
-            opponent_xg = away_xg if is_home else home_xg
-            team_cs_prob = team_cs_home if is_home else team_cs_away
-            
-            players_df_team = PLAYER_STATS_DF[PLAYER_STATS_DF['Team_Canonical'] == team_c_loop]
-            team_goals_total, team_assists_total = TEAM_SEASON_STATS.get(team_c_loop, {}).get("goals", 0.0), TEAM_SEASON_STATS.get(team_c_loop, {}).get("assists", 0.0)
-            for _, p_row in players_df_team.iterrows():
-                p_name, p_pos = str(p_row.get('Player Name','N/A')), p_row.get('Position')
-                p_id, p_api_id = str(p_row.get('player_id')) if pd.notna(p_row.get('player_id')) else None, str(p_row.get('Player API ID')) if pd.notna(p_row.get('Player API ID')) else None
-                
-                # Enhanced probability calculation
-                ags_p, ags_s, aas_p, aas_s = _calculate_player_probabilities(
-                    player_name=p_name, p_pos=p_pos, p_id_excel=p_id, p_api_id_excel=p_api_id, team_canon=team_c_loop,
-                    p_goals=float(p_row.get('Goals',0.0)), p_assists=float(p_row.get('Assists',0.0)),
-                    team_goals=team_goals_total, team_assists=team_assists_total, team_match_xg=team_xg,
-                    match_home_c=home_c, match_away_c=away_c, xg_src_str=xg_source_str)
-                
-                # Enhanced clean sheet calculation
-                p_cs_prob = calculate_realistic_clean_sheet_probability(team_cs_prob, p_pos, opponent_xg)
-                
-                p_team_details = TEAM_DETAILS.get(team_c_loop, DEFAULT_TEAM_DETAIL)
-                current_match_players_data_list.append({
-                    "player_name": p_name, "player_id": p_id, "player_api_id": p_api_id, "team_name_canonical": team_c_loop,
-                    "team_api_id": p_team_details.get('api_id'), "team_short_code": p_team_details['short_code'], "Position": p_pos,
-                    "player_display_name": p_row.get('player_display_name', p_name), "player_price": p_row.get('player_price'), "player_image": p_row.get('player_image'),
-                    "anytime_goalscorer_probability": ags_p, "ags_prob_source": ags_s, "anytime_assist_probability": aas_p, "aas_prob_source": aas_s,
-                    "clean_sheet_probability": round(p_cs_prob, 2)})
-                processed_players_tracker.add((p_name.lower(), team_c_loop, p_id, p_api_id))
-        
-        # Handle players from AGS odds not in Excel (same logic but enhanced)
-        if AGS_ODDS_LOOKUP:
-            match_key_ags = frozenset({home_c, away_c})
-            if match_key_ags in AGS_ODDS_LOOKUP:
-                 for ags_p_json in AGS_ODDS_LOOKUP[match_key_ags]:
-                    p_name_j, p_team_orig_j = str(ags_p_json.get('player','')).strip(), str(ags_p_json.get('team','')).strip()
-                    p_team_c_j = get_canonical_team_name(p_team_orig_j, TEAM_NAME_MAPPING)
-                    p_id_j, p_api_id_j = str(ags_p_json.get('player_id')) if pd.notna(ags_p_json.get('player_id')) else None, str(ags_p_json.get('player_api_id')) if pd.notna(ags_p_json.get('player_api_id')) else None
-                    if not p_name_j or not p_team_c_j or p_team_c_j.startswith("N/A_"): continue
-                    already_processed_flag = any(
-                        p_name_j.lower() == proc_n and p_team_c_j == proc_t and ((p_id_j and p_id_j == proc_pid) or (p_api_id_j and p_api_id_j == proc_apiid) or (not p_id_j and not p_api_id_j and not proc_pid and not proc_apiid))
-                        for proc_n, proc_t, proc_pid, proc_apiid in processed_players_tracker)
-                    if already_processed_flag: continue
-                    direct_ags_p_j = None
-                    try:
-                        odds_j = float(ags_p_json.get('odds'))
-                        direct_ags_p_j = (1.0/odds_j) if odds_j > 1.0 else None
-                    except (ValueError,TypeError): continue
-                    if direct_ags_p_j is not None:
-                        # Apply probability caps to direct odds
-                        capped_ags_prob = apply_probability_caps(direct_ags_p_j * 100, 'ags')
-                        
-                        p_pos_j = ags_p_json.get("position")
-                        opponent_xg_j = away_xg if p_team_c_j == home_c else home_xg  
-                        team_cs_prob_j = team_cs_home if p_team_c_j == home_c else team_cs_away
-                        p_cs_prob_j = calculate_realistic_clean_sheet_probability(team_cs_prob_j, p_pos_j, opponent_xg_j)
-                        
-                        p_team_details_j = TEAM_DETAILS.get(p_team_c_j, DEFAULT_TEAM_DETAIL)
-                        current_match_players_data_list.append({
-                            "player_name": p_name_j, "player_id": p_id_j, "player_api_id": p_api_id_j, "team_name_canonical": p_team_c_j,
-                            "team_api_id": p_team_details_j.get('api_id'), "team_short_code": p_team_details_j['short_code'], "Position": p_pos_j,
-                            "player_display_name": p_name_j, "player_price": None, "player_image": None,
-                            "anytime_goalscorer_probability": capped_ags_prob, "ags_prob_source": "direct_odds_capped (not_in_excel)",
-                            "anytime_assist_probability": 0.0, "aas_prob_source": "unavailable (not_in_excel)",
-                            "clean_sheet_probability": round(p_cs_prob_j, 2)})
-                        processed_players_tracker.add((p_name_j.lower(), p_team_c_j, p_id_j, p_api_id_j))
-        
-        all_match_output_stats.append({"fixture_id": fixture_id, "GW": gw, "date_str": date_s, "home_team_canonical": home_c, "away_team_canonical": away_c, "home_team_xg": round(home_xg,3), "away_team_xg": round(away_xg,3), "xg_source": xg_source_str, "players_data": current_match_players_data_list})
-    return all_match_output_stats
-
-def _populate_ags_odds_lookup(ags_data: Optional[Dict[str, Any]], team_map: Dict[str, str]):
-    global AGS_ODDS_LOOKUP
+        return
+    fixtures = state.base_fixtures if fixtures is None else fixtures
+    chunk_size = chunk_size or max(len(fixtures), 1)
+    for start in range(0, len(fixtures), chunk_size):
+        chunk = fixtures[start:start + chunk_size]
+        match_contexts = [_resolve_fixture_xg_and_cs(fixture, state) for fixture in chunk]
+        excel_rows_per_fixture = _build_excel_player_rows_batch(chunk, match_contexts, state)
+        for fixture, match_ctx, excel_rows in zip(chunk, match_contexts, excel_rows_per_fixture):
+            yield _finalize_match_combined_stats(fixture, match_ctx, excel_rows, state)
+
+def calculate_all_matches_combined_stats_with_cs(state: Optional[DataState] = None) -> List[Dict[str, Any]]:
+    return list(iter_matches_combined_stats_with_cs(state=state))
+
+def build_ags_player_index(players: List[Dict[str, Any]], team_map: Dict[str, str]) -> Dict[str, Dict[Any, Tuple[int, Optional[float]]]]:
+    """
+    Index one matchup's AGS odds list by player_id, player_api_id and (lowercased name, canonical team).
+    Values are (list position, implied prob) for the first entry per key with parseable odds, so lookups
+    keep the precedence of a front-to-back scan. Odds <= 1.0 map to None, as the scan returned.
+    """
+    matchup_index: Dict[str, Dict[Any, Tuple[int, Optional[float]]]] = {"by_player_id": {}, "by_player_api_id": {}, "by_name_team": {}}
+    for position, ags_player_data in enumerate(players):
+        try: odds = float(ags_player_data.get('odds'))
+        except (ValueError, TypeError): continue
+        entry = (position, 1.0 / odds if odds > 1.0 else None)
+        ags_player_id_json = str(ags_player_data.get('player_id')) if pd.notna(ags_player_data.get('player_id')) else None
+        ags_player_api_id_json = str(ags_player_data.get('player_api_id')) if pd.notna(ags_player_data.get('player_api_id')) else None
+        ags_player_name = str(ags_player_data.get('player', '')).strip()
+        ags_player_team_c = get_canonical_team_name(str(ags_player_data.get('team', '')).strip(), team_map)
+        if ags_player_id_json: matchup_index["by_player_id"].setdefault(ags_player_id_json, entry)
+        if ags_player_api_id_json: matchup_index["by_player_api_id"].setdefault(ags_player_api_id_json, entry)
+        matchup_index["by_name_team"].setdefault((ags_player_name.lower(), ags_player_team_c), entry)
+    return matchup_index
+
+def _populate_ags_odds_lookup(ags_data: Optional[Dict[str, Any]], team_map: Dict[str, str]) -> Tuple[Dict[FrozenSet[str], List[Dict[str, Any]]], Dict[FrozenSet[str], Dict[str, Dict[Any, Tuple[int, Optional[float]]]]]]:
+    """AGS odds lists per matchup plus their player indexes (see build_ags_player_index)"""
+    ags_odds_lookup: Dict[FrozenSet[str], List[Dict[str, Any]]] = {}
+    ags_player_index: Dict[FrozenSet[str], Dict[str, Dict[Any, Tuple[int, Optional[float]]]]] = {}
     if not ags_data or 'matches' not in ags_data:
         print("WARNING: Anytime goalscorer data is missing or invalid. AGS odds lookup will be empty.")
-        return
+        return ags_odds_lookup, ags_player_index
     print("INFO:     Populating AGS Odds Lookup from source file...")
     for match in ags_data['matches']:
         home_team_raw, away_team_raw, players = match.get('home_team'), match.get('away_team'), match.get('players')
@@ -1082,20 +1974,530 @@ def _populate_ags_odds_lookup(ags_data: Optional[Dict[str, Any]], team_map: Dict
         away_c = get_canonical_team_name(away_team_raw, team_map)
         if home_c.startswith("N/A_") or away_c.startswith("N/A_"): continue
         lookup_key = frozenset({home_c, away_c})
-        AGS_ODDS_LOOKUP[lookup_key] = players
-    print(f"INFO:     AGS Odds Lookup populated with data for {len(AGS_ODDS_LOOKUP)} matchups.")
+        ags_odds_lookup[lookup_key] = players
+        ags_player_index[lookup_key] = build_ags_player_index(players, team_map)
+    print(f"INFO:     AGS Odds Lookup populated with data for {len(ags_odds_lookup)} matchups.")
+    return ags_odds_lookup, ags_player_index
+
+def devig_ags_odds_lookup(ags_odds_lookup: Dict[FrozenSet[str], List[Dict[str, Any]]], method: str) -> Dict[FrozenSet[str], List[Dict[str, Any]]]:
+    """
+    Copies of every matchup's scorer list with 'odds' replaced by fair odds, all matchups in one devig_batch
+    call. Entries without usable odds (unparseable or <= 1.0) are passed through unchanged.
+    """
+    keys = list(ags_odds_lookup)
+    if not keys: return {}
+    implied = np.full((len(keys), max(len(ags_odds_lookup[k]) for k in keys) or 1), np.nan)
+    for i, key in enumerate(keys):
+        for j, player in enumerate(ags_odds_lookup[key]):
+            try: odds = float(player.get('odds'))
+            except (ValueError, TypeError): continue
+            if odds > 1.0: implied[i, j] = 1.0 / odds
+    fair = devig_batch(implied, method, np.nansum(implied, axis=1) / AGS_ASSUMED_OVERROUND)
+    return {key: [{**player, 'odds': 1.0 / fair[i, j]} if np.isfinite(fair[i, j]) and fair[i, j] > 0 else player for j, player in enumerate(ags_odds_lookup[key])]
+            for i, key in enumerate(keys)}
+
+_DEVIGGED_STATE_MEMO = StateVersionMemo()
+
+def get_devigged_state(devig_method: Optional[str], state: Optional[DataState] = None) -> DataState:
+    """
+    `state` with every correct-score matrix and AGS list de-vigged by `devig_method` (same version; its own
+    combined-stats index is built lazily). Derived once per DataState version and method, concurrent callers
+    sharing one build; None returns `state`.
+    """
+    state = state or DATA_STATE
+    if devig_method is None or state.devig_method == devig_method: return state
+    sources = (state.correct_score_matrix_index, state.team_cs_percentages, state.ags_odds_lookup)
+    devigged = _DEVIGGED_STATE_MEMO.get(state, sources, devig_method)
+    if devigged is not None: return devigged
+    def build_state() -> DataState:
+        devigged = _DEVIGGED_STATE_MEMO.get(state, sources, devig_method)
+        if devigged is not None: return devigged
+        keys = list(state.correct_score_matrix_index)
+        matrix_index = dict(zip(keys, devig_correct_score_matrices([state.correct_score_matrix_index[k] for k in keys], devig_method)))
+        team_cs_percentages = dict(state.team_cs_percentages)
+        for (home_c, away_c, date_s), matrix in matrix_index.items():
+            cs_key = team_cs_key(home_c, away_c, date_s)
+            if cs_key not in team_cs_percentages: continue
+            home_cs_perc, away_cs_perc = matrix.clean_sheet_percentages()
+            team_cs_percentages[cs_key] = TeamCleanSheetEntry(team_cs_percentages[cs_key].match_identifier, {home_c: round(home_cs_perc, 2), away_c: round(away_cs_perc, 2)})
+        ags_lookup = devig_ags_odds_lookup(state.ags_odds_lookup, devig_method)
+        ags_index = {key: build_ags_player_index(players, TEAM_NAME_MAPPING) for key, players in ags_lookup.items()}
+        return _DEVIGGED_STATE_MEMO.store(state, sources, state.evolve(state.version, correct_score_matrix_index=matrix_index, team_cs_percentages=team_cs_percentages,
+                                                                       ags_odds_lookup=ags_lookup, ags_player_index=ags_index, devig_method=devig_method), devig_method)
+    return SINGLE_FLIGHT.run_sync(("devigged-state", (), state.version, devig_method), build_state)
+
+# --- Player Stats Table (columnar side-car) ---
+# pd.read_excel is the slowest startup step, so the prepared table (Team_Canonical added, Goals/Assists
+# coerced) is written once as one .npy file per column and memory-mapped on later boots.
+def read_player_stats_excel(xlsx_fp: str, team_map: Dict[str, str]) -> pd.DataFrame:
+    df = pd.read_excel(xlsx_fp, sheet_name='Sheet1')
+    team_col = 'Team Name' if 'Team Name' in df.columns else 'Team'
+    df['Team_Canonical'] = df[team_col].apply(lambda x: get_canonical_team_name(str(x), team_map))
+    for col in ['Goals', 'Assists']: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+    return df
+
+def _player_stats_source_signature(xlsx_fp: str, team_map: Dict[str, str]) -> Dict[str, Any]:
+    st = os.stat(xlsx_fp)
+    return {
+        "format_version": PLAYER_STATS_COLUMNAR_FORMAT_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+        "team_map_sha256": hashlib.sha256(json.dumps(team_map, sort_keys=True).encode('utf-8')).hexdigest(),
+    }
+
+def write_player_stats_columnar(df: pd.DataFrame, signature: Dict[str, Any], out_dir: str = PLAYER_STATS_COLUMNAR_DIR) -> bool:
+    columns_meta = []
+    arrays_to_write: Dict[str, np.ndarray] = {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        file_name = f"col_{i}.npy"
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            arrays_to_write[file_name] = series.to_numpy()
+            columns_meta.append({"name": col, "file": file_name, "kind": "numeric"})
+            continue
+        na_mask = series.isna().to_numpy()
+        if not all(isinstance(v, str) for v in series[~na_mask]):
+            print(f"WARNING: Column '{col}' has mixed types; skipping columnar player stats cache.")
+            return False
+        arrays_to_write[file_name] = np.array(series.where(~na_mask, "").tolist(), dtype=str)
+        arrays_to_write[f"col_{i}_na.npy"] = na_mask
+        columns_meta.append({"name": col, "file": file_name, "kind": "string", "na_file": f"col_{i}_na.npy"})
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        for file_name, arr in arrays_to_write.items(): np.save(os.path.join(tmp_dir, file_name), arr, allow_pickle=False)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({**signature, "columns": columns_meta, "rows": len(df)}, f)
+        if os.path.isdir(out_dir):
+            for old_file in os.listdir(out_dir): os.remove(os.path.join(out_dir, old_file))
+            os.rmdir(out_dir)
+        os.replace(tmp_dir, out_dir)
+        print(f"INFO:     Columnar player stats cache written to {out_dir} ({len(df)} rows).")
+        return True
+    except Exception as e:
+        print(f"WARNING: Could not write columnar player stats cache '{out_dir}': {e}")
+        return False
+
+def read_player_stats_columnar(signature: Dict[str, Any], xlsx_fp: str, in_dir: str = PLAYER_STATS_COLUMNAR_DIR) -> Optional[pd.DataFrame]:
+    meta_fp = os.path.join(in_dir, 'meta.json')
+    if not os.path.exists(meta_fp): return None
+    try:
+        with open(meta_fp, 'r', encoding='utf-8') as f: meta = json.load(f)
+    except Exception: return None
+    if meta.get("format_version") != signature["format_version"] or meta.get("team_map_sha256") != signature["team_map_sha256"]: return None
+    if meta.get("mtime_ns") != signature["mtime_ns"] or meta.get("size") != signature["size"]:
+        # Touched but possibly unchanged (e.g. re-copied); only a content change forces a rebuild.
+        source_sha256 = _hash_file_contents(xlsx_fp)
+        if meta.get("source_sha256") != source_sha256: return None
+        meta.update(mtime_ns=signature["mtime_ns"], size=signature["size"])
+        try:
+            with open(meta_fp, 'w', encoding='utf-8') as f: json.dump(meta, f)
+        except OSError: pass
+    try:
+        data: Dict[str, Any] = {}
+        for col_meta in meta["columns"]:
+            arr = np.load(os.path.join(in_dir, col_meta["file"]), mmap_mode='r', allow_pickle=False)
+            if col_meta["kind"] == "string":
+                na_mask = np.load(os.path.join(in_dir, col_meta["na_file"]), allow_pickle=False)
+                values = arr.astype(object)
+                values[na_mask] = np.nan
+                data[col_meta["name"]] = pd.Series(values)
+            else:
+                data[col_meta["name"]] = arr
+        return pd.DataFrame(data, copy=False)
+    except Exception as e:
+        print(f"WARNING: Columnar player stats cache '{in_dir}' unreadable, rebuilding: {e}")
+        return None
+
+def load_player_stats_table(xlsx_fp: str, team_map: Dict[str, str]) -> pd.DataFrame:
+    signature = _player_stats_source_signature(xlsx_fp, team_map)
+    df = read_player_stats_columnar(signature, xlsx_fp)
+    if df is not None:
+        print(f"INFO:     PLAYER_STATS_DF memory-mapped from columnar cache ({len(df)} rows).")
+        return df
+    df = read_player_stats_excel(xlsx_fp, team_map)
+    write_player_stats_columnar(df, {**signature, "source_sha256": _hash_file_contents(xlsx_fp)})
+    return df
+
+# --- Precompute Snapshot ---
+# DataState fields persisted between restarts. Keyed by the content of every input file plus the
+# model constants, so any change to either forces a full recomputation on the next boot.
+
+def _hash_file_contents(file_path: str) -> str:
+    if not os.path.exists(file_path): return "missing"
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+# Content hash per input file as of the last key computation; a hot reload re-hashes only the files it saw change.
+PRECOMPUTE_INPUT_FILE_HASHES: Dict[str, str] = {}
+
+def compute_precompute_snapshot_key(changed_paths: Optional[List[str]] = None) -> str:
+    """
+    Hash of all startup inputs: data files, hardcoded fixtures, team maps and model constants. With
+    `changed_paths`, only those files are re-read; the rest keep the hash recorded on the previous call.
+    """
+    input_files = [CORRECT_SCORE_FILE_PATH, PLAYER_STATS_FP, HTML_ODDS_FP, MD_ODDS_FP, UNIFIED_ANYTIME_GOALSCORER_FILE_PATH]
+    for fp in input_files:
+        if changed_paths is None or fp in changed_paths or fp not in PRECOMPUTE_INPUT_FILE_HASHES:
+            PRECOMPUTE_INPUT_FILE_HASHES[fp] = _hash_file_contents(fp)
+    model_inputs = {
+        "format_version": PRECOMPUTE_SNAPSHOT_FORMAT_VERSION,
+        "files": {os.path.basename(fp): PRECOMPUTE_INPUT_FILE_HASHES[fp] for fp in input_files},
+        "team_name_mapping": TEAM_NAME_MAPPING, "team_details": TEAM_DETAILS,
+        "fixtures_raw": read_fixture_list_text(), "fixtures_with_stadiums": USER_PROVIDED_FIXTURES_WITH_STADIUMS_RAW,
+        "ags_hybrid_weights": AGS_HYBRID_MODEL_WEIGHTS, "probability_caps": PROBABILITY_CAPS,
+        "aas_modifiers": AAS_POSITIONAL_MODIFIERS, "ags_modifiers": AGS_POSITIONAL_MODIFIERS,
+        "default_modifiers": [DEFAULT_AAS_MODIFIER, DEFAULT_AGS_MODIFIER], "defensive_positions": DEFENSIVE_POSITIONS,
+        "outright_weights": OUTRIGHT_COMPONENT_WEIGHTS, "avg_total_goals": AVERAGE_TOTAL_GOALS_IN_MATCH,
+        "max_poisson_goals": MAX_POISSON_GOALS,
+    }
+    return hashlib.sha256(json.dumps(model_inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _load_precompute_snapshot(snapshot_key: str, version: int, snapshot_fp: str = PRECOMPUTE_SNAPSHOT_FP) -> Optional[DataState]:
+    if not os.path.exists(snapshot_fp): return None
+    try:
+        with open(snapshot_fp, 'rb') as f: snapshot = pickle.load(f)
+    except Exception as e:
+        print(f"WARNING: Precompute snapshot '{snapshot_fp}' unreadable, recomputing: {e}"); return None
+    if not isinstance(snapshot, dict) or snapshot.get("format_version") != PRECOMPUTE_SNAPSHOT_FORMAT_VERSION or snapshot.get("key") != snapshot_key:
+        print("INFO:     Precompute snapshot is stale, recomputing.")
+        return None
+    fields = snapshot.get("state", {})
+    if any(name not in fields for name in DataState.FIELDS): return None
+    state = DataState(version, **fields)
+    print(f"INFO:     Loaded precompute snapshot ({len(state.base_fixtures)} fixtures, {len(state.team_cs_percentages)} CS matches).")
+    return state
+
+def _save_precompute_snapshot(snapshot_key: str, state: DataState, snapshot_fp: str = PRECOMPUTE_SNAPSHOT_FP) -> None:
+    snapshot = {"format_version": PRECOMPUTE_SNAPSHOT_FORMAT_VERSION, "key": snapshot_key, "state": state.fields()}
+    tmp_fp = f"{snapshot_fp}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(snapshot_fp), exist_ok=True)
+        with open(tmp_fp, 'wb') as f: pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_fp, snapshot_fp)
+        print(f"INFO:     Precompute snapshot written to {snapshot_fp}.")
+    except Exception as e:
+        print(f"WARNING: Could not write precompute snapshot '{snapshot_fp}': {e}")
+        if os.path.exists(tmp_fp): os.remove(tmp_fp)
+
+def add_team_cs_percentages(cs_data: Dict[str, Any], fixture_lookup: Dict[FrozenSet[str], FixtureRecord],
+                            team_cs_cache: Dict[Tuple[FrozenSet[str], str], TeamCleanSheetEntry], fixture_id_to_cs_key: Dict[str, Tuple[FrozenSet[str], str]]):
+    for cs_match in get_ingested_correct_scores(cs_data, TEAM_NAME_MAPPING):
+        home_c, away_c = cs_match["home_canon"], cs_match["away_canon"]
+        cs_key = team_cs_key(home_c, away_c, cs_match["date"])
+        home_cs_perc, away_cs_perc = cs_match["matrix"].clean_sheet_percentages()
+        team_cs_cache[cs_key] = TeamCleanSheetEntry(f"{cs_match['match_str']} ({cs_match['date']} at {cs_match['stadium']})",
+                                                    {home_c: round(home_cs_perc, 2), away_c: round(away_cs_perc, 2)})
+        fixture_rec = fixture_lookup.get(frozenset({home_c, away_c}))
+        if fixture_rec and fixture_rec.fixture_id: fixture_id_to_cs_key[fixture_rec.fixture_id] = cs_key
+
+def build_startup_data_state(version: int) -> DataState:
+    """Run the full startup pipeline into fresh structures and return them as one DataState"""
+    fixture_registry = FixtureRegistry.from_text(read_fixture_list_text(), TEAM_NAME_MAPPING)
+    cs_data_cache = load_json_data(CORRECT_SCORE_FILE_PATH)
+    correct_score_matrix_index = {(m["home_canon"], m["away_canon"], m["date"]): m["matrix"] for m in get_ingested_correct_scores(cs_data_cache, TEAM_NAME_MAPPING)}
+    team_cs_percentages: Dict[Tuple[FrozenSet[str], str], TeamCleanSheetEntry] = {}
+    fixture_id_to_cs_key: Dict[str, Tuple[FrozenSet[str], str]] = {}
+    if cs_data_cache:
+        add_team_cs_percentages(cs_data_cache, fixture_registry.by_pair, team_cs_percentages, fixture_id_to_cs_key)
+        print(f"INFO:     Team CS percentages cached ({len(team_cs_percentages)} matches).")
+    
+    base_fixtures = create_base_fixtures_from_registry(fixture_registry, fixture_venue_table(USER_PROVIDED_FIXTURES_WITH_STADIUMS_RAW, TEAM_NAME_MAPPING))
+    if not base_fixtures: raise RuntimeError("CRITICAL ERROR: ALL_BASE_FIXTURES list is empty after processing. Cannot continue.")
+    
+    all_teams_app2 = {team_c for fix in base_fixtures for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])}
+    team_season_stats: Dict[str, Dict[str, float]] = {team_c: {"goals": 0.0, "assists": 0.0} for team_c in all_teams_app2}
+    
+    player_stats_df = load_player_stats_table(PLAYER_STATS_FP, TEAM_NAME_MAPPING)
+    for team_c, group_df in player_stats_df.groupby('Team_Canonical'):
+        if team_c in team_season_stats:
+            team_season_stats[team_c]["goals"] = float(group_df['Goals'].sum())
+            team_season_stats[team_c]["assists"] = float(group_df['Assists'].sum())
+    ags_data = load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)
+    position_registry = PositionRegistry(list(player_stats_df['Position']) if 'Position' in player_stats_df.columns else [])
+    position_registry.encode(p.get('position') for match in (ags_data or {}).get('matches', []) for p in match.get('players', []) or [])
+    player_table = PlayerTable(player_stats_df, position_registry)
+    print(f"INFO:     Player table partitioned into {len(player_table.team_slices)} team blocks ({len(position_registry) - 1} positions) and TEAM_SEASON_STATS populated.")
+
+    ags_odds_lookup, ags_player_index = _populate_ags_odds_lookup(ags_data, TEAM_NAME_MAPPING)
+    
+    df_outright = get_tournament_outright_odds_data_for_app2(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING)
+    team_strength_metrics: Dict[str, float] = {}
+    normalize_tournament_implied_probs_for_app2(df_outright, all_teams_app2, team_strength_metrics)
+    
+    match_history_contexts = create_last_match_dates_history_for_app2(base_fixtures)
+    fixture_fdr_metrics: Dict[str, Dict[str, float]] = {}
+    for i, fix_fdr in enumerate(base_fixtures):
+        hist_ctx = match_history_contexts[i] if i < len(match_history_contexts) else {}
+        calculate_outright_fdr_components_for_app2(fix_fdr, team_strength_metrics, hist_ctx, fixture_fdr_metrics)
+    print(f"INFO:     FIXTURE_FDR_METRICS_CACHE populated.")
+    return DataState(version, fixture_registry=fixture_registry, team_cs_percentages=team_cs_percentages, fixture_id_to_cs_key=fixture_id_to_cs_key,
+                     base_fixtures=base_fixtures, player_table=player_table, position_registry=position_registry,
+                     team_season_stats=team_season_stats, cs_odds_lookup={}, ags_odds_lookup=ags_odds_lookup, ags_player_index=ags_player_index,
+                     correct_score_matrix_index=correct_score_matrix_index, team_strength_metrics=team_strength_metrics,
+                     match_history_contexts=match_history_contexts, fixture_fdr_metrics=fixture_fdr_metrics)
+
+# --- Group Stage Simulation ---
+def fixture_scoreline_cdf(state: DataState, home_c: str, away_c: str, date_s: str, home_xg: float, away_xg: float) -> np.ndarray:
+    """
+    Cumulative distribution over the flattened (home, away) scoreline grid. From the match's correct-score
+    market where one exists (transposed if it lists the teams the other way round; renormalized over the
+    grid), otherwise independent Poissons on the fixture xG with the tail folded into the last row/column.
+    """
+    matrix = state.correct_score_matrix_index.get((home_c, away_c, date_s))
+    probs = matrix.implied if matrix is not None else None
+    if probs is None:
+        reversed_matrix = state.correct_score_matrix_index.get((away_c, home_c, date_s))
+        if reversed_matrix is not None: probs = reversed_matrix.implied.T
+    if probs is None or probs.sum() <= 0:
+        goals = np.arange(GROUP_SIMULATION_POISSON_MAX_GOALS + 1)
+        home_pmf, away_pmf = poisson.pmf(goals, home_xg), poisson.pmf(goals, away_xg)
+        home_pmf[-1] += poisson.sf(goals[-1], home_xg); away_pmf[-1] += poisson.sf(goals[-1], away_xg)
+        probs = np.outer(home_pmf, away_pmf)
+    cdf = np.cumsum(probs.ravel() / probs.sum())
+    cdf[-1] = 1.0
+    return cdf
+
+def build_group_simulation_plan(state: Optional[DataState] = None) -> Dict[str, Any]:
+    """
+    Everything the simulator needs as plain arrays: per group the teams and fixture team indices, and per
+    group fixture the scoreline CDF (CS market where priced, else Poisson on the validated fixture xG)
+    """
+    state = state or DATA_STATE
+    group_fixtures: Dict[str, List[Dict[str, Any]]] = {}
+    for fixture in state.base_fixtures:
+        if fixture.get('group'): group_fixtures.setdefault(str(fixture['group']), []).append(fixture)
+    groups, cdfs = [], []
+    for group, fixtures in sorted(group_fixtures.items()):
+        teams = sorted({team_c for fix in fixtures for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])})
+        team_pos = {team_c: i for i, team_c in enumerate(teams)}
+        columns = []
+        for fix in fixtures:
+            ctx = _resolve_fixture_xg_and_cs(fix, state)
+            columns.append(len(cdfs))
+            cdfs.append(fixture_scoreline_cdf(state, fix['home_team_canonical'], fix['away_team_canonical'], fix['date_str'], ctx['home_xg'], ctx['away_xg']))
+        groups.append({"group": group, "teams": teams, "columns": np.array(columns, dtype=np.intp),
+                       "home": np.array([team_pos[fix['home_team_canonical']] for fix in fixtures], dtype=np.intp),
+                       "away": np.array([team_pos[fix['away_team_canonical']] for fix in fixtures], dtype=np.intp)})
+    return {"groups": groups, "cdfs": cdfs}
+
+def rank_group_tables(home: np.ndarray, away: np.ndarray, home_goals: np.ndarray, away_goals: np.ndarray, n_teams: int,
+                      lots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finishing places for every simulated group at once. Goals are (fixture, simulation) arrays and `lots`
+    is (team, simulation); returns (places, points) as (team, simulation) arrays, place 0 being the group
+    winner. Ranked on points, then head-to-head points, goal difference and goals among the teams level
+    on points, then overall goal difference and goals, then `lots` (the drawing of lots).
+    """
+    n_sims = home_goals.shape[1]
+    points, goals_for, goals_against = (np.zeros((n_teams, n_sims), dtype=np.int16) for _ in range(3))
+    results = []
+    for f, (h, a) in enumerate(zip(home, away)):
+        hg, ag = home_goals[f], away_goals[f]
+        home_points, away_points = (3 * (hg > ag) + (hg == ag)).astype(np.int16), (3 * (ag > hg) + (hg == ag)).astype(np.int16)
+        results.append((h, a, hg, ag, home_points, away_points))
+        points[h] += home_points; points[a] += away_points
+        goals_for[h] += hg; goals_against[h] += ag; goals_for[a] += ag; goals_against[a] += hg
+    h2h_points, h2h_gd, h2h_gf = (np.zeros((n_teams, n_sims), dtype=np.int16) for _ in range(3))
+    for h, a, hg, ag, home_points, away_points in results:
+        level = points[h] == points[a]
+        h2h_points[h] += level * home_points; h2h_points[a] += level * away_points
+        h2h_gd[h] += level * (hg - ag); h2h_gd[a] += level * (ag - hg)
+        h2h_gf[h] += level * hg; h2h_gf[a] += level * ag
+    # Pack the criteria into one integer per team (8 bits each, most significant first), then count who beats whom.
+    score = np.zeros((n_teams, n_sims), dtype=np.int64)
+    for key in (points, h2h_points, h2h_gd, h2h_gf, goals_for - goals_against, goals_for):
+        score = (score << 8) | (np.clip(key, -127, 127).astype(np.int64) + 128)
+    beaten_by = (score[None, :, :] > score[:, None, :]) | ((score[None, :, :] == score[:, None, :]) & (lots[None, :, :] > lots[:, None, :]))
+    return beaten_by.sum(axis=1), points
+
+def simulate_group_shard(plan: Dict[str, Any], n_sims: int, seed_seq: np.random.SeedSequence) -> Dict[str, Dict[str, np.ndarray]]:
+    """Position counts, points totals and each simulation's qualifiers (team indices, by place) per group for one shard of `n_sims` tournaments"""
+    rng = np.random.default_rng(seed_seq)
+    uniforms = rng.random((len(plan["cdfs"]), n_sims))
+    home_goals = np.empty((len(plan["cdfs"]), n_sims), dtype=np.int16)
+    away_goals = np.empty_like(home_goals)
+    for col, cdf in enumerate(plan["cdfs"]):
+        grid_size = int(round(np.sqrt(len(cdf))))
+        cells = np.minimum(np.searchsorted(cdf, uniforms[col], side='right'), len(cdf) - 1)
+        home_goals[col], away_goals[col] = np.divmod(cells, grid_size)
+    results = {}
+    for group in plan["groups"]:
+        n_teams, cols = len(group["teams"]), group["columns"]
+        places, points = rank_group_tables(group["home"], group["away"], home_goals[cols], away_goals[cols], n_teams, rng.random((n_teams, n_sims)))
+        position_counts = np.bincount((np.arange(n_teams)[:, None] * n_teams + places).ravel(), minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+        results[group["group"]] = {"position_counts": position_counts, "points_total": points.sum(axis=1),
+                                   "qualifiers": np.argsort(places, axis=0)[:GROUPS_QUALIFYING_PLACES].astype(np.int8)}
+    return results
+
+def run_group_simulation(n_sims: int = GROUP_SIMULATION_DEFAULT_RUNS, seed: int = 0, workers: int = GROUP_SIMULATION_WORKERS,
+                         state: Optional[DataState] = None) -> List[Dict[str, Any]]:
+    """
+    Monte Carlo over every group fixture at once, returning per group its teams, the (team, place)
+    probability matrix, expected points and the (place, simulation) qualifiers. Runs in fixed-size shards seeded from `seed`, so results are
+    reproducible and do not depend on `workers` (>1 spreads the shards over forked processes).
+    """
+    plan = build_group_simulation_plan(state)
+    shard_sizes = [min(GROUP_SIMULATION_SHARD_SIZE, n_sims - start) for start in range(0, n_sims, GROUP_SIMULATION_SHARD_SIZE)]
+    shard_seeds = np.random.SeedSequence(seed).spawn(len(shard_sizes))
+    if workers > 1 and len(shard_sizes) > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=min(workers, len(shard_sizes)), mp_context=multiprocessing.get_context("fork")) as pool:
+            shard_results = list(pool.map(simulate_group_shard, [plan] * len(shard_sizes), shard_sizes, shard_seeds))
+    else:
+        shard_results = [simulate_group_shard(plan, size, shard_seed) for size, shard_seed in zip(shard_sizes, shard_seeds)]
+    return [{"group": group["group"], "teams": group["teams"],
+             "position_probs": sum(shard[group["group"]]["position_counts"] for shard in shard_results) / max(n_sims, 1),
+             "expected_points": sum(shard[group["group"]]["points_total"] for shard in shard_results) / max(n_sims, 1),
+             "qualifiers": np.concatenate([shard[group["group"]]["qualifiers"] for shard in shard_results], axis=1)}
+            for group in plan["groups"]]
+
+def simulate_group_stage(n_sims: int = GROUP_SIMULATION_DEFAULT_RUNS, seed: int = 0, workers: int = GROUP_SIMULATION_WORKERS,
+                         state: Optional[DataState] = None) -> List[Dict[str, Any]]:
+    """Finishing-position probabilities, qualification probability and expected points per team, per group"""
+    output = []
+    for group in run_group_simulation(n_sims, seed, workers, state):
+        position_probs = group["position_probs"] * 100.0
+        output.append({"group": group["group"], "simulations": n_sims, "seed": seed, "teams": sorted((
+            {"team_name_canonical": team_c, "position_probabilities": [round(float(p), 2) for p in position_probs[i]],
+             "qualification_probability": round(float(position_probs[i, :GROUPS_QUALIFYING_PLACES].sum()), 2),
+             "expected_points": round(float(group["expected_points"][i]), 3)}
+            for i, team_c in enumerate(group["teams"])), key=lambda t: (-t["qualification_probability"], -t["expected_points"]))})
+    return output
+
+# --- Knockout Bracket ---
+_BRACKET_GROUP_SLOT_RE = re.compile(r"^(1st|2nd) Group ([A-Z])$")
+_BRACKET_WINNER_SLOT_RE = re.compile(r"^Winner Match (\d+)$")
+
+def poisson_scoreline_grid(home_xg: np.ndarray, away_xg: np.ndarray, max_goals: int = GROUP_SIMULATION_POISSON_MAX_GOALS) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-side goal PMFs (..., max_goals+1) for arrays of xG, with the tail folded into the last entry"""
+    goals = np.arange(max_goals + 1)
+    home_pmf, away_pmf = poisson.pmf(goals, np.asarray(home_xg)[..., None]), poisson.pmf(goals, np.asarray(away_xg)[..., None])
+    home_pmf[..., -1] += poisson.sf(max_goals, np.asarray(home_xg)); away_pmf[..., -1] += poisson.sf(max_goals, np.asarray(away_xg))
+    return home_pmf, away_pmf
+
+def _win_draw_from_pmfs(home_pmf: np.ndarray, away_pmf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    away_below = np.cumsum(away_pmf, axis=-1) - away_pmf  # P(away scores fewer than g)
+    return (home_pmf * away_below).sum(axis=-1), (home_pmf * away_pmf).sum(axis=-1)
+
+_KNOCKOUT_PAIR_MODEL_MEMO: Dict[str, Any] = {"source": None, "model": None}
+
+def get_knockout_pair_model(state: Optional[DataState] = None) -> Dict[str, Any]:
+    """
+    Neutral-venue matchup model for every ordered team pair: xg[i, j] is team i's xG against team j (outright
+    strengths through the same FDR -> xG path as group fixtures, without venue or fatigue) and advance[i, j]
+    the chance i goes through: win in 90, or draw then win extra time, or draw extra time and win penalties.
+    Memoized per strength map, so it is rebuilt only when the outright odds change.
+    """
+    state = state or DATA_STATE
+    memo = _KNOCKOUT_PAIR_MODEL_MEMO
+    if memo["source"] is state.team_strength_metrics and memo["model"] is not None: return memo["model"]
+    strengths = state.team_strength_metrics
+    teams = sorted(set(strengths) | {team_c for fix in state.base_fixtures for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])})
+    n_teams = len(teams)
+    xg = np.zeros((n_teams, n_teams), dtype=float)
+    for i, team_i in enumerate(teams):
+        for j, team_j in enumerate(teams):
+            if i == j: continue
+            fdr_i = round(float(np.clip(OUTRIGHT_COMPONENT_WEIGHTS['base_strength_from_odds'] * strengths.get(team_j, 10.0) / 1.5 + 25, 1, 99)), 1)
+            fdr_j = round(float(np.clip(OUTRIGHT_COMPONENT_WEIGHTS['base_strength_from_odds'] * strengths.get(team_i, 10.0) / 1.5 + 25, 1, 99)), 1)
+            xg[i, j] = validate_and_adjust_xg(*estimate_xg_from_fdr_outrights_for_app2(fdr_i, fdr_j))[0]
+    win_90, draw_90 = _win_draw_from_pmfs(*poisson_scoreline_grid(xg, xg.T))
+    win_et, draw_et = _win_draw_from_pmfs(*poisson_scoreline_grid(xg * KNOCKOUT_EXTRA_TIME_XG_FRACTION, xg.T * KNOCKOUT_EXTRA_TIME_XG_FRACTION))
+    advance = win_90 + draw_90 * (win_et + draw_et * KNOCKOUT_PENALTY_WIN_PROBABILITY)
+    np.fill_diagonal(advance, 0.0)
+    model = {"teams": teams, "team_pos": {team_c: i for i, team_c in enumerate(teams)}, "xg": xg, "advance": advance}
+    memo.update(source=strengths, model=model)
+    return model
+
+def _pair_model_for_date(model: Dict[str, Any], date_s: str, state: DataState) -> Tuple[np.ndarray, np.ndarray]:
+    """(xg, advance) for matches on `date_s`: the strength model, with any pair priced in a CS market that day taken from the market"""
+    xg, advance = model["xg"], model["advance"]
+    for (home_c, away_c, cs_date), matrix in state.correct_score_matrix_index.items():
+        i, j = model["team_pos"].get(home_c), model["team_pos"].get(away_c)
+        if cs_date != date_s or i is None or j is None or matrix.implied.sum() <= 0: continue
+        if xg is model["xg"]: xg, advance = xg.copy(), advance.copy()
+        probs = matrix.implied / matrix.implied.sum()
+        win_90, draw_90, loss_90 = float(np.tril(probs, -1).sum()), float(np.trace(probs)), float(np.triu(probs, 1).sum())
+        home_xg, away_xg = matrix.expected_goals()
+        if home_xg is not None: xg[i, j], xg[j, i] = home_xg, away_xg
+        et_win, et_draw = _win_draw_from_pmfs(*poisson_scoreline_grid(xg[i, j] * KNOCKOUT_EXTRA_TIME_XG_FRACTION, xg[j, i] * KNOCKOUT_EXTRA_TIME_XG_FRACTION))
+        advance[i, j] = win_90 + draw_90 * (float(et_win) + float(et_draw) * KNOCKOUT_PENALTY_WIN_PROBABILITY)
+        advance[j, i] = loss_90 + draw_90 * (1.0 - float(et_win) - float(et_draw) * KNOCKOUT_PENALTY_WIN_PROBABILITY)
+    return xg, advance
+
+def compute_knockout_bracket(group_results: List[Dict[str, Any]], bracket: List[Dict[str, Any]] = KNOCKOUT_BRACKET_RAW,
+                             state: Optional[DataState] = None, chunk_size: int = GROUP_SIMULATION_SHARD_SIZE) -> List[Dict[str, Any]]:
+    """
+    Push every simulated group outcome from `group_results` (run_group_simulation) through the bracket.
+    Given one outcome the two slots of a match come from disjoint parts of the bracket, so their team
+    distributions are independent and each match is resolved exactly (no sampling past the group stage).
+    Averaging over the simulations keeps the dependence between slots fed by the same group, e.g. a group's
+    winner and runner-up can never both reach the final.
+    """
+    state = state or DATA_STATE
+    model = get_knockout_pair_model(state)
+    teams, team_pos, n_teams = model["teams"], model["team_pos"], len(model["teams"])
+    n_sims = max((group["qualifiers"].shape[1] for group in group_results), default=0)
+    slot_teams: Dict[str, np.ndarray] = {}
+    for group in group_results:
+        group_team_pos = np.array([team_pos[team_c] for team_c in group["teams"]], dtype=np.intp)
+        for place, label in enumerate(("1st", "2nd")):
+            if place < group["qualifiers"].shape[0]: slot_teams[f"{label} Group {group['group']}"] = group_team_pos[group["qualifiers"][place]]
+    matches = sorted(bracket, key=lambda m: m['match'])
+    pair_models = {match['match']: _pair_model_for_date(model, match['date'], state) for match in matches}
+    pair_totals = {match['match']: np.zeros((n_teams, n_teams)) for match in matches}
+
+    for start in range(0, n_sims, chunk_size):
+        rows = np.arange(min(chunk_size, n_sims - start))
+        winners: Dict[int, np.ndarray] = {}
+
+        def resolve_slot(label: str) -> np.ndarray:
+            """(simulation, team) probability of each team filling the slot, within this chunk"""
+            winner_slot = _BRACKET_WINNER_SLOT_RE.match(label)
+            if winner_slot: return winners.get(int(winner_slot.group(1)), np.zeros((len(rows), n_teams)))
+            if not _BRACKET_GROUP_SLOT_RE.match(label): raise ValueError(f"Unknown bracket slot '{label}'.")
+            dist = np.zeros((len(rows), n_teams))
+            if label in slot_teams: dist[rows, slot_teams[label][start:start + len(rows)]] = 1.0
+            return dist
+
+        for match in matches:
+            home_dist, away_dist = resolve_slot(match['home']), resolve_slot(match['away'])
+            advance = pair_models[match['match']][1]
+            pair_totals[match['match']] += home_dist.T @ away_dist
+            winners[match['match']] = home_dist * (away_dist @ advance.T) + away_dist * (home_dist @ advance.T)
+
+    def candidates(dist: np.ndarray, pairs: np.ndarray, wins: np.ndarray, xg_for: np.ndarray) -> List[Dict[str, Any]]:
+        out = []
+        for i in np.flatnonzero(dist > 0):
+            plays = pairs[i].sum()
+            opponent = int(np.argmax(pairs[i])) if plays > 0 else None
+            out.append({"team_name_canonical": teams[i], "probability": round(float(dist[i]) * 100.0, 2),
+                        "advance_probability": round(float(wins[i]) * 100.0, 2),
+                        "expected_opponent": teams[opponent] if opponent is not None else None,
+                        "expected_opponent_probability": round(float(pairs[i, opponent] / plays) * 100.0, 2) if plays > 0 else 0.0,
+                        "expected_xg": round(float((pairs[i] * xg_for[i]).sum() / plays), 3) if plays > 0 else 0.0})
+        return sorted(out, key=lambda c: (-c["probability"], c["team_name_canonical"]))
+
+    output = []
+    for match in matches:
+        xg, advance = pair_models[match['match']]
+        pairs = pair_totals[match['match']] / max(n_sims, 1)
+        home_wins, away_wins = (pairs * advance).sum(axis=1), (pairs * advance.T).sum(axis=0)
+        match_winners = home_wins + away_wins
+        home_plays, away_plays = pairs.sum(axis=1), pairs.sum(axis=0)
+        output.append({
+            "match_number": match['match'], "stage": match['stage'], "date_str": match['date'], "home_slot": match['home'], "away_slot": match['away'],
+            "home_candidates": candidates(home_plays, pairs, home_wins, xg), "away_candidates": candidates(away_plays, pairs.T, away_wins, xg),
+            "expected_home_xg": round(float((pairs * xg).sum()), 3), "expected_away_xg": round(float((pairs * xg.T).sum()), 3),
+            "winner_probabilities": [{"team_name_canonical": teams[i], "probability": round(float(p) * 100.0, 2)}
+                                     for i, p in sorted(enumerate(match_winners), key=lambda ip: -ip[1]) if p > 0]})
+    return output
 
 # --- Lifespan Event Handler ---
 @asynccontextmanager
 async def lifespan_manager(app_instance: FastAPI):
     print("INFO:     Application startup - Precomputing all data...")
-    global PLAYER_STATS_DF, TEAM_SEASON_STATS, CS_ODDS_LOOKUP, AGS_ODDS_LOOKUP, \
-           ALL_BASE_FIXTURES, FIXTURE_ID_GW_LOOKUP, TEAM_STRENGTH_METRICS, \
-           MATCH_HISTORY_CONTEXTS, FIXTURE_FDR_METRICS_CACHE, \
-           FIXTURE_LOOKUP_MAP, TEAM_CS_PERCENTAGES_CACHE, FIXTURE_ID_TO_CS_CACHE_KEY_MAP
-
-    # Initialize dictionary to avoid UnboundLocalError
-    TEAM_STRENGTH_METRICS = {}
+    global DATA_STATE
 
     for team_name_detail_key, details_val in TEAM_DETAILS.items():
         if team_name_detail_key not in TEAM_NAME_MAPPING: TEAM_NAME_MAPPING[team_name_detail_key] = team_name_detail_key
@@ -1103,57 +2505,779 @@ async def lifespan_manager(app_instance: FastAPI):
     print("INFO:     TEAM_NAME_MAPPING enriched.")
     
     try:
-        load_and_prepare_fixture_data_for_app1_lookup(FULL_FIXTURE_DATA_RAW, TEAM_NAME_MAPPING)
-        _populate_fixture_id_gw_lookup_for_app2(FULL_FIXTURE_DATA_RAW, TEAM_NAME_MAPPING)
-        cs_data_cache = load_json_data(CORRECT_SCORE_FILE_PATH)
-        if cs_data_cache:
-            team_cs_res = calculate_team_cs_percentages_logic(cs_data_cache, TEAM_NAME_MAPPING, TEAM_DETAILS, FIXTURE_LOOKUP_MAP)
-            for item in team_cs_res:
-                match_id_k, team_c, cs_p, fix_id = item['match_identifier'], item['team_name_canonical'], item['clean_sheet_percentage'], item['fixture_id']
-                if match_id_k not in TEAM_CS_PERCENTAGES_CACHE: TEAM_CS_PERCENTAGES_CACHE[match_id_k] = {}
-                TEAM_CS_PERCENTAGES_CACHE[match_id_k][team_c] = cs_p
-                if fix_id and fix_id != "N/A_FID": FIXTURE_ID_TO_CS_CACHE_KEY_MAP[fix_id] = match_id_k
-            print(f"INFO:     Team CS percentages cached ({len(TEAM_CS_PERCENTAGES_CACHE)} matches).")
-        
-        create_base_fixtures_with_canonical_names_from_hardcoded_for_app2(USER_PROVIDED_FIXTURES_WITH_STADIUMS_RAW, TEAM_NAME_MAPPING, FIXTURE_ID_GW_LOOKUP)
-        if not ALL_BASE_FIXTURES: raise RuntimeError("CRITICAL ERROR: ALL_BASE_FIXTURES list is empty after processing. Cannot continue.")
-        
-        all_teams_app2 = {team_c for fix in ALL_BASE_FIXTURES for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])}
-        for team_c in all_teams_app2:
-            if team_c not in TEAM_SEASON_STATS: TEAM_SEASON_STATS[team_c] = {"goals": 0.0, "assists": 0.0}
-        
-        PLAYER_STATS_DF = pd.read_excel(PLAYER_STATS_FP, sheet_name='Sheet1')
-        team_col = 'Team Name' if 'Team Name' in PLAYER_STATS_DF.columns else 'Team'
-        PLAYER_STATS_DF['Team_Canonical'] = PLAYER_STATS_DF[team_col].apply(lambda x: get_canonical_team_name(str(x), TEAM_NAME_MAPPING))
-        for col in ['Goals', 'Assists']: PLAYER_STATS_DF[col] = pd.to_numeric(PLAYER_STATS_DF[col], errors='coerce').fillna(0.0)
-        for team_c, group_df in PLAYER_STATS_DF.groupby('Team_Canonical'):
-            if team_c in TEAM_SEASON_STATS:
-                TEAM_SEASON_STATS[team_c]["goals"] = float(group_df['Goals'].sum())
-                TEAM_SEASON_STATS[team_c]["assists"] = float(group_df['Assists'].sum())
-        print(f"INFO:     PLAYER_STATS_DF loaded and TEAM_SEASON_STATS populated.")
-
-        ags_data_to_load = load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)
-        if ags_data_to_load: _populate_ags_odds_lookup(ags_data_to_load, TEAM_NAME_MAPPING)
-        
-        df_outright = get_tournament_outright_odds_data_for_app2(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING)
-        normalize_tournament_implied_probs_for_app2(df_outright, all_teams_app2)
-        
-        ALL_BASE_FIXTURES.sort(key=lambda x: x['datetime_obj'])
-        create_last_match_dates_history_for_app2(ALL_BASE_FIXTURES)
-        for i, fix_fdr in enumerate(ALL_BASE_FIXTURES):
-            hist_ctx = MATCH_HISTORY_CONTEXTS[i] if i < len(MATCH_HISTORY_CONTEXTS) else {}
-            calculate_outright_fdr_components_for_app2(fix_fdr, TEAM_STRENGTH_METRICS, hist_ctx)
-        print(f"INFO:     FIXTURE_FDR_METRICS_CACHE populated.")
-
+        with startup_build_lock():
+            snapshot_key = compute_precompute_snapshot_key()
+            state = _load_precompute_snapshot(snapshot_key, DATA_STATE.version + 1)
+            if state is None:
+                state = build_startup_data_state(DATA_STATE.version + 1)
+                _save_precompute_snapshot(snapshot_key, state)
+            if SHARED_STATE_ARENA: state = load_or_build_state_arena(snapshot_key, state)
     except Exception as e:
         print(f"FATAL ERROR during application startup: {e}")
         import traceback; traceback.print_exc()
         raise RuntimeError("Failed to complete application pre-computation.") from e
 
-    print("INFO:     Application startup precomputation complete.")
+    DATA_STATE = state
+    COMPUTE_EXECUTOR.restart()
+    ODDS_FILE_WATCHER.start()
+    print(f"INFO:     Application startup precomputation complete. Compute executor: {COMPUTE_EXECUTOR.kind} x{COMPUTE_EXECUTOR.max_workers}.")
     yield
+    ODDS_FILE_WATCHER.stop()
+    COMPUTE_EXECUTOR.shutdown()
     print("INFO:     Application shutdown.")
 
+# --- Response Cache ---
+class ResponseCache:
+    """
+    Serialized JSON bodies per endpoint, tagged with the data version they were built from.
+    Each entry is replaced with a single dict assignment, so readers see either the old or the new
+    (version, body, etag) triple, never a mix.
+    """
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Any, bytes, str]] = {}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, name: str, version: Any) -> Optional[Tuple[bytes, str]]:
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != version: return None
+        with self._guard: self.hits += 1
+        return entry[1], entry[2]
+
+    def store(self, name: str, version: Any, body: bytes) -> Tuple[bytes, str]:
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._entries[name] = (version, body, etag)
+        with self._guard: self.misses += 1
+        return body, etag
+
+    def clear(self):
+        self._entries = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+RESPONSE_CACHE = ResponseCache()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match: return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def json_bytes_response(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    etag = etag or f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+async def cached_json_response(request: Request, name: str, version: Any, build_body: Callable[..., bytes], *args: Any) -> Response:
+    """Serve from RESPONSE_CACHE; on a miss one shared `build_body(*args)` runs on COMPUTE_EXECUTOR, not the event loop"""
+    cached = RESPONSE_CACHE.lookup(name, version)
+    if cached is None:
+        async def build_and_store() -> Tuple[bytes, str]:
+            return RESPONSE_CACHE.store(name, version, await COMPUTE_EXECUTOR.run(build_body, *args))
+        cached = await SINGLE_FLIGHT.run((name, args, version), build_and_store)
+    body, etag = cached
+    return json_bytes_response(request, body, etag)
+
+def request_data_version(*file_paths: str) -> Tuple[Any, ...]:
+    """DataState version plus the stat signature of every request-time input file"""
+    return (DATA_STATE.version,) + tuple(DataFileCache.file_signature(fp) for fp in file_paths)
+
+def build_combined_stats_models(all_matches_data: List[Dict[str, Any]]) -> List[MatchWithPlayerCombinedStats]:
+    return [MatchWithPlayerCombinedStats(
+                fixture_id=match_data["fixture_id"], GW=match_data["GW"], date_str=match_data["date_str"],
+                home_team_canonical=match_data["home_team_canonical"], away_team_canonical=match_data["away_team_canonical"],
+                home_team_xg=match_data.get("home_team_xg"), away_team_xg=match_data.get("away_team_xg"),
+                xg_source=match_data.get("xg_source"),
+                players=[PlayerCombinedStats(**p_data) for p_data in match_data["players_data"]]
+            ) for match_data in all_matches_data]
+
+TEAM_CLEAN_SHEETS_ADAPTER = TypeAdapter(List[TeamCleanSheet])
+TOP_CORRECT_SCORES_ADAPTER = TypeAdapter(List[TopCorrectScores])
+PLAYER_CLEAN_SHEETS_ADAPTER = TypeAdapter(List[MatchWithPlayerCleanSheets])
+COMBINED_STATS_ADAPTER = TypeAdapter(List[MatchWithPlayerCombinedStats])
+MATCH_COMBINED_STATS_ADAPTER = TypeAdapter(MatchWithPlayerCombinedStats)
+GROUP_SIMULATION_ADAPTER = TypeAdapter(List[GroupSimulation])
+KNOCKOUT_BRACKET_ADAPTER = TypeAdapter(List[KnockoutFixture])
+TEAM_RATING_ADAPTER = TypeAdapter(List[TeamRating])
+PLAYER_COMBINED_STATS_ADAPTER = TypeAdapter(PlayerCombinedStats)
+
+# --- Combined Stats Index ---
+class CombinedStatsIndex:
+    """
+    Secondary indexes over one version of the combined-stats output, with every fixture header and
+    player row serialized once. Filtered responses are assembled by joining the selected fragments,
+    so a slice costs proportional to its size rather than to the whole tournament.
+
+    Fragments live back to back in one `blob` addressed by `offsets`; the blob and the per-row arrays can
+    be plain in-memory buffers or read-only memory maps of a state arena shared by several workers.
+    """
+    def __init__(self, blob: Any, offsets: np.ndarray, fixture_fragments: np.ndarray, row_team_codes: np.ndarray,
+                 row_position_codes: np.ndarray, meta: Dict[str, Any]):
+        self.blob, self.offsets = blob, offsets
+        self.fixture_fragments = fixture_fragments  # per fixture: header fragment, first row fragment, end row fragment
+        self.row_team_codes, self.row_position_codes = row_team_codes, row_position_codes  # per fragment, -1 for headers
+        self.meta = meta
+        self.team_codes = {team_c: code for code, team_c in enumerate(meta["team_names"])}
+        self.position_codes = {pos: code for code, pos in enumerate(meta["position_names"])}
+        self.by_fixture_id: Dict[str, int] = meta["by_fixture_id"]
+        self.by_gw: Dict[str, List[int]] = meta["by_gw"]
+        self.by_team: Dict[str, List[int]] = meta["by_team"]
+        self.by_date: List[Tuple[str, int]] = [tuple(entry) for entry in meta["by_date"]]
+        self.fixture_count: int = meta["fixture_count"]
+
+    @staticmethod
+    def model_parts(model: MatchWithPlayerCombinedStats) -> Tuple[Any, ...]:
+        """(header fragment, row fragments, row teams, row positions, fixture key) for one serialized fixture"""
+        header_json = MATCH_COMBINED_STATS_ADAPTER.dump_json(model.model_copy(update={"players": []}))
+        return (header_json[:-len(b"[]}")], [PLAYER_COMBINED_STATS_ADAPTER.dump_json(p) for p in model.players],
+                [p.team_name_canonical for p in model.players], [str(p.Position).lower() if p.Position is not None else "" for p in model.players],
+                (model.fixture_id, str(model.GW), model.home_team_canonical, model.away_team_canonical, model.date_str))
+
+    def fixture_parts(self, pos: int) -> Tuple[Any, ...]:
+        header, rows_start, rows_end = (int(v) for v in self.fixture_fragments[pos])
+        team_names, position_names = self.meta["team_names"], self.meta["position_names"]
+        return (self.fragment(header), [self.fragment(i) for i in range(rows_start, rows_end)],
+                [team_names[c] for c in self.row_team_codes[rows_start:rows_end]], [position_names[c] for c in self.row_position_codes[rows_start:rows_end]],
+                tuple(self.meta["fixtures"][pos]))
+
+    @classmethod
+    def from_parts(cls, fixture_parts: List[Tuple[Any, ...]]) -> "CombinedStatsIndex":
+        fragments: List[bytes] = []
+        fixture_fragments, row_team_codes, row_position_codes = [], [], []
+        team_names: Dict[str, int] = {}
+        position_names: Dict[str, int] = {}
+        meta: Dict[str, Any] = {"by_fixture_id": {}, "by_gw": {}, "by_team": {}, "by_date": [], "fixtures": [], "fixture_count": len(fixture_parts)}
+        for pos, (header, rows, row_teams, row_positions, fixture_key) in enumerate(fixture_parts):
+            header_fragment = len(fragments)
+            fragments.append(header); fragments.extend(rows)
+            row_team_codes.append(-1); row_position_codes.append(-1)
+            row_team_codes.extend(team_names.setdefault(team_c, len(team_names)) for team_c in row_teams)
+            row_position_codes.extend(position_names.setdefault(position, len(position_names)) for position in row_positions)
+            fixture_fragments.append((header_fragment, header_fragment + 1, len(fragments)))
+            fixture_id, gw, home_c, away_c, date_s = fixture_key
+            meta["fixtures"].append(list(fixture_key))
+            meta["by_fixture_id"].setdefault(fixture_id, pos)
+            meta["by_gw"].setdefault(gw, []).append(pos)
+            for team_c in (home_c, away_c): meta["by_team"].setdefault(team_c, []).append(pos)
+            meta["by_date"].append((date_s, pos))
+        meta["by_date"].sort()
+        meta.update(team_names=list(team_names), position_names=list(position_names))
+        offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+        np.cumsum([len(fragment) for fragment in fragments], out=offsets[1:])
+        return cls(b"".join(fragments), offsets, np.array(fixture_fragments, dtype=np.int64).reshape(-1, 3),
+                   np.array(row_team_codes, dtype=np.int32), np.array(row_position_codes, dtype=np.int32), meta)
+
+    @classmethod
+    def build(cls, all_matches_data: List[Dict[str, Any]]) -> "CombinedStatsIndex":
+        return cls.from_parts([cls.model_parts(model) for model in build_combined_stats_models(all_matches_data)])
+
+    def with_replaced_fixtures(self, replacements: Dict[int, Dict[str, Any]]) -> "CombinedStatsIndex":
+        """New index with the fixtures at the given positions re-serialized from fresh match data, the rest reused as bytes"""
+        models = dict(zip(replacements, build_combined_stats_models(list(replacements.values()))))
+        return self.from_parts([self.model_parts(models[pos]) if pos in models else self.fixture_parts(pos) for pos in range(self.fixture_count)])
+
+    def fragment(self, i: int) -> bytes:
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def select_fixtures(self, fixture_id: Optional[str] = None, gw: Optional[str] = None, team: Optional[str] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[int]:
+        selected: Optional[set] = None
+        def narrow(positions):
+            nonlocal selected
+            selected = set(positions) if selected is None else selected & set(positions)
+        if fixture_id is not None: narrow([self.by_fixture_id[fixture_id]] if fixture_id in self.by_fixture_id else [])
+        if gw is not None: narrow(self.by_gw.get(str(gw), []))
+        if team is not None: narrow(self.by_team.get(team, []))
+        if date_from is not None or date_to is not None:
+            lo = bisect.bisect_left(self.by_date, (date_from,)) if date_from is not None else 0
+            hi = bisect.bisect_left(self.by_date, (date_to + "\uffff",)) if date_to is not None else len(self.by_date)
+            narrow(pos for _, pos in self.by_date[lo:hi])
+        return sorted(selected) if selected is not None else list(range(self.fixture_count))
+
+    def render_fixture(self, pos: int, team: Optional[str] = None, positions: Optional[set] = None) -> bytes:
+        header, rows_start, rows_end = (int(v) for v in self.fixture_fragments[pos])
+        row_ids = range(rows_start, rows_end)
+        if team is not None or positions is not None:
+            mask = np.ones(rows_end - rows_start, dtype=bool)
+            if team is not None: mask &= self.row_team_codes[rows_start:rows_end] == self.team_codes.get(team, -2)
+            if positions is not None:
+                mask &= np.isin(self.row_position_codes[rows_start:rows_end], [self.position_codes[p] for p in positions if p in self.position_codes])
+            row_ids = (rows_start + np.flatnonzero(mask)).tolist()
+        blob, offsets = self.blob, self.offsets
+        return self.fragment(header) + b"[" + b",".join(blob[int(offsets[i]):int(offsets[i + 1])] for i in row_ids) + b"]}"
+
+    def render(self, fixture_positions: List[int], team: Optional[str] = None, positions: Optional[set] = None) -> bytes:
+        return b"[" + b",".join(self.render_fixture(pos, team, positions) for pos in fixture_positions) + b"]"
+
+    def render_all(self) -> bytes:
+        return self.render(list(range(self.fixture_count)))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def select_combined_stats_fixtures(fixture_id: Optional[str] = None, gw: Optional[str] = None, team: Optional[str] = None,
+                                   date_from: Optional[str] = None, date_to: Optional[str] = None, devig_method: Optional[str] = None) -> List[Dict[str, Any]]:
+    state = get_devigged_state(devig_method)
+    fixtures = [f for f in state.base_fixtures
+                if (fixture_id is None or f['fixture_id'] == fixture_id) and (gw is None or str(f['GW']) == str(gw))
+                and (team is None or team in (f['home_team_canonical'], f['away_team_canonical']))
+                and (date_from is None or f['date_str'] >= date_from) and (date_to is None or f['date_str'] < date_to + "\uffff")]
+    return fixtures[:1] if fixture_id is not None else fixtures
+
+def build_combined_stats_ndjson_line(fixture: Dict[str, Any], team: Optional[str] = None, positions: Optional[set] = None, devig_method: Optional[str] = None) -> bytes:
+    lines = []
+    for match_data in iter_matches_combined_stats_with_cs([fixture], state=get_devigged_state(devig_method)):
+        if team is not None or positions is not None:
+            match_data["players_data"] = [p for p in match_data["players_data"]
+                                          if (team is None or p["team_name_canonical"] == team)
+                                          and (positions is None or (str(p["Position"]).lower() if p["Position"] is not None else "") in positions)]
+        lines.append(MATCH_COMBINED_STATS_ADAPTER.dump_json(build_combined_stats_models([match_data])[0]) + b"\n")
+    return b"".join(lines)
+
+async def iter_combined_stats_ndjson(fixture_id: Optional[str] = None, gw: Optional[str] = None, team: Optional[str] = None,
+                                     positions: Optional[set] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, devig_method: Optional[str] = None):
+    """
+    NDJSON lines for the combined stats, one fixture per line, each computed and serialized on
+    COMPUTE_EXECUTOR so only the fixture being written is held in memory. The stream holds one executor
+    slot from start to finish, so open streams count towards max_pending like any other compute request.
+    """
+    with COMPUTE_EXECUTOR.slot():
+        fixtures = await COMPUTE_EXECUTOR.run_in_slot(select_combined_stats_fixtures, fixture_id, gw, team, date_from, date_to, devig_method)
+        for fixture in fixtures:
+            line = await COMPUTE_EXECUTOR.run_in_slot(build_combined_stats_ndjson_line, fixture, team, positions, devig_method)
+            if line: yield line
+
+async def ndjson_stream_response(lines: AsyncIterator[bytes]) -> StreamingResponse:
+    """Pulls the first line before the headers go out, so a full compute queue or a failing build is still a plain HTTP error"""
+    try: first_line = await lines.__anext__()
+    except StopAsyncIteration: first_line = None
+    async def chained():
+        if first_line is None: return
+        yield first_line
+        async for line in lines: yield line
+    return StreamingResponse(chained(), media_type=NDJSON_MEDIA_TYPE)
+
+# --- Shared State Arena ---
+# With SHARED_STATE_ARENA=1 the bulky read-only parts of the DataState are written once, by whichever
+# worker holds the startup lock, as flat blobs plus .npy arrays: the combined-stats index, the player
+# table columns and the correct-score grids. Every worker then memory-maps the same read-only files and
+# swaps them into its DataState, so that data is resident once per host instead of once per worker. The
+# small dict-shaped fields (fixture registry, AGS lookups, CS percentages, FDR caches) stay per worker, as
+# does any de-vigged copy of the CS grids. The arena is keyed by the hash of the input files, so after a
+# hot reload the first worker to finish republishes it and the others attach to it.
+STATE_ARENA_ARRAYS = ["offsets", "fixture_fragments", "row_team_codes", "row_position_codes"]
+
+class PackedObjectColumn:
+    """
+    A read-only player table column of strings, None or NaN, stored as JSON values back to back in `blob`
+    and addressed by `offsets` like the combined-stats fragments. Indexing decodes one value; pickling
+    (e.g. into the precompute snapshot) yields a plain object array again.
+    """
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob: Any, offsets: np.ndarray):
+        self.blob, self.offsets = blob, offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Any:
+        return json.loads(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __reduce__(self):
+        return _object_array, (list(self),)
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+def _pack_object_columns(columns: Dict[str, Any]) -> Tuple[bytes, Dict[str, np.ndarray]]:
+    """One blob for all `columns` plus each column's offsets into it"""
+    fragments: List[bytes] = []
+    offsets: Dict[str, np.ndarray] = {}
+    start = 0
+    for name, values in columns.items():
+        encoded = [json.dumps(value).encode('utf-8') for value in values]
+        column_offsets = np.cumsum([start] + [len(fragment) for fragment in encoded], dtype=np.int64)
+        offsets[name], start = column_offsets, int(column_offsets[-1])
+        fragments.extend(encoded)
+    return b"".join(fragments), offsets
+
+def _stack_correct_score_matrices(matrices: List[CorrectScoreMatrix]) -> Dict[str, np.ndarray]:
+    size = matrices[0].implied.shape[0] if matrices else MAX_POISSON_GOALS + 1
+    def stack(attr: str, dtype: Any) -> np.ndarray:
+        return np.stack([getattr(m, attr) for m in matrices]) if matrices else np.zeros((0, size, size), dtype=dtype)
+    return {"implied": stack("implied", float), "present": stack("present", bool), "order": stack("order", np.int64),
+            "probs": stack("probs", float), "total_implied": np.array([m.total_implied for m in matrices], dtype=float)}
+
+def _map_read_only(file_path: str) -> Any:
+    with open(file_path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+@contextmanager
+def startup_build_lock(lock_fp: str = STARTUP_BUILD_LOCK_FP):
+    """Serialize startup builds across worker processes; later workers then find the snapshot ready"""
+    if fcntl is None:
+        yield; return
+    os.makedirs(os.path.dirname(lock_fp), exist_ok=True)
+    with open(lock_fp, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def write_state_arena(arena_key: str, state: DataState, index: CombinedStatsIndex, out_dir: str = STATE_ARENA_DIR) -> bool:
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        table: PlayerTable = state.player_table
+        object_blob, object_offsets = _pack_object_columns({name: getattr(table, name) for name in PlayerTable.OBJECT_COLUMNS})
+        cs_keys = list(state.correct_score_matrix_index)
+        cs_matrices = [state.correct_score_matrix_index[key] for key in cs_keys]
+        arrays = {**{name: getattr(index, name) for name in STATE_ARENA_ARRAYS},
+                  **{f"player_{name}": getattr(table, name) for name in PlayerTable.NUMERIC_COLUMNS},
+                  **{f"player_{name}_offsets": offsets for name, offsets in object_offsets.items()},
+                  **{f"cs_{name}": stacked for name, stacked in _stack_correct_score_matrices(cs_matrices).items()}}
+        with open(os.path.join(tmp_dir, 'blob.bin'), 'wb') as f: f.write(index.blob)
+        with open(os.path.join(tmp_dir, 'player_objects.bin'), 'wb') as f: f.write(object_blob)
+        for name, array in arrays.items(): np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({"format_version": STATE_ARENA_FORMAT_VERSION, "key": arena_key, "index": index.meta,
+                       "player_team_slices": [[team_c, sl.start, sl.stop] for team_c, sl in table.team_slices.items()],
+                       "cs_keys": [list(key) for key in cs_keys], "cs_extras": [m.extras for m in cs_matrices]}, f)
+        if os.path.isdir(out_dir):
+            for old_file in os.listdir(out_dir): os.remove(os.path.join(out_dir, old_file))
+            os.rmdir(out_dir)
+        os.replace(tmp_dir, out_dir)
+        print(f"INFO:     Shared state arena written to {out_dir} ({len(index.blob) + len(object_blob)} bytes of fragments, {len(table)} players, {len(cs_keys)} CS grids).")
+        return True
+    except Exception as e:
+        print(f"WARNING: Could not write shared state arena '{out_dir}': {e}")
+        return False
+
+def attach_state_arena(arena_key: str, in_dir: str = STATE_ARENA_DIR) -> Optional[Dict[str, Any]]:
+    """The arena for `arena_key` as DataState fields over read-only memory maps, or None if it is missing or stale"""
+    meta_fp = os.path.join(in_dir, 'meta.json')
+    if not os.path.exists(meta_fp): return None
+    try:
+        with open(meta_fp, 'r', encoding='utf-8') as f: meta = json.load(f)
+        if meta.get("format_version") != STATE_ARENA_FORMAT_VERSION or meta.get("key") != arena_key: return None
+        arrays = {file_name[:-len(".npy")]: np.asarray(np.load(os.path.join(in_dir, file_name), mmap_mode='r', allow_pickle=False))
+                  for file_name in os.listdir(in_dir) if file_name.endswith(".npy")}
+        index = CombinedStatsIndex(_map_read_only(os.path.join(in_dir, 'blob.bin')), meta=meta["index"], **{name: arrays[name] for name in STATE_ARENA_ARRAYS})
+        object_blob = _map_read_only(os.path.join(in_dir, 'player_objects.bin'))
+        player_table = PlayerTable.from_columns(
+            {**{name: PackedObjectColumn(object_blob, arrays[f"player_{name}_offsets"]) for name in PlayerTable.OBJECT_COLUMNS},
+             **{name: arrays[f"player_{name}"] for name in PlayerTable.NUMERIC_COLUMNS}},
+            {team_c: slice(start, stop) for team_c, start, stop in meta["player_team_slices"]})
+        correct_score_matrix_index = {
+            tuple(key): CorrectScoreMatrix.from_arrays(arrays["cs_implied"][i], arrays["cs_present"][i], arrays["cs_order"][i], float(arrays["cs_total_implied"][i]),
+                                                       [tuple(extra) for extra in meta["cs_extras"][i]], arrays["cs_probs"][i])
+            for i, key in enumerate(meta["cs_keys"])}
+        return {"combined_stats_index": index, "player_table": player_table, "correct_score_matrix_index": correct_score_matrix_index}
+    except Exception as e:
+        print(f"WARNING: Shared state arena '{in_dir}' unreadable, rebuilding: {e}")
+        return None
+
+def load_or_build_state_arena(arena_key: str, state: DataState) -> DataState:
+    """`state` over the arena for `arena_key`, building the arena first if this is the first worker to get here"""
+    shared = attach_state_arena(arena_key)
+    if shared is not None:
+        print(f"INFO:     Attached to shared state arena ({shared['combined_stats_index'].fixture_count} fixtures).")
+        return state.evolve(state.version, **shared)
+    built = CombinedStatsIndex.build(calculate_all_matches_combined_stats_with_cs(state))
+    shared = attach_state_arena(arena_key) if write_state_arena(arena_key, state, built) else None
+    return state.evolve(state.version, **(shared or {"combined_stats_index": built}))
+
+def republish_state_arena(arena_key: str, state: DataState, index: CombinedStatsIndex) -> DataState:
+    """After a hot reload: `state` over the arena another worker already published for `arena_key`, or over a newly published one"""
+    with startup_build_lock():
+        shared = attach_state_arena(arena_key)
+        if shared is None and write_state_arena(arena_key, state, index): shared = attach_state_arena(arena_key)
+    return state.evolve(state.version, **(shared or {"combined_stats_index": index}))
+
+def get_combined_stats_index(state: Optional[DataState] = None) -> CombinedStatsIndex:
+    """Index for `state` (default: the current DataState), built on first use and kept on that state"""
+    state = state or DATA_STATE
+    if state.combined_stats_index is not None: return state.combined_stats_index
+    def build_index() -> CombinedStatsIndex:
+        if state.combined_stats_index is not None: return state.combined_stats_index
+        all_matches_data = calculate_all_matches_combined_stats_with_cs(state)
+        if not all_matches_data: raise EndpointDataError(404, "No combined player stats calculated.")
+        return state.memoize_combined_stats_index(CombinedStatsIndex.build(all_matches_data))
+    return SINGLE_FLIGHT.run_sync(("combined-stats-index", (), state.version, state.devig_method), build_index)
+
+# --- Hot Reload ---
+# Odds files are polled for stat changes. A change is narrowed down to the matchups (frozenset of
+# canonical teams) whose odds actually differ, and only those fixtures get their FDR, xG, CS and
+# player rows recomputed; everything else is carried over, including its serialized index fragments.
+HOT_RELOAD_WATCHED_FILES = [CORRECT_SCORE_FILE_PATH, UNIFIED_ANYTIME_GOALSCORER_FILE_PATH, HTML_ODDS_FP, MD_ODDS_FP]
+HOT_RELOAD_LOCK = threading.Lock()
+ODDS_MATCHUP_SIGNATURES: Dict[str, Dict[FrozenSet[str], str]] = {"cs": {}, "ags": {}}
+
+def cs_matchup_signatures(cs_data: Optional[Dict[str, Any]]) -> Dict[FrozenSet[str], str]:
+    grouped: Dict[FrozenSet[str], List[Any]] = {}
+    for cs_match in (cs_data or {}).get('matches', []):
+        team_names = str(cs_match.get('match') or '').split(" vs ")
+        if len(team_names) != 2: continue
+        home_c, away_c = (get_canonical_team_name(name.strip(), TEAM_NAME_MAPPING) for name in team_names)
+        if not home_c.startswith("N/A_") and not away_c.startswith("N/A_"): grouped.setdefault(frozenset({home_c, away_c}), []).append(cs_match)
+    return {key: json.dumps(entries, sort_keys=True, default=str) for key, entries in grouped.items()}
+
+def ags_matchup_signatures(ags_data: Optional[Dict[str, Any]]) -> Dict[FrozenSet[str], str]:
+    signatures: Dict[FrozenSet[str], str] = {}
+    for match in (ags_data or {}).get('matches', []):
+        if not match.get('home_team') or not match.get('away_team') or not match.get('players'): continue
+        home_c, away_c = get_canonical_team_name(match['home_team'], TEAM_NAME_MAPPING), get_canonical_team_name(match['away_team'], TEAM_NAME_MAPPING)
+        if home_c.startswith("N/A_") or away_c.startswith("N/A_"): continue
+        signatures[frozenset({home_c, away_c})] = json.dumps(match['players'], sort_keys=True, default=str)
+    return signatures
+
+def _changed_keys(old: Dict[Any, Any], new: Dict[Any, Any]) -> set:
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+def record_odds_matchup_signatures():
+    ODDS_MATCHUP_SIGNATURES.update(cs=cs_matchup_signatures(load_json_data(CORRECT_SCORE_FILE_PATH)),
+                                   ags=ags_matchup_signatures(load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)))
+
+def reload_changed_odds(changed_paths: List[str]) -> Dict[str, Any]:
+    """
+    Derive the next DataState for `changed_paths` off to the side and publish it. Returns the changed
+    matchups and fixture count. The correct-score dicts are rebuilt whole (a handful of matrices, in file
+    order as at startup); FDR and player rows are recomputed only for the affected fixtures.
+    """
+    global DATA_STATE
+    with HOT_RELOAD_LOCK:
+        state = DATA_STATE
+        changes: Dict[str, Any] = {}
+        changed_matchups: set = set()
+        if CORRECT_SCORE_FILE_PATH in changed_paths:
+            cs_data = load_json_data(CORRECT_SCORE_FILE_PATH)
+            signatures = cs_matchup_signatures(cs_data)
+            changed_cs = _changed_keys(ODDS_MATCHUP_SIGNATURES["cs"], signatures)
+            if changed_cs:
+                team_cs_percentages, fixture_id_to_cs_key = {}, {}
+                if cs_data: add_team_cs_percentages(cs_data, state.fixture_registry.by_pair, team_cs_percentages, fixture_id_to_cs_key)
+                changes.update(correct_score_matrix_index={(m["home_canon"], m["away_canon"], m["date"]): m["matrix"] for m in get_ingested_correct_scores(cs_data, TEAM_NAME_MAPPING)},
+                               team_cs_percentages=team_cs_percentages, fixture_id_to_cs_key=fixture_id_to_cs_key)
+                changed_matchups |= changed_cs
+            ODDS_MATCHUP_SIGNATURES["cs"] = signatures
+        if UNIFIED_ANYTIME_GOALSCORER_FILE_PATH in changed_paths:
+            ags_data = load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)
+            signatures = ags_matchup_signatures(ags_data)
+            changed_ags = _changed_keys(ODDS_MATCHUP_SIGNATURES["ags"], signatures)
+            if changed_ags:
+                ags_lookup, ags_index = dict(state.ags_odds_lookup), dict(state.ags_player_index)
+                for key in changed_ags: ags_lookup.pop(key, None); ags_index.pop(key, None)
+                for match in ags_data.get('matches', []) if ags_data else []:
+                    if not match.get('home_team') or not match.get('away_team') or not match.get('players'): continue
+                    key = frozenset({get_canonical_team_name(match['home_team'], TEAM_NAME_MAPPING), get_canonical_team_name(match['away_team'], TEAM_NAME_MAPPING)})
+                    if key in changed_ags:
+                        ags_lookup[key] = match['players']
+                        ags_index[key] = build_ags_player_index(match['players'], TEAM_NAME_MAPPING)
+                changes.update(ags_odds_lookup=ags_lookup, ags_player_index=ags_index)
+                changed_matchups |= changed_ags
+            ODDS_MATCHUP_SIGNATURES["ags"] = signatures
+        base_fixtures = state.base_fixtures
+        fixture_positions: Dict[FrozenSet[str], List[int]] = {}
+        for pos, fix in enumerate(base_fixtures): fixture_positions.setdefault(frozenset({fix['home_team_canonical'], fix['away_team_canonical']}), []).append(pos)
+        if HTML_ODDS_FP in changed_paths or MD_ODDS_FP in changed_paths:
+            all_teams = {team_c for fix in base_fixtures for team_c in (fix['home_team_canonical'], fix['away_team_canonical'])}
+            strength_metrics: Dict[str, float] = {}
+            normalize_tournament_implied_probs_for_app2(get_tournament_outright_odds_data_for_app2(HTML_ODDS_FP, MD_ODDS_FP, TEAM_NAME_MAPPING), all_teams, strength_metrics)
+            changed_teams = _changed_keys(state.team_strength_metrics, strength_metrics)
+            if changed_teams:
+                fdr_metrics = dict(state.fixture_fdr_metrics)
+                fdr_matchups = {key for key in fixture_positions if key & changed_teams}
+                for key in fdr_matchups:
+                    for pos in fixture_positions[key]: fdr_metrics.pop(base_fixtures[pos].get('fixture_id', 'unknown_fixture'), None)
+                history = state.match_history_contexts
+                for key in fdr_matchups:
+                    for pos in fixture_positions[key]:
+                        calculate_outright_fdr_components_for_app2(base_fixtures[pos], strength_metrics, history[pos] if pos < len(history) else {}, fdr_metrics)
+                changes.update(team_strength_metrics=strength_metrics, fixture_fdr_metrics=fdr_metrics)
+                changed_matchups |= fdr_matchups
+        if not changes: return {"changed_matchups": [], "recomputed_fixtures": 0}
+        if NO_MARKET_XG_SOURCE == "team_ratings" and ("correct_score_matrix_index" in changes or "ags_odds_lookup" in changes):
+            changed_matchups |= set(fixture_positions)  # ratings are solved jointly, so any market moves every unpriced fixture
+
+        new_state = state.evolve(state.version + 1, **changes)
+        positions = sorted(pos for key in changed_matchups for pos in fixture_positions.get(key, []))
+        previous_index = state.combined_stats_index
+        if previous_index is not None and previous_index.fixture_count == len(base_fixtures):
+            fresh_matches = iter_matches_combined_stats_with_cs([base_fixtures[pos] for pos in positions], state=new_state)
+            index = previous_index.with_replaced_fixtures(dict(zip(positions, fresh_matches)))
+        else:
+            index = CombinedStatsIndex.build(calculate_all_matches_combined_stats_with_cs(state=new_state))
+        snapshot_key = compute_precompute_snapshot_key(changed_paths)
+        if SHARED_STATE_ARENA: new_state = republish_state_arena(snapshot_key, new_state, index)
+        else: new_state.memoize_combined_stats_index(index)
+        DATA_STATE = new_state
+        if COMPUTE_EXECUTOR.kind == "process": COMPUTE_EXECUTOR.restart()
+        try: _save_precompute_snapshot(snapshot_key, new_state)
+        except Exception as e: print(f"WARNING: Could not refresh precompute snapshot after reload: {e}")
+        return {"changed_matchups": [sorted(key) for key in changed_matchups], "recomputed_fixtures": len(positions)}
+
+class OddsFileWatcher:
+    """Polls HOT_RELOAD_WATCHED_FILES on a daemon thread and calls reload_changed_odds on any stat change"""
+    def __init__(self, file_paths: List[str], interval_seconds: float):
+        self.file_paths, self.interval_seconds = file_paths, interval_seconds
+        self._signatures: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+    def _current_signatures(self) -> Dict[str, Any]:
+        return {fp: DataFileCache.file_signature(fp) for fp in self.file_paths}
+
+    def start(self):
+        if self._thread is not None: return
+        self._signatures = self._current_signatures()
+        record_odds_matchup_signatures()
+        if self.interval_seconds <= 0: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="odds-file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=self.interval_seconds + 1)
+        self._thread = None
+
+    def poll_once(self) -> Optional[Dict[str, Any]]:
+        signatures = self._current_signatures()
+        changed_paths = [fp for fp in self.file_paths if signatures[fp] != self._signatures.get(fp)]
+        if not changed_paths: return None
+        self._signatures = signatures
+        result = reload_changed_odds(changed_paths)
+        self.reloads += 1
+        self.last_reload = {"files": [os.path.basename(fp) for fp in changed_paths], **result}
+        print(f"INFO:     Hot reload of {', '.join(self.last_reload['files'])}: {result['recomputed_fixtures']} fixture(s) recomputed.")
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try: self.poll_once()
+            except Exception as e:
+                print(f"ERROR: Hot reload failed, keeping the previous state: {e}"); import traceback; traceback.print_exc()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self._thread is not None, "interval_seconds": self.interval_seconds, "reloads": self.reloads, "last_reload": self.last_reload}
+
+ODDS_FILE_WATCHER = OddsFileWatcher(HOT_RELOAD_WATCHED_FILES, HOT_RELOAD_INTERVAL_SECONDS)
+
+# --- Compute Executor ---
+class EndpointDataError(Exception):
+    """
+    HTTPException stand-in for the body builders; unlike HTTPException it survives pickling out of a process worker,
+    and ComputeExecutor turns it back into an HTTPException with the same status
+    """
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code, self.detail = status_code, detail
+
+    def __str__(self) -> str:
+        return f"{self.status_code}: {self.detail}"
+
+class ComputeExecutor:
+    """
+    Bounded pool for the CPU-bound endpoint work, so a slow build never blocks the event loop and the
+    light routes keep answering. `kind` is "thread" or "process"; process workers are forked from the
+    loaded parent and therefore see the state as of `start()` - call `restart()` after the state changes.
+    At most `max_pending` tasks (or open streams, see `slot()`) may be in flight; beyond that callers get a 503.
+    """
+    def __init__(self, kind: str, max_workers: int, max_pending: int):
+        if kind == "process" and "fork" not in multiprocessing.get_all_start_methods():
+            print("WARNING: Process compute executor needs the 'fork' start method; using threads instead.")
+            kind = "thread"
+        self.kind, self.max_workers, self.max_pending = kind, max(1, max_workers), max(1, max_pending)
+        self._pool = None
+        self._guard = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _new_pool(self) -> Any:
+        if self.kind == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("fork"))
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+
+    def start(self):
+        with self._guard:
+            if self._pool is None: self._pool = self._new_pool()
+
+    def shutdown(self):
+        with self._guard: pool, self._pool = self._pool, None
+        if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+
+    def restart(self):
+        """
+        Swap in a fresh pool under the lock, so a concurrent run() always sees a live pool. The old pool
+        finishes the requests already queued on it; a background reload never cancels user work.
+        """
+        new_pool = self._new_pool()
+        with self._guard: old_pool, self._pool = self._pool, new_pool
+        if old_pool is not None: old_pool.shutdown(wait=False)
+
+    @contextmanager
+    def slot(self):
+        """One in-flight place, held for the block; a stream holds one for its lifetime and runs its steps with run_in_slot"""
+        with self._guard:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Compute queue is full, retry shortly.")
+            self.in_flight += 1
+        try: yield
+        finally:
+            with self._guard:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def run_in_slot(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._guard:
+            if self._pool is None: self._pool = self._new_pool()
+            pool = self._pool
+        try: return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+        except EndpointDataError as e: raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self.slot(): return await self.run_in_slot(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {"kind": self.kind, "max_workers": self.max_workers, "max_pending": self.max_pending,
+                    "in_flight": self.in_flight, "queue_depth": max(0, self.in_flight - self.max_workers),
+                    "completed": self.completed, "rejected": self.rejected}
+
+COMPUTE_EXECUTOR = ComputeExecutor(COMPUTE_EXECUTOR_KIND, COMPUTE_EXECUTOR_MAX_WORKERS, COMPUTE_EXECUTOR_MAX_PENDING)
+
+# --- Single-Flight Coalescing ---
+class _SyncCall:
+    __slots__ = ("done", "result", "error")
+    def __init__(self):
+        self.done, self.result, self.error = threading.Event(), None, None
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations. Keys are (endpoint, params, data version); the first caller
+    for a key starts the work and every caller arriving before it finishes shares that one result (or error).
+    `run` serves the async handlers, `run_sync` the code already running on executor threads.
+    """
+    def __init__(self):
+        self._tasks: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        self._calls: Dict[Tuple[Any, ...], _SyncCall] = {}
+        self._guard = threading.Lock()
+        self.leaders: Dict[str, int] = {}
+        self.deduplicated: Dict[str, int] = {}
+
+    def _count(self, counter: Dict[str, int], key: Tuple[Any, ...]):
+        with self._guard: counter[key[0]] = counter.get(key[0], 0) + 1
+
+    async def run(self, key: Tuple[Any, ...], make_coro: Callable[[], Any]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            self._count(self.leaders, key)
+            task = asyncio.ensure_future(make_coro())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else: self._count(self.deduplicated, key)
+        # Shielded so a disconnecting client does not cancel the computation other callers are waiting on.
+        return await asyncio.shield(task)
+
+    async def run_compute(self, key: Tuple[Any, ...], fn: Callable[..., Any], *args: Any) -> Any:
+        return await self.run(key, lambda: COMPUTE_EXECUTOR.run(fn, *args))
+
+    def run_sync(self, key: Tuple[Any, ...], fn: Callable[[], Any]) -> Any:
+        with self._guard:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader: call = self._calls[key] = _SyncCall()
+        self._count(self.leaders if is_leader else self.deduplicated, key)
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._guard: self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {"leaders": sum(self.leaders.values()), "deduplicated": sum(self.deduplicated.values()),
+                    "deduplicated_by_endpoint": dict(self.deduplicated), "in_flight": len(self._tasks) + len(self._calls)}
+
+SINGLE_FLIGHT = SingleFlight()
+
+# Endpoint bodies as module-level functions so they can be shipped to either kind of pool worker.
+def build_team_clean_sheets_body(devig_method: Optional[str] = None) -> bytes:
+    cs_data = load_json_data(CORRECT_SCORE_FILE_PATH)
+    if not cs_data: raise EndpointDataError(500, "Could not load correct_score.json")
+    results = calculate_team_cs_percentages_logic(cs_data, TEAM_NAME_MAPPING, TEAM_DETAILS, DATA_STATE.fixture_registry.by_pair, devig_method)
+    return TEAM_CLEAN_SHEETS_ADAPTER.dump_json(TEAM_CLEAN_SHEETS_ADAPTER.validate_python(results))
+
+def build_top_correct_scores_body(devig_method: Optional[str] = None) -> bytes:
+    cs_data = load_json_data(CORRECT_SCORE_FILE_PATH)
+    if not cs_data: raise EndpointDataError(500, "Could not load correct_score.json")
+    results = calculate_top_scores_logic(cs_data, TEAM_NAME_MAPPING, DATA_STATE.fixture_registry.by_pair, devig_method)
+    return TOP_CORRECT_SCORES_ADAPTER.dump_json(TOP_CORRECT_SCORES_ADAPTER.validate_python(results))
+
+def build_player_clean_sheets_body(devig_method: Optional[str] = None) -> bytes:
+    ags_data = load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)
+    if not ags_data: raise EndpointDataError(500, "Could not load anytime_goalscorer.json")
+    state = get_devigged_state(devig_method)
+    if not state.team_cs_percentages: raise EndpointDataError(503, "Team CS cache unavailable.")
+    results = calculate_player_clean_sheets_logic(ags_data, state.team_cs_percentages, TEAM_NAME_MAPPING, TEAM_DETAILS, state.fixture_registry.by_pair)
+    return PLAYER_CLEAN_SHEETS_ADAPTER.dump_json(PLAYER_CLEAN_SHEETS_ADAPTER.validate_python(results))
+
+def build_all_matches_combined_stats_body(devig_method: Optional[str] = None) -> bytes:
+    return get_combined_stats_index(get_devigged_state(devig_method)).render_all()
+
+def build_filtered_combined_stats_body(fixture_id: Optional[str], gw: Optional[str], team_c: Optional[str], positions: Optional[set],
+                                       date_from: Optional[str], date_to: Optional[str], devig_method: Optional[str] = None) -> bytes:
+    index = get_combined_stats_index(get_devigged_state(devig_method))
+    selected = index.select_fixtures(fixture_id=fixture_id, gw=gw, team=team_c, date_from=date_from, date_to=date_to)
+    return index.render(selected, team=team_c, positions=positions)
+
+def build_match_combined_stats_body(fixture_id: str, team_c: Optional[str], positions: Optional[set], devig_method: Optional[str] = None) -> Optional[bytes]:
+    index = get_combined_stats_index(get_devigged_state(devig_method))
+    if fixture_id not in index.by_fixture_id: return None
+    return index.render_fixture(index.by_fixture_id[fixture_id], team=team_c, positions=positions)
+
+def build_group_simulation_body(simulations: int, seed: int, devig_method: Optional[str] = None) -> bytes:
+    results = simulate_group_stage(simulations, seed, state=get_devigged_state(devig_method))
+    return GROUP_SIMULATION_ADAPTER.dump_json(GROUP_SIMULATION_ADAPTER.validate_python(results))
+
+def build_knockout_bracket_body(simulations: int, seed: int, devig_method: Optional[str] = None) -> bytes:
+    state = get_devigged_state(devig_method)
+    results = compute_knockout_bracket(run_group_simulation(simulations, seed, state=state), state=state)
+    return KNOCKOUT_BRACKET_ADAPTER.dump_json(KNOCKOUT_BRACKET_ADAPTER.validate_python(results))
+
+def build_team_ratings_body(devig_method: Optional[str] = None) -> bytes:
+    model = get_team_rating_model(get_devigged_state(devig_method))
+    results = []
+    for team_c in model.teams:
+        rating = model.ratings(team_c)
+        if rating is None: continue
+        results.append({"team_name_canonical": team_c, "attack": round(rating[0], 4), "defence": round(rating[1], 4), "observations": model.observation_counts[team_c],
+                        "xg_vs_average": round(float(np.exp(model.intercept() + rating[0])), 3)})
+    results.sort(key=lambda r: (-(r["attack"] + r["defence"]), r["team_name_canonical"]))
+    return TEAM_RATING_ADAPTER.dump_json(TEAM_RATING_ADAPTER.validate_python(results))
+
 app = FastAPI(
     title="Football Super Stats API - Enhanced Edition",
     description="Enhanced API for Team/Player Clean Sheets, Top Correct Scores, and Combined Player Stats (AGS, AAS, CS) with realistic probability calculations.",
@@ -1162,58 +3286,135 @@ app = FastAPI(
 )
 
 # --- FastAPI Endpoints ---
+def parse_devig_method(devig: Optional[str]) -> Optional[str]:
+    """The ?devig= query value as a DEVIG_METHODS entry (None keeps the raw prices); 400 on anything else"""
+    if devig is None: return None
+    method = devig.strip().lower()
+    if method not in DEVIG_METHODS: raise HTTPException(status_code=400, detail=f"devig must be one of: {', '.join(DEVIG_METHODS)}.")
+    return method
+
+def devig_cache_name(name: str, devig_method: Optional[str]) -> str:
+    return name if devig_method is None else f"{name}?devig={devig_method}"
+
 @app.get("/team-clean-sheets/", response_model=List[TeamCleanSheet], tags=["Clean Sheets & Scores (Original)"])
-async def get_team_clean_sheets():
+async def get_team_clean_sheets(request: Request, devig: Optional[str] = None):
+    devig_method = parse_devig_method(devig)
     try:
-        cs_data = load_json_data(CORRECT_SCORE_FILE_PATH)
-        if not cs_data: raise HTTPException(status_code=500, detail="Could not load correct_score.json")
-        results = calculate_team_cs_percentages_logic(cs_data, TEAM_NAME_MAPPING, TEAM_DETAILS, FIXTURE_LOOKUP_MAP)
-        return results
+        return await cached_json_response(request, devig_cache_name("team-clean-sheets", devig_method), request_data_version(CORRECT_SCORE_FILE_PATH), build_team_clean_sheets_body, devig_method)
+    except HTTPException: raise
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/top-correct-scores/", response_model=List[TopCorrectScores], tags=["Clean Sheets & Scores (Original)"])
-async def get_top_correct_scores():
+async def get_top_correct_scores(request: Request, devig: Optional[str] = None):
+    devig_method = parse_devig_method(devig)
     try:
-        cs_data = load_json_data(CORRECT_SCORE_FILE_PATH)
-        if not cs_data: raise HTTPException(status_code=500, detail="Could not load correct_score.json")
-        results = calculate_top_scores_logic(cs_data, TEAM_NAME_MAPPING, FIXTURE_LOOKUP_MAP)
-        return results
+        return await cached_json_response(request, devig_cache_name("top-correct-scores", devig_method), request_data_version(CORRECT_SCORE_FILE_PATH), build_top_correct_scores_body, devig_method)
+    except HTTPException: raise
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/player-clean-sheets/", response_model=List[MatchWithPlayerCleanSheets], tags=["Clean Sheets & Scores (Original)"])
-async def get_player_clean_sheets():
+async def get_player_clean_sheets(request: Request, devig: Optional[str] = None):
+    devig_method = parse_devig_method(devig)
     try:
-        ags_data = load_json_data(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH)
-        if not ags_data: raise HTTPException(status_code=500, detail="Could not load anytime_goalscorer.json")
-        if not TEAM_CS_PERCENTAGES_CACHE: raise HTTPException(status_code=503, detail="Team CS cache unavailable.")
-        results = calculate_player_clean_sheets_logic(ags_data, TEAM_CS_PERCENTAGES_CACHE, TEAM_NAME_MAPPING, TEAM_DETAILS, FIXTURE_LOOKUP_MAP)
-        return results
+        return await cached_json_response(request, devig_cache_name("player-clean-sheets", devig_method), request_data_version(UNIFIED_ANYTIME_GOALSCORER_FILE_PATH), build_player_clean_sheets_body, devig_method)
+    except HTTPException: raise
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/all-matches-player-stats/", response_model=List[MatchWithPlayerCombinedStats], tags=["Player Stats (Enhanced Combined)"])
-async def get_all_matches_player_combined_stats_endpoint():
+async def get_all_matches_player_combined_stats_endpoint(
+    request: Request, fixture_id: Optional[str] = None, GW: Optional[str] = None, team: Optional[str] = None,
+    position: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, stream: bool = False, devig: Optional[str] = None
+):
     """
     Enhanced endpoint returning realistic player probabilities with:
     - Hybrid AGS model (60% direct odds + 40% enhanced Poisson)
     - Position-aware probability calculations
   
     - Enhanced clean sheet calculations
+
+    Optional filters (combined with AND): `fixture_id`, `GW`, `team` (any known alias; also limits players
+    to that team), `position` (comma-separated, case-insensitive), `date_from`/`date_to` (YYYY-MM-DD, inclusive).
+
+    Pass `stream=true` or `Accept: application/x-ndjson` to receive NDJSON instead, one fixture per line,
+    each line sent as soon as that fixture is computed. `devig` (proportional, power, shin or odds_ratio)
+    removes the bookmaker margin from every correct-score and AGS market first.
     """
+    devig_method = parse_devig_method(devig)
     try:
-        all_matches_data = calculate_all_matches_combined_stats_with_cs()
-        if not all_matches_data: raise HTTPException(status_code=404, detail="No combined player stats calculated.")
-        results = [MatchWithPlayerCombinedStats(
-                        fixture_id=match_data["fixture_id"], GW=match_data["GW"], date_str=match_data["date_str"],
-                        home_team_canonical=match_data["home_team_canonical"], away_team_canonical=match_data["away_team_canonical"],
-                        home_team_xg=match_data.get("home_team_xg"), away_team_xg=match_data.get("away_team_xg"),
-                        xg_source=match_data.get("xg_source"),
-                        players=[PlayerCombinedStats(**p_data) for p_data in match_data["players_data"]]
-                    ) for match_data in all_matches_data]
-        return results
+        if wants_ndjson(request, stream):
+            team_c = resolve_team_query(team)
+            positions = {p.strip().lower() for p in position.split(",") if p.strip()} if position is not None else None
+            return await ndjson_stream_response(iter_combined_stats_ndjson(fixture_id, GW, team_c, positions, date_from, date_to, devig_method))
+        if all(v is None for v in (fixture_id, GW, team, position, date_from, date_to)):
+            return await cached_json_response(request, devig_cache_name("all-matches-player-stats", devig_method), request_data_version(), build_all_matches_combined_stats_body, devig_method)
+        team_c = resolve_team_query(team)
+        positions = {p.strip().lower() for p in position.split(",") if p.strip()} if position is not None else None
+        params = (fixture_id, GW, team_c, tuple(sorted(positions)) if positions is not None else None, date_from, date_to, devig_method)
+        body = await SINGLE_FLIGHT.run_compute(("all-matches-player-stats", params, request_data_version()), build_filtered_combined_stats_body, fixture_id, GW, team_c, positions, date_from, date_to, devig_method)
+        return json_bytes_response(request, body)
+    except HTTPException: raise
     except Exception as e:
         print(f"Error /all-matches-player-stats/: {e}"); import traceback; traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/all-matches-player-stats/{fixture_id}", response_model=MatchWithPlayerCombinedStats, tags=["Player Stats (Enhanced Combined)"])
+async def get_match_player_combined_stats_endpoint(request: Request, fixture_id: str, team: Optional[str] = None, position: Optional[str] = None, devig: Optional[str] = None):
+    devig_method = parse_devig_method(devig)
+    team_c = resolve_team_query(team)
+    positions = {p.strip().lower() for p in position.split(",") if p.strip()} if position is not None else None
+    params = (fixture_id, team_c, tuple(sorted(positions)) if positions is not None else None, devig_method)
+    try: body = await SINGLE_FLIGHT.run_compute(("all-matches-player-stats/{fixture_id}", params, request_data_version()), build_match_combined_stats_body, fixture_id, team_c, positions, devig_method)
+    except HTTPException: raise
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+    if body is None: raise HTTPException(status_code=404, detail=f"Unknown fixture_id '{fixture_id}'.")
+    return json_bytes_response(request, body)
+
+@app.get("/group-simulation/", response_model=List[GroupSimulation], tags=["Tournament Simulation"])
+async def get_group_simulation(request: Request, simulations: int = GROUP_SIMULATION_DEFAULT_RUNS, seed: int = 0, devig: Optional[str] = None):
+    """
+    Finishing-position distribution per team in every group, from `simulations` Monte Carlo runs of the
+    group stage (scorelines drawn from CS markets where priced, else Poisson on fixture xG). The same
+    `seed` always gives the same answer.
+    """
+    devig_method = parse_devig_method(devig)
+    if not 1 <= simulations <= GROUP_SIMULATION_MAX_RUNS:
+        raise HTTPException(status_code=400, detail=f"simulations must be between 1 and {GROUP_SIMULATION_MAX_RUNS}.")
+    try:
+        body = await SINGLE_FLIGHT.run_compute(("group-simulation", (simulations, seed, devig_method), request_data_version()), build_group_simulation_body, simulations, seed, devig_method)
+        return json_bytes_response(request, body)
+    except HTTPException: raise
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/team-ratings/", response_model=List[TeamRating], tags=["Tournament Simulation"])
+async def get_team_ratings(request: Request, devig: Optional[str] = None):
+    """Attack/defence ratings solved across every correct-score and AGS market, strongest first"""
+    devig_method = parse_devig_method(devig)
+    try:
+        body = await SINGLE_FLIGHT.run_compute(("team-ratings", devig_method, request_data_version()), build_team_ratings_body, devig_method)
+        return json_bytes_response(request, body)
+    except HTTPException: raise
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/knockout-bracket/", response_model=List[KnockoutFixture], tags=["Tournament Simulation"])
+async def get_knockout_bracket(request: Request, simulations: int = GROUP_SIMULATION_DEFAULT_RUNS, seed: int = 0, devig: Optional[str] = None):
+    """
+    Every knockout fixture with the probability of each team filling each slot, its most likely opponent
+    and expected xG, and the winner distribution (the final's is the champion's). Group places come from
+    the same seeded simulation as /group-simulation/; the bracket itself is propagated exactly.
+    """
+    devig_method = parse_devig_method(devig)
+    if not 1 <= simulations <= GROUP_SIMULATION_MAX_RUNS:
+        raise HTTPException(status_code=400, detail=f"simulations must be between 1 and {GROUP_SIMULATION_MAX_RUNS}.")
+    try:
+        body = await SINGLE_FLIGHT.run_compute(("knockout-bracket", (simulations, seed, devig_method), request_data_version()), build_knockout_bracket_body, simulations, seed, devig_method)
+        return json_bytes_response(request, body)
+    except HTTPException: raise
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stats/", tags=["Information"])
+async def get_runtime_stats():
+    return {"data_file_cache": DATA_FILE_CACHE.stats(), "response_cache": RESPONSE_CACHE.stats(), "compute_executor": COMPUTE_EXECUTOR.stats(), "single_flight": SINGLE_FLIGHT.stats(), "hot_reload": ODDS_FILE_WATCHER.stats()}
+
 @app.get("/", tags=["Information"])
 async def root():
     return {
@@ -1236,7 +3437,12 @@ async def root():
             "/team-clean-sheets/",
             "/top-correct-scores/",
             "/player-clean-sheets/",
-            "/all-matches-player-stats/"
+            "/all-matches-player-stats/",
+            "/all-matches-player-stats/{fixture_id}",
+            "/group-simulation/",
+            "/knockout-bracket/",
+            "/team-ratings/",
+            "/stats/"
         ]
     }
 
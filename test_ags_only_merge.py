@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import main
+
+HOME, AWAY = "Chelsea FC", "CR Flamengo"
+FIXTURE = {"fixture_id": "f1", "GW": "1", "date_str": "2025-06-16", "home_team_canonical": HOME, "away_team_canonical": AWAY}
+MATCH_CTX = {"home_xg": 1.4, "away_xg": 1.1, "xg_source": "test", "team_cs_home": 30.0, "team_cs_away": 25.0}
+
+
+def merge(excel_rows, market):
+    state = main.DataState.empty().evolve(0, ags_odds_lookup={frozenset({HOME, AWAY}): market})
+    return main._finalize_match_combined_stats(FIXTURE, MATCH_CTX, list(excel_rows), state)["players_data"][len(excel_rows):]
+
+
+def scan_merge(excel_rows, market):
+    """The merge as it was before PlayerIdentitySet: every AGS player checked against every listed player"""
+    tracker = [(p['player_name'].lower(), p['team_name_canonical'], p['player_id'], p['player_api_id']) for p in excel_rows]
+    added = []
+    for ags_p in market:
+        name, team_c = str(ags_p.get('player', '')).strip(), main.get_canonical_team_name(str(ags_p.get('team', '')).strip(), main.TEAM_NAME_MAPPING)
+        p_id = str(ags_p.get('player_id')) if pd.notna(ags_p.get('player_id')) else None
+        p_api_id = str(ags_p.get('player_api_id')) if pd.notna(ags_p.get('player_api_id')) else None
+        if not name or not team_c or team_c.startswith("N/A_"): continue
+        if any(name.lower() == n and team_c == t and ((p_id and p_id == pid) or (p_api_id and p_api_id == apiid) or (not p_id and not p_api_id and not pid and not apiid))
+               for n, t, pid, apiid in tracker): continue
+        try: odds = float(ags_p.get('odds'))
+        except (ValueError, TypeError): continue
+        if odds > 1.0:
+            added.append((name, p_id, p_api_id))
+            tracker.append((name.lower(), team_c, p_id, p_api_id))
+    return added
+
+
+def synthetic_market(n):
+    """n Excel players, and a market listing each of them again (by id, api_id or bare name) plus one AGS-only player each"""
+    excel_rows, market = [], []
+    for i in range(n):
+        team_c = HOME if i % 2 == 0 else AWAY
+        pid, api_id = (str(i), None) if i % 3 == 0 else (None, str(i)) if i % 3 == 1 else (None, None)
+        excel_rows.append({"player_name": f"Player {i}", "team_name_canonical": team_c, "player_id": pid, "player_api_id": api_id})
+        market.append({"player": f"Player {i}", "team": team_c, "player_id": pid, "player_api_id": api_id, "odds": "4.5", "position": "Midfielder"})
+        market.append({"player": f"AGS Only {i}", "team": team_c, "player_id": f"x{i}", "player_api_id": None, "odds": "6.0", "position": "Forward"})
+    return excel_rows, market
+
+
+def test_duplicates_are_dropped_and_ags_only_players_kept():
+    excel_rows, market = synthetic_market(60)
+    added = merge(excel_rows, market)
+    assert [p["player_name"] for p in added] == [f"AGS Only {i}" for i in range(60)]
+    assert [(p["player_name"], p["player_id"], p["player_api_id"]) for p in added] == scan_merge(excel_rows, market)
+
+
+def test_set_merge_matches_the_old_scan_on_random_markets():
+    rng = np.random.default_rng(5)
+    ids = [None, np.nan, "1", "2", "3"]
+    for _ in range(200):
+        def player():
+            return {"player": str(rng.choice(["Ana", "ana ", "Bea", "Cid", ""])), "team": str(rng.choice([HOME, AWAY, "Chelsea", "Nowhere FC"])),
+                    "player_id": ids[rng.integers(len(ids))], "player_api_id": ids[rng.integers(len(ids))],
+                    "odds": str(rng.choice(["3.5", "1.0", "abc", "12"])), "position": "Forward"}
+        excel_rows = []
+        for p in (player() for _ in range(rng.integers(0, 6))):
+            if not p["player"].strip(): continue
+            excel_rows.append({"player_name": p["player"].strip(), "team_name_canonical": main.get_canonical_team_name(p["team"], main.TEAM_NAME_MAPPING),
+                               "player_id": p["player_id"] if pd.notna(p["player_id"]) else None, "player_api_id": p["player_api_id"] if pd.notna(p["player_api_id"]) else None})
+        market = [player() for _ in range(rng.integers(0, 12))]
+        assert [(p["player_name"], p["player_id"], p["player_api_id"]) for p in merge(excel_rows, market)] == scan_merge(excel_rows, market)
+
+
+def test_merge_cost_grows_linearly():
+    def best_time(n):
+        excel_rows, market = synthetic_market(n)
+        best = float("inf")
+        for _ in range(3):
+            started = time.perf_counter()
+            merge(excel_rows, market)
+            best = min(best, time.perf_counter() - started)
+        return best
+    # 8x the players: about 8x the time when linear, 64x for the old pairwise scan
+    assert best_time(3200) / best_time(400) < 24
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import main
+
+# Three markets with different overrounds and lengths; NaN pads the shorter rows.
+IMPLIED = np.array([
+    [1 / 1.8, 1 / 3.6, 1 / 4.5, np.nan, np.nan],
+    [1 / 1.25, 1 / 6.0, 1 / 15.0, 1 / 34.0, np.nan],
+    [0.30, 0.25, 0.22, 0.18, 0.12],
+])
+
+
+@pytest.mark.parametrize("method", main.DEVIG_METHODS)
+def test_rows_sum_to_one(method):
+    fair = main.devig_batch(IMPLIED, method)
+    np.testing.assert_allclose(np.nansum(fair, axis=1), 1.0, atol=1e-9)
+    assert np.array_equal(np.isnan(fair), np.isnan(IMPLIED))
+
+
+@pytest.mark.parametrize("method", main.DEVIG_METHODS)
+def test_rows_sum_to_their_targets(method):
+    targets = np.array([1.0, 0.8, 0.5])
+    np.testing.assert_allclose(np.nansum(main.devig_batch(IMPLIED, method, targets), axis=1), targets, atol=1e-9)
+
+
+def test_proportional_is_simple_normalisation():
+    fair = main.devig_batch(IMPLIED, "proportional")
+    np.testing.assert_allclose(fair, IMPLIED / np.nansum(IMPLIED, axis=1)[:, None], rtol=1e-12)
+
+
+@pytest.mark.parametrize("method", ["power", "shin", "odds_ratio"])
+def test_longshots_lose_more_margin_than_favourites(method):
+    fair = main.devig_batch(IMPLIED, method)
+    for row_implied, row_fair in zip(IMPLIED, fair):
+        valid = np.isfinite(row_implied)
+        order = np.argsort(row_implied[valid])
+        kept = row_fair[valid][order] / row_implied[valid][order]
+        assert np.all(kept <= 1.0 + 1e-12)
+        assert np.all(np.diff(kept) >= -1e-12)
+
+
+def test_fair_book_is_left_alone():
+    fair_book = np.array([[0.5, 0.3, 0.2]])
+    for method in main.DEVIG_METHODS:
+        np.testing.assert_allclose(main.devig_batch(fair_book, method), fair_book, atol=1e-9)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        main.devig_batch(IMPLIED, "additive")
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from scipy import optimize
+
+import main
+
+PARAMS = [(1.6, 0.9, -0.08), (1.1, 1.3, 0.05), (2.4, 0.6, -0.15)]
+
+
+def synthetic_market(home_rate, away_rate, rho, margin=1.12):
+    """Correct-score odds for every grid scoreline, priced from a Dixon-Coles model with a proportional margin"""
+    grid = main.dixon_coles_scoreline_probs(home_rate, away_rate, rho)
+    grid = grid / grid.sum()
+    size = grid.shape[0]
+    return main.CorrectScoreMatrix.from_odds({f"{h}-{a}": 1.0 / (grid[h, a] * margin) for h in range(size) for a in range(size)})
+
+
+def test_fit_recovers_known_parameters():
+    fits = main.fit_dixon_coles_batch([synthetic_market(*params) for params in PARAMS])
+    for fit, (home_rate, away_rate, rho) in zip(fits, PARAMS):
+        assert fit.home_rate == pytest.approx(home_rate, abs=2e-3)
+        assert fit.away_rate == pytest.approx(away_rate, abs=2e-3)
+        assert fit.rho == pytest.approx(rho, abs=2e-3)
+        assert fit.loss < 1e-8
+
+
+def test_warm_start_converges_to_the_same_fit():
+    matrices = [synthetic_market(*params) for params in PARAMS]
+    cold = main.fit_dixon_coles_batch(matrices)
+    warm = main.fit_dixon_coles_batch(matrices, np.array([[1.0, 1.0, 0.0], [np.nan] * 3, [2.0, 0.8, -0.1]]))
+    for a, b in zip(cold, warm):
+        assert a.home_rate == pytest.approx(b.home_rate, abs=2e-3)
+        assert a.away_rate == pytest.approx(b.away_rate, abs=2e-3)
+        assert a.rho == pytest.approx(b.rho, abs=2e-3)
+
+
+def test_sparse_market_is_not_fitted():
+    assert main.fit_dixon_coles_batch([main.CorrectScoreMatrix.from_odds({"1-0": 6.5, "0-0": 9.0})]) == [None]
+
+
+def test_analytic_gradient_matches_finite_differences():
+    matrices = [synthetic_market(*params) for params in PARAMS]
+    target = np.stack([m.implied for m in matrices])
+    mask = np.stack([m.present for m in matrices]).astype(float)
+    mask[0, 5:, :] = 0.0  # unpriced cells are renormalized away, which the gradient must account for
+    target = target * mask
+    target /= target.sum(axis=(1, 2))[:, None, None]
+    objective = lambda x: main._dixon_coles_batch_objective(x, target, mask)[0]
+    gradient = lambda x: main._dixon_coles_batch_objective(x, target, mask)[1]
+    for x0 in (np.array([np.log(1.3), np.log(1.0), 0.02, np.log(0.8), np.log(1.7), -0.1, np.log(2.0), np.log(0.5), 0.1]),
+               np.array([0.0, 0.0, 0.0] * 3)):
+        error = optimize.check_grad(objective, gradient, x0, epsilon=1e-7)
+        assert error < 1e-5 * max(1.0, np.linalg.norm(gradient(x0)))
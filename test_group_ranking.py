@@ -0,0 +1,81 @@
+import numpy as np
+
+import main
+
+# Round robin of four teams
+HOME = np.array([0, 2, 0, 3, 3, 1])
+AWAY = np.array([1, 3, 2, 1, 0, 2])
+
+
+def rank(results, lots=(0.4, 0.3, 0.2, 0.1)):
+    """Places for one simulated group from (home goals, away goals) per fixture"""
+    goals = np.array(results, dtype=np.int16)
+    places, points = main.rank_group_tables(HOME, AWAY, goals[:, :1], goals[:, 1:], 4, np.array(lots)[:, None])
+    return list(places[:, 0]), list(points[:, 0])
+
+
+def reference_places(home_goals, away_goals, lots):
+    """Straightforward per-team criteria: points, then head-to-head among teams level on points, then overall"""
+    n_teams = len(lots)
+    points, gf, ga = [0] * n_teams, [0] * n_teams, [0] * n_teams
+    for h, a, hg, ag in zip(HOME, AWAY, home_goals, away_goals):
+        points[h] += 3 * (hg > ag) + (hg == ag); points[a] += 3 * (ag > hg) + (hg == ag)
+        gf[h] += hg; ga[h] += ag; gf[a] += ag; ga[a] += hg
+    h2h = [[0, 0, 0] for _ in range(n_teams)]
+    for h, a, hg, ag in zip(HOME, AWAY, home_goals, away_goals):
+        if points[h] != points[a]: continue
+        h2h[h][0] += 3 * (hg > ag) + (hg == ag); h2h[a][0] += 3 * (ag > hg) + (hg == ag)
+        h2h[h][1] += hg - ag; h2h[a][1] += ag - hg
+        h2h[h][2] += hg; h2h[a][2] += ag
+    keys = [(points[t], *h2h[t], gf[t] - ga[t], gf[t], lots[t]) for t in range(n_teams)]
+    order = sorted(range(n_teams), key=lambda t: keys[t], reverse=True)
+    return [order.index(t) for t in range(n_teams)]
+
+
+def test_points_decide_first():
+    places, points = rank([(1, 0), (1, 0), (1, 0), (0, 1), (0, 1), (1, 0)])
+    assert points == [9, 6, 3, 0]
+    assert places == [0, 1, 2, 3]
+
+
+def test_head_to_head_beats_goal_difference():
+    # Teams 0 and 1 finish level on 6 points; team 1 has the far better goal difference but lost to team 0.
+    places, points = rank([(1, 0), (0, 0), (2, 0), (0, 6), (1, 0), (6, 0)])
+    assert points == [6, 6, 1, 4]
+    assert places == [0, 1, 3, 2]
+
+
+def test_three_way_tie_is_decided_on_the_mini_table():
+    # Teams 0, 1 and 2 each win one and lose one among themselves; team 2 has the best head-to-head goal difference.
+    places, points = rank([(1, 0), (5, 0), (0, 3), (0, 1), (0, 1), (1, 0)])
+    assert points == [6, 6, 6, 0]
+    assert places == [2, 1, 0, 3]
+
+
+def test_lots_decide_a_complete_tie():
+    draws = [(1, 1)] * 6
+    assert rank(draws, lots=(0.1, 0.9, 0.5, 0.3))[0] == [3, 0, 1, 2]
+    assert rank(draws, lots=(0.9, 0.1, 0.5, 0.3))[0] == [0, 3, 1, 2]
+
+
+def test_packed_keys_match_reference_ranking_on_realistic_scores():
+    rng = np.random.default_rng(7)
+    n_sims = 4000
+    home_goals = rng.poisson(1.4, (len(HOME), n_sims)).astype(np.int16)
+    away_goals = rng.poisson(1.1, (len(HOME), n_sims)).astype(np.int16)
+    home_goals[:, :50] = rng.integers(0, 16, (len(HOME), 50))  # a few blow-outs: up to 45 goals and +45 difference per team
+    lots = rng.random((4, n_sims))
+    places, _ = main.rank_group_tables(HOME, AWAY, home_goals, away_goals, 4, lots)
+    for s in range(n_sims):
+        assert list(places[:, s]) == reference_places(home_goals[:, s], away_goals[:, s], lots[:, s]), s
+
+
+def test_simulated_goal_counts_fit_the_packed_keys():
+    # Six keys of 8 bits fit an int64, and no team can leave the +-127 range a key is clipped to:
+    # three group matches at the simulator's goal cap give at most 3 * cap goals (or goal difference).
+    max_goals = max(main.GROUP_SIMULATION_POISSON_MAX_GOALS, main.MAX_POISSON_GOALS)
+    assert 6 * 8 < 63
+    assert 3 * max_goals <= 127
+    blowout = [(max_goals, 0)] * 6
+    places, points = rank(blowout)
+    assert places == reference_places(*np.array(blowout).T, (0.4, 0.3, 0.2, 0.1))
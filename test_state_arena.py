@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import main
+
+PLAYERS = pd.DataFrame({
+    "Team_Canonical": ["Chelsea FC", "CR Flamengo", "Chelsea FC", "CR Flamengo"],
+    "Player Name": ["Cole Palmer", "Pedro", "Reece James", "Arrascaeta"],
+    "Position": ["Midfielder", "Attacker", np.nan, "Midfielder"],
+    "player_id": [10.0, np.nan, "7", None],
+    "Player API ID": ["101", "202", np.nan, "404"],
+    "Goals": [12, 9, 2, 6],
+    "Assists": [8, 2, 3, 10],
+    "player_price": [10.5, np.nan, 5.0, 7],
+    "player_image": ["palmer.png", None, np.nan, "arrascaeta.png"],
+})
+CS_ODDS = {
+    ("Chelsea FC", "CR Flamengo", "2025-06-25"): {"1-0": 7.0, "2-1": 9.0, "0-0": 11.0, "1-1": 6.5, "Any Other Home Win": 15.0},
+    ("CR Flamengo", "Chelsea FC", "2025-07-01"): {"0-1": 8.0, "2-2": 13.0, "9-0": 251.0},
+}
+FIXTURE_PARTS = [(b'{"fixture_id":"f1","players":', [b'{"p":1}', b'{"p":2}'], ["Chelsea FC", "CR Flamengo"], ["midfielder", ""],
+                  ("f1", "1", "Chelsea FC", "CR Flamengo", "2025-06-25"))]
+
+
+def arena_state():
+    registry = main.PositionRegistry(list(PLAYERS["Position"]))
+    return main.DataState.empty().evolve(1, player_table=main.PlayerTable(PLAYERS, registry), position_registry=registry,
+                                         correct_score_matrix_index={key: main.CorrectScoreMatrix.from_odds(odds) for key, odds in CS_ODDS.items()})
+
+
+def assert_same_table(table, expected):
+    assert table.team_slices == expected.team_slices
+    for name in main.PlayerTable.OBJECT_COLUMNS:
+        got, want = list(getattr(table, name)), list(getattr(expected, name))
+        assert [type(v) for v in got] == [type(v) for v in want], name
+        assert [v if v == v else "NaN" for v in got] == [v if v == v else "NaN" for v in want], name
+    for name in main.PlayerTable.NUMERIC_COLUMNS:
+        np.testing.assert_array_equal(getattr(table, name), getattr(expected, name))
+
+
+def test_arena_round_trips_the_shared_fields(tmp_path):
+    state, index = arena_state(), main.CombinedStatsIndex.from_parts(FIXTURE_PARTS)
+    assert main.write_state_arena("key", state, index, str(tmp_path / "arena"))
+    shared = main.attach_state_arena("key", str(tmp_path / "arena"))
+    assert bytes(shared["combined_stats_index"].fragment(1)) == b'{"p":1}'
+    assert_same_table(shared["player_table"], state.player_table)
+    assert list(shared["correct_score_matrix_index"]) == list(state.correct_score_matrix_index)
+    for key, matrix in shared["correct_score_matrix_index"].items():
+        expected = state.correct_score_matrix_index[key]
+        for name in ("implied", "present", "order", "probs"):
+            np.testing.assert_array_equal(getattr(matrix, name), getattr(expected, name))
+            assert not getattr(matrix, name).flags.writeable
+        assert matrix.total_implied == expected.total_implied and matrix.extras == expected.extras
+        assert matrix.top_scores() == expected.top_scores() and matrix.clean_sheet_percentages() == expected.clean_sheet_percentages()
+
+
+def test_arena_player_table_pickles_as_plain_arrays(tmp_path):
+    state = arena_state()
+    assert main.write_state_arena("key", state, main.CombinedStatsIndex.from_parts(FIXTURE_PARTS), str(tmp_path / "arena"))
+    table = pickle.loads(pickle.dumps(main.attach_state_arena("key", str(tmp_path / "arena"))["player_table"]))
+    assert isinstance(table.names, np.ndarray) and table.names.dtype == object
+    assert_same_table(table, state.player_table)
+
+
+def test_stale_or_missing_arena_is_not_attached(tmp_path):
+    assert main.attach_state_arena("key", str(tmp_path / "arena")) is None
+    assert main.write_state_arena("key", arena_state(), main.CombinedStatsIndex.from_parts(FIXTURE_PARTS), str(tmp_path / "arena"))
+    assert main.attach_state_arena("other key", str(tmp_path / "arena")) is None
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import main
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def team_names(monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    for file_path in [main.CORRECT_SCORE_FILE_PATH, main.UNIFIED_ANYTIME_GOALSCORER_FILE_PATH, main.PLAYER_STATS_FP]:
+        assert os.path.exists(file_path), f"missing data file {file_path}"
+    return main.collect_team_names_from_data_files()
+
+
+def _variants(name):
+    return (name, f"  {name} ", name.upper(), name.lower())
+
+
+def test_data_files_cover_mapping_and_sources(team_names):
+    assert set(main.TEAM_NAME_MAPPING) | set(main.TEAM_NAME_MAPPING.values()) <= set(team_names)
+    assert len(team_names) > len(set(main.TEAM_NAME_MAPPING) | set(main.TEAM_NAME_MAPPING.values()))
+
+
+def test_get_canonical_team_name_matches_linear_scan(team_names):
+    mismatches = [(candidate, main.get_canonical_team_name(candidate, main.TEAM_NAME_MAPPING), main._scan_canonical_team_name(candidate, main.TEAM_NAME_MAPPING))
+                  for name in team_names for candidate in _variants(name)]
+    assert [m for m in mismatches if m[1] != m[2]] == []
+
+
+def test_fresh_resolver_matches_linear_scan(team_names):
+    resolver = main.TeamNameResolver(main.TEAM_NAME_MAPPING)
+    for name in team_names:
+        for candidate in _variants(name):
+            assert resolver.resolve(candidate) == main._scan_canonical_team_name(candidate, main.TEAM_NAME_MAPPING), candidate
+            assert resolver.resolve(candidate) == main._scan_canonical_team_name(candidate, main.TEAM_NAME_MAPPING), f"memoized {candidate}"
+
+
+def test_resolve_known_rejects_unknown_names():
+    resolver = main.TeamNameResolver(main.TEAM_NAME_MAPPING)
+    assert resolver.resolve_known("Chelsea") == main.get_canonical_team_name("Chelsea", main.TEAM_NAME_MAPPING)
+    assert resolver.resolve_known("Not A Real Club") is None
+    assert resolver._memo == {}
@@ -0,0 +1,76 @@
+import itertools
+
+import numpy as np
+
+import main
+
+TEAMS = ["Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot"]
+
+
+def observation_rows(seed=0):
+    """Every pairing priced as a correct-score market, half of them also as an AGS matchup, with noisy log rates"""
+    rng = np.random.default_rng(seed)
+    attack, defence = rng.normal(0, 0.3, len(TEAMS)), rng.normal(0, 0.3, len(TEAMS))
+    cs_weight, ags_weight = main.TEAM_RATING_SOURCE_WEIGHTS["correct_score"], main.TEAM_RATING_SOURCE_WEIGHTS["anytime_goalscorer"]
+    rows = {}
+    for n, (i, j) in enumerate(itertools.combinations(range(len(TEAMS)), 2)):
+        home, away = TEAMS[i], TEAMS[j]
+        rows[("correct_score", home, away, "2025-06-15")] = (
+            (home, away, "correct_score", 0.3 + attack[i] - defence[j] + rng.normal(0, 0.05), cs_weight),
+            (away, home, "correct_score", 0.3 + attack[j] - defence[i] + rng.normal(0, 0.05), cs_weight))
+        if n % 2 == 0:
+            rows[("anytime_goalscorer", home, away)] = (
+                (home, away, "anytime_goalscorer", 0.1 + attack[i] - defence[j] + rng.normal(0, 0.1), ags_weight),
+                (away, home, "anytime_goalscorer", 0.1 + attack[j] - defence[i] + rng.normal(0, 0.1), ags_weight))
+    return rows
+
+
+def dense_lstsq(rows, teams):
+    """The same weighted ridge problem, solved densely: [sqrt(W) A; sqrt(R)] x = [sqrt(W) y; 0]"""
+    sources = list(main.TEAM_RATING_SOURCE_WEIGHTS)
+    n_sources, n_teams = len(sources), len(teams)
+    flat = [r for match_rows in rows.values() for r in match_rows]
+    design = np.zeros((len(flat), n_sources + 2 * n_teams))
+    for k, (team, opponent, source, _, _) in enumerate(flat):
+        design[k, sources.index(source)] = 1.0
+        design[k, n_sources + teams.index(team)] = 1.0
+        design[k, n_sources + n_teams + teams.index(opponent)] = -1.0
+    sqrt_w = np.sqrt([r[4] for r in flat])
+    ridge = np.concatenate([np.full(n_sources, 1e-9), np.full(2 * n_teams, main.TEAM_RATING_RIDGE)])
+    lhs = np.vstack([design * sqrt_w[:, None], np.diag(np.sqrt(ridge))])
+    rhs = np.concatenate([np.array([r[3] for r in flat]) * sqrt_w, np.zeros(len(ridge))])
+    return np.linalg.lstsq(lhs, rhs, rcond=None)[0]
+
+
+def fail_spsolve(*args, **kwargs):
+    raise AssertionError("conjugate gradient did not converge")
+
+
+def test_cg_solve_matches_dense_lstsq(monkeypatch):
+    monkeypatch.setattr(main.sparse_linalg, "spsolve", fail_spsolve)
+    rows = observation_rows()
+    model = main.TeamRatingModel.build(rows, TEAMS)
+    np.testing.assert_allclose(model.solution, dense_lstsq(rows, model.teams), atol=1e-7)
+
+
+def test_revised_solve_matches_a_fresh_build(monkeypatch):
+    monkeypatch.setattr(main.sparse_linalg, "spsolve", fail_spsolve)
+    rows = observation_rows()
+    model = main.TeamRatingModel.build(rows, TEAMS)
+    changed = dict(rows)
+    key = ("correct_score", "Alpha", "Bravo", "2025-06-15")
+    changed[key] = tuple(r[:3] + (r[3] + 0.4,) + r[4:] for r in rows[key])
+    del changed[("anytime_goalscorer", "Alpha", "Delta")]
+    revised = model.revised(changed)
+    np.testing.assert_allclose(revised.solution, dense_lstsq(changed, revised.teams), atol=1e-7)
+    np.testing.assert_allclose(revised.solution, main.TeamRatingModel.build(changed, TEAMS).solution, atol=1e-7)
+
+
+def test_expected_goals_follow_the_ratings():
+    model = main.TeamRatingModel.build(observation_rows(), TEAMS)
+    for team in TEAMS:
+        assert model.observation_counts[team] > 0
+    attack_a, _ = model.ratings("Alpha")
+    _, defence_b = model.ratings("Bravo")
+    assert model.expected_goals("Alpha", "Bravo") == np.exp(model.intercept() + attack_a - defence_b)
+    assert model.ratings("Unknown") is None